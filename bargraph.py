@@ -0,0 +1,105 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 Stefan Rothe
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""
+`bargraph` - Change-driven NeoPixel bar graphs
+
+A bar graph quantizes a value to the number of lit pixels and only touches
+the pixels between the old and the new level. ``BarGraphs`` pushes at most
+one changed strip per update, round robin, and never refreshes a strip
+more often than its frame rate, so two strips never block in ``show()``
+during the same update.
+"""
+
+from micropython import const
+import time
+
+BAR_COLOR = (255, 0, 0)
+OFF_COLOR = (0, 0, 0)
+DEFAULT_FPS = const(30)
+NS_PER_S = const(1000000000)
+
+
+class BarGraph:
+    def __init__(self, pixels, full_scale, color=BAR_COLOR):
+        self.pixels = pixels
+        self.full_scale = full_scale
+        self.color = color
+        self.level = 0
+        self.dirty = False
+        self.next_show = 0
+        self.pixels.fill(OFF_COLOR)
+
+
+    def set_value(self, value):
+        count = len(self.pixels)
+        level = min(count, int(count * abs(value) / self.full_scale) + 1)
+        if level == self.level:
+            return
+        if level > self.level:
+            for i in range(self.level, level):
+                self.pixels[i] = self.color
+        else:
+            for i in range(level, self.level):
+                self.pixels[i] = OFF_COLOR
+        self.level = level
+        self.dirty = True
+
+
+    def show(self):
+        self.pixels.show()
+        self.dirty = False
+
+
+class BarGraphs:
+    def __init__(self, fps=DEFAULT_FPS):
+        self.graphs = []
+        self.period = NS_PER_S // fps
+        self.shows = 0
+        self._turn = 0
+
+
+    def add(self, graph):
+        self.graphs.append(graph)
+        # spread the first frames of the strips over one period
+        count = len(self.graphs)
+        for i in range(count):
+            self.graphs[i].next_show = time.monotonic_ns() + self.period * i // count
+        return graph
+
+
+    def update(self):
+        """Shows the next changed strip that is due, returns True if one was shown."""
+        count = len(self.graphs)
+        if count == 0:
+            return False
+        now = time.monotonic_ns()
+        for i in range(count):
+            pos = (self._turn + i) % count
+            graph = self.graphs[pos]
+            if graph.dirty and graph.next_show <= now:
+                graph.show()
+                graph.next_show = now + self.period
+                self.shows += 1
+                self._turn = (pos + 1) % count
+                return True
+        return False
@@ -0,0 +1,7 @@
+# Enables the second USB serial channel that streams session recordings,
+# see recording.py. Only CircuitPython 7 and later have usb_cdc.
+try:
+    import usb_cdc
+    usb_cdc.enable(console=True, data=True)
+except ImportError:
+    pass
@@ -0,0 +1,177 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 Stefan Rothe
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""
+`bus` - Shared I2C bus manager
+
+Wraps a ``busio.I2C`` object and offers the same interface, so it can be
+passed to ``I2CDevice`` in place of the bus. The transactions of one cycle
+are submitted with the address of the device they talk to, ordered by
+priority and address and run under a single bus lock. While a cycle holds the lock,
+the lock and unlock calls of the individual ``I2CDevice`` contexts cost
+nothing.
+
+Every transaction is counted in ``transactions`` and ``bytes``, and in
+``cycle_transactions`` and ``cycle_bytes`` while a cycle holds the lock.
+If a ``profiler.Profiler`` is given, the duration and size of every
+transaction is also recorded for the device it talks to. Without one, the
+transactions are not timed.
+"""
+
+import time
+
+# Sort key for transactions that do not belong to a specific device
+NO_ADDRESS = 0x80
+# Each priority level sorts before all addresses of the level below
+_PRIORITY_SHIFT = 8
+
+
+def _address_key(transaction):
+    return transaction[0]
+
+
+class BusManager:
+    def __init__(self, i2c, profiler=None):
+        self.i2c = i2c
+        self.profiler = profiler
+        self.cycle_ns = 0
+        self.max_cycle_ns = 0
+        self.cycle_transactions = 0
+        self.cycle_bytes = 0
+        self.transactions = 0
+        self.bytes = 0
+        self._held = False
+        self._queue = []
+
+
+    def __enter__(self):
+        while not self.i2c.try_lock():
+            pass
+        self._held = True
+        self.cycle_transactions = 0
+        self.cycle_bytes = 0
+        self._cycle_start = time.monotonic_ns()
+        return self
+
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.cycle_ns = time.monotonic_ns() - self._cycle_start
+        if self.cycle_ns > self.max_cycle_ns:
+            self.max_cycle_ns = self.cycle_ns
+        self._held = False
+        self.i2c.unlock()
+        return False
+
+
+    def submit(self, address, callback, priority=0):
+        if address is None:
+            address = NO_ADDRESS
+        self._queue.append((address - (priority << _PRIORITY_SHIFT), callback))
+
+
+    def run_cycle(self):
+        """Runs all submitted transactions under one lock, higher priorities
+        first, then ordered by address."""
+        if not self._queue:
+            return
+        self._queue.sort(key=_address_key)
+        try:
+            with self:
+                for transaction in self._queue:
+                    transaction[1]()
+        finally:
+            self._queue.clear()
+
+
+    def try_lock(self):
+        if self._held:
+            return True
+        return self.i2c.try_lock()
+
+
+    def unlock(self):
+        if not self._held:
+            self.i2c.unlock()
+
+
+    def scan(self):
+        return self.i2c.scan()
+
+
+    def readfrom_into(self, address, buffer, *, start=0, end=None):
+        if end is None:
+            end = len(buffer)
+        if not self.profiler:
+            self.i2c.readfrom_into(address, buffer, start=start, end=end)
+            self._count(end - start)
+            return
+        started = time.monotonic_ns()
+        self.i2c.readfrom_into(address, buffer, start=start, end=end)
+        self._profile(address, end - start, started)
+
+
+    def writeto(self, address, buffer, *, start=0, end=None):
+        if end is None:
+            end = len(buffer)
+        if not self.profiler:
+            self.i2c.writeto(address, buffer, start=start, end=end)
+            self._count(end - start)
+            return
+        started = time.monotonic_ns()
+        self.i2c.writeto(address, buffer, start=start, end=end)
+        self._profile(address, end - start, started)
+
+
+    def writeto_then_readfrom(
+        self, address, buffer_out, buffer_in, *, out_start=0, out_end=None, in_start=0, in_end=None
+    ):
+        if out_end is None:
+            out_end = len(buffer_out)
+        if in_end is None:
+            in_end = len(buffer_in)
+        if not self.profiler:
+            self.i2c.writeto_then_readfrom(
+                address, buffer_out, buffer_in,
+                out_start=out_start, out_end=out_end, in_start=in_start, in_end=in_end
+            )
+            self._count(out_end - out_start + in_end - in_start)
+            return
+        started = time.monotonic_ns()
+        self.i2c.writeto_then_readfrom(
+            address, buffer_out, buffer_in,
+            out_start=out_start, out_end=out_end, in_start=in_start, in_end=in_end
+        )
+        self._profile(address, out_end - out_start + in_end - in_start, started)
+
+
+    def _count(self, size):
+        self.transactions += 1
+        self.bytes += size
+        if self._held:
+            self.cycle_transactions += 1
+            self.cycle_bytes += size
+
+
+    def _profile(self, address, size, started):
+        duration = time.monotonic_ns() - started
+        self._count(size)
+        self.profiler.device(address).add_transaction(duration, size)
@@ -0,0 +1,128 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 Stefan Rothe
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""
+`buttons` - Debounced button events from both PCA9557 expanders
+
+Buttons 0 to 3 are the thumb buttons on the side expander, buttons 4 to 7
+the finger tip buttons, matching the digital pins of Junxion. Both
+expanders are read on bits 4 to 7.
+
+An edge is accepted as soon as it is seen, then further changes of the
+same button are ignored for the debounce time. Accepted edges go into a
+fixed-size queue as press or release events with their
+``time.monotonic_ns()`` timestamp, so a press shorter than the consumer's
+polling period is not lost.
+"""
+
+from micropython import const
+import array
+import time
+
+BUTTON_COUNT = const(8)
+DEBOUNCE_NS = const(5000000)
+EVENT_QUEUE_SIZE = const(32)
+# Set in the event code of a press, the lower bits hold the button
+PRESS = const(0x80)
+BUTTON_MASK = const(0x07)
+SIDE_SHIFT = const(0)
+TIP_SHIFT = const(4)
+
+
+class EventQueue:
+    def __init__(self, size=EVENT_QUEUE_SIZE):
+        self.times = array.array("q", [0] * size)
+        self.codes = array.array("B", [0] * size)
+        self.count = 0
+        self.overruns = 0
+        self._head = 0
+
+
+    def __len__(self):
+        return self.count
+
+
+    def put(self, timestamp, code):
+        size = len(self.codes)
+        if self.count == size:
+            # queue full, drop oldest event
+            self._head = (self._head + 1) % size
+            self.count -= 1
+            self.overruns += 1
+        pos = (self._head + self.count) % size
+        self.times[pos] = timestamp
+        self.codes[pos] = code
+        self.count += 1
+
+
+    def drain(self, times, codes):
+        """Moves the oldest events into the given arrays.
+
+        Returns the number of events moved.
+        """
+        size = len(self.codes)
+        n = min(self.count, len(times), len(codes))
+        for i in range(n):
+            pos = (self._head + i) % size
+            times[i] = self.times[pos]
+            codes[i] = self.codes[pos]
+        self._head = (self._head + n) % size
+        self.count -= n
+        return n
+
+
+class Buttons:
+    def __init__(self, side, tip, debounce_ns=DEBOUNCE_NS):
+        self.side = side
+        self.tip = tip
+        self.debounce_ns = debounce_ns
+        # debounced state, one bit per button
+        self.state = 0
+        self.events = EventQueue()
+        self._last_edge = array.array("q", [-debounce_ns] * BUTTON_COUNT)
+
+
+    def pressed(self, button):
+        return bool(self.state & (1 << button))
+
+
+    def sample_side(self):
+        if self.side:
+            self._update((self.side.read_input() >> 4) << SIDE_SHIFT, 0x0F << SIDE_SHIFT)
+
+
+    def sample_tip(self):
+        if self.tip:
+            self._update((self.tip.read_input() >> 4) << TIP_SHIFT, 0x0F << TIP_SHIFT)
+
+
+    def _update(self, raw, mask):
+        changed = (raw ^ self.state) & mask
+        if not changed:
+            return
+        now = time.monotonic_ns()
+        for button in range(BUTTON_COUNT):
+            bit = 1 << button
+            if changed & bit and now - self._last_edge[button] >= self.debounce_ns:
+                self.state ^= bit
+                self._last_edge[button] = now
+                self.events.put(now, button | PRESS if raw & bit else button)
@@ -0,0 +1,129 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 Stefan Rothe
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""
+`calibration` - Calibration store in the 24AA64 EEPROM
+
+Stores the BNO055 offset and radius registers and the range of every
+flex sensor channel at the start of the EEPROM:
+
+    magic "SG", version, payload length, flags, payload, Fletcher-16 checksum
+
+Bit 0 of the flags is set if the payload holds the IMU offsets. The
+payload is the 22 offset bytes of the IMU followed by minimum, maximum
+and minimum standard deviation of each finger as little endian floats.
+Records with a different version are ignored.
+"""
+
+from micropython import const
+import struct
+
+MAGIC = b"SG"
+VERSION = const(2)
+BASE_ADDRESS = const(0)
+HEADER_SIZE = const(5)
+FLAGS_OFFSET = const(4)
+FLAG_IMU = const(0x01)
+CHECKSUM_SIZE = const(2)
+IMU_SIZE = const(22)
+FINGER_FORMAT = "<fff"
+FINGER_SIZE = const(12)
+FINGER_COUNT = const(4)
+PAYLOAD_SIZE = const(IMU_SIZE + FINGER_COUNT * FINGER_SIZE)
+RECORD_SIZE = const(HEADER_SIZE + PAYLOAD_SIZE + CHECKSUM_SIZE)
+
+
+def fletcher16(data, start=0, end=None):
+    if end is None:
+        end = len(data)
+    sum1 = 0
+    sum2 = 0
+    for i in range(start, end):
+        sum1 = (sum1 + data[i]) % 255
+        sum2 = (sum2 + sum1) % 255
+    return (sum2 << 8) | sum1
+
+
+class Calibration:
+    def __init__(self, eeprom):
+        self.eeprom = eeprom
+        self.saved = False
+        self._record = bytearray(RECORD_SIZE)
+
+
+    def restore(self, imu, fingers):
+        """Loads the stored calibration, returns True if a valid record was found."""
+        record = self._record
+        self.eeprom.read_into(BASE_ADDRESS, record)
+        if record[0:2] != MAGIC or record[2] != VERSION or record[3] != PAYLOAD_SIZE:
+            return False
+        checksum = struct.unpack_from("<H", record, HEADER_SIZE + PAYLOAD_SIZE)[0]
+        if checksum != fletcher16(record, 2, HEADER_SIZE + PAYLOAD_SIZE):
+            return False
+        if imu and record[FLAGS_OFFSET] & FLAG_IMU:
+            imu.offsets = record[HEADER_SIZE:HEADER_SIZE + IMU_SIZE]
+        for i in range(FINGER_COUNT):
+            offset = HEADER_SIZE + IMU_SIZE + i * FINGER_SIZE
+            raw_min, raw_max, min_stddev = struct.unpack_from(FINGER_FORMAT, record, offset)
+            fingers[i].sensor.configure(raw_min, raw_max, min_stddev)
+        return True
+
+
+    def save(self, imu, fingers):
+        """Stores the current calibration, returns True if the EEPROM was written."""
+        record = bytearray(RECORD_SIZE)
+        record[0:2] = MAGIC
+        record[2] = VERSION
+        record[3] = PAYLOAD_SIZE
+        if imu:
+            record[FLAGS_OFFSET] = FLAG_IMU
+            record[HEADER_SIZE:HEADER_SIZE + IMU_SIZE] = imu.offsets
+        for i in range(FINGER_COUNT):
+            s = fingers[i].sensor
+            offset = HEADER_SIZE + IMU_SIZE + i * FINGER_SIZE
+            struct.pack_into(FINGER_FORMAT, record, offset, s.raw_min, s.raw_max, s.min_stddev)
+        struct.pack_into(
+            "<H", record, HEADER_SIZE + PAYLOAD_SIZE, fletcher16(record, 2, HEADER_SIZE + PAYLOAD_SIZE)
+        )
+        if record == self._record:
+            # unchanged, spare the write cycles
+            self.saved = True
+            return False
+        self.eeprom.write(BASE_ADDRESS, record)
+        # the record counts as saved once its last page is written
+        self.eeprom.wait()
+        self._record = record
+        self.saved = True
+        return True
+
+
+    def update(self, imu, fingers):
+        """Saves once per session as soon as the IMU is fully calibrated.
+
+        Nothing is written if the calibration equals the restored one.
+        Reading the IMU offsets switches to config mode and back, which
+        sleeps for about 30 ms, so this should not run within a bus cycle.
+        An ``OSError`` of the EEPROM or the IMU is passed on and ``saved``
+        stays False.
+        """
+        if not self.saved and imu and imu.calibrated:
+            self.save(imu, fingers)
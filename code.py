@@ -0,0 +1,263 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 Stefan Rothe
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import adafruit_bno055
+import bargraph
+import binascii
+import board
+import buttons
+import bus
+import busio
+import calibration
+import dashboard
+import eeprom
+import filters
+import finger
+import flex
+import gestures
+import junxion
+import policy
+import profiler
+import recording
+import samplelog
+import scheduler
+import settings
+import startup
+import supervisor
+import sys
+import time
+
+# All devices on the bus support fast mode
+I2C_FREQUENCY = 400000
+BUTTON_HZ = 1000
+# Each call shows at most one of the four strips
+LED_HZ = 4 * bargraph.DEFAULT_FPS
+# Fusion output data rate of the BNO055 in NDOF mode
+IMU_HZ = 100
+# Smoothing of the linear acceleration, 1 follows the sensor unfiltered
+IMU_FILTER_ALPHA = 0.5
+JUNXION_BAUDRATE = 115200
+# Data frames sent to the host per second
+JUNXION_HZ = 100
+CALIBRATION_HZ = 1
+# Upper limit, the dashboard only refreshes in the slack of the other tasks
+DASHBOARD_HZ = 30
+CONSOLE_HZ = 10
+# Frames per second of session recordings
+RECORD_HZ = 100
+# Frames per second of the offline sample log in the EEPROM
+LOG_HZ = 10
+
+profile = profiler.Profiler()
+i2c = bus.BusManager(busio.I2C(board.SCL, board.SDA, frequency=I2C_FREQUENCY), profile)
+boot = startup.Startup()
+
+# first phase: reset all devices, then wait once for the slowest
+fingers = finger.Fingers(i2c, wait=False, boot=boot)
+
+start = boot.start()
+try:
+    imu = adafruit_bno055.BNO055_I2C(i2c, wait=False)
+    boot.settle(adafruit_bno055.CONFIG_MODE_SETTLE_S)
+except (RuntimeError, ValueError):
+    print("No IMU detected")
+    imu = None
+boot.stop("imu", start)
+
+boot.wait()
+
+# second phase: finish initialization
+fingers.begin(boot)
+
+start = boot.start()
+board_settings = None
+board_id = junxion.BOARD_ID
+try:
+    store = calibration.Calibration(eeprom.EEPROM(i2c))
+    # the IMU is still in config mode, so offsets are written without mode switches
+    if store.restore(imu, fingers):
+        print("Calibration restored")
+    board_settings = settings.Settings(store.eeprom)
+    board_id = board_settings.load_board_id(board_id)
+except ValueError:
+    print("No EEPROM detected")
+    store = None
+boot.stop("eeprom", start)
+
+if imu:
+    start = boot.start()
+    boot.settle(imu.begin_mode(adafruit_bno055.NDOF_MODE))
+    boot.stop("imu", start)
+
+start = boot.start()
+try:
+    display = dashboard.Dashboard(i2c, fingers, frequency=I2C_FREQUENCY)
+except ValueError:
+    print("No display detected")
+    display = None
+boot.stop("display", start)
+
+boot.wait()
+boot.report()
+
+tasks = scheduler.Scheduler(bus=i2c, profiler=profile)
+tasks.add("buttons", fingers.update_buttons, BUTTON_HZ, finger.TIP_BUTTONS_ADDRESS)
+tasks.add("side buttons", fingers.update_side_buttons, BUTTON_HZ, finger.SIDE_BUTTONS_ADDRESS)
+# moving fingers get a faster flex rate and go first in the bus cycle
+rates = []
+for f in fingers:
+    if f.flex:
+        address = f.flex.i2c_device.device_address
+        rate = policy.AdaptiveRate(f)
+        rate.task = tasks.add("flex " + hex(address), rate.update, f.flex.sample_hz, address)
+        rates.append(rate)
+tasks.add("leds", fingers.update_leds, LED_HZ)
+
+if imu:
+    imu.fusion_filter = filters.Chain(
+        [filters.EMA(adafruit_bno055.FUSION_SIZE, IMU_FILTER_ALPHA)],
+        adafruit_bno055.FUSION_SIZE,
+        1000000 // IMU_HZ
+    )
+    imu.fusion_filter.select(
+        adafruit_bno055.LINEAR_ACCELERATION, adafruit_bno055.LINEAR_ACCELERATION + 3
+    )
+    tasks.add("imu", imu.read_fusion, IMU_HZ, imu.i2c_device.device_address)
+
+saving = True
+
+def update_calibration():
+    global saving
+    if not saving:
+        return
+    try:
+        store.update(imu, fingers)
+    except OSError as e:
+        print("Calibration not saved:", e)
+        saving = False
+
+if store:
+    # no address, the IMU mode switches of a save sleep outside the bus lock
+    tasks.add("calibration", update_calibration, CALIBRATION_HZ)
+
+def update_imu_status():
+    display.update_calibration(imu)
+
+if display:
+    if imu:
+        tasks.add("imu status", update_imu_status, CALIBRATION_HZ, imu.i2c_device.device_address)
+    tasks.add_idle("display", display.refresh, DASHBOARD_HZ)
+
+gesture_engine = None
+if imu:
+    gesture_engine = gestures.Gestures(fingers, imu)
+    tasks.add("gestures", gesture_engine.update, gestures.GESTURE_HZ)
+
+uart = busio.UART(board.TX, board.RX, baudrate=JUNXION_BAUDRATE, timeout=0)
+adapter = junxion.JunxionAdapter(fingers, board_id, gesture_engine, board_settings)
+host = junxion.Junxion(adapter, uart, profile)
+tasks.add("junxion", host.update, JUNXION_HZ)
+
+try:
+    import usb_cdc
+    record_stream = usb_cdc.data
+except ImportError:
+    record_stream = None
+
+if record_stream:
+    # never block the loop, a frame that does not fit is dropped
+    record_stream.write_timeout = 0
+    recorder = recording.Recorder(record_stream, fingers, imu, RECORD_HZ)
+    tasks.add("recording", recorder.update, RECORD_HZ)
+
+sample_log = None
+logging = False
+
+def open_log():
+    # opening scans the ring, so it waits until the log is first used
+    global sample_log
+    if not sample_log:
+        sample_log = samplelog.SampleLog(store.eeprom)
+    return sample_log
+
+def flex_angle(f):
+    if not f.flex:
+        return 0
+    return max(-0x8000, min(0x7FFF, int(f.flex_value * flex.ADS_ANGLE_SCALE)))
+
+def update_log():
+    global logging
+    if not logging:
+        return
+    state = fingers.buttons.state
+    try:
+        sample_log.append(
+            time.monotonic_ns() // 1000000,
+            flex_angle(fingers[0]), flex_angle(fingers[1]), flex_angle(fingers[2]), flex_angle(fingers[3]),
+            (state >> buttons.TIP_SHIFT) & 0x0F, (state >> buttons.SIDE_SHIFT) & 0x0F
+        )
+    except OSError:
+        print("EEPROM lost, logging stopped")
+        logging = False
+
+class HexConsole:
+    """Prints dumped log frames as hex, one frame per line."""
+
+    def write(self, data):
+        for i in range(0, len(data), samplelog.FRAME_SIZE):
+            print(binascii.hexlify(data[i:i + samplelog.FRAME_SIZE]).decode())
+
+if store:
+    tasks.add("log", update_log, LOG_HZ, store.eeprom.i2c_device.device_address)
+
+def update_console():
+    # 'p' on the serial console prints the profile, 'r' resets it
+    # 'l' starts and stops the sample log, 'd' dumps it, 'c' clears it
+    global logging
+    if not supervisor.runtime.serial_bytes_available:
+        return
+    key = sys.stdin.read(1)
+    if key == "p":
+        tasks.report()
+        profile.report()
+    elif key == "r":
+        tasks.reset_stats()
+        profile.reset()
+    elif key in ("l", "d", "c") and not store:
+        print("No EEPROM for the sample log")
+    elif key == "l":
+        logging = not logging
+        if logging:
+            print("Logging,", len(open_log()), "frames stored")
+        else:
+            sample_log.flush()
+            print("Logging stopped")
+    elif key == "d":
+        print("Sample log, frame format", samplelog.FRAME_FORMAT)
+        open_log().dump(HexConsole())
+    elif key == "c":
+        open_log().clear()
+        print("Sample log cleared")
+
+tasks.add("console", update_console, CONSOLE_HZ)
+
+tasks.run()
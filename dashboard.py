@@ -0,0 +1,282 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 Stefan Rothe
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""
+`dashboard` - Live status on the SSD1306 display
+
+Shows a bar per flex sensor, the state of the eight buttons and the
+calibration levels of the IMU on the 128x32 display at 0x3C. Auto refresh
+is off. Every element has a bitmap of its own, so displayio sends only the
+areas that changed. ``refresh()`` runs in the slack of the scheduler and
+draws no more than fits into its time budget; flex bars that move further
+than that catch up over the next calls.
+
+Before every area, ``refresh()`` checks the clock: the time spent so far,
+the time to send the areas drawn and the cost of the next area must fit
+into the budget. The time to draw a pixel and to send a byte are measured
+on every refresh, so the estimates follow the real costs on the glove.
+"""
+
+from micropython import const
+from adafruit_bus_device.i2c_device import I2CDevice
+import adafruit_displayio_ssd1306
+import displayio
+import finger
+import time
+
+DISPLAY_ADDRESS = const(0x3C)
+WIDTH = const(128)
+HEIGHT = const(32)
+I2C_FREQUENCY = 400000
+NS_PER_S = const(1000000000)
+# Each byte on the bus takes 8 data bits and one acknowledge bit
+BITS_PER_BYTE = const(9)
+# Control and addressing bytes sent with every refreshed area, plus the
+# start, address and stop conditions of its two transactions
+AREA_OVERHEAD = const(13)
+# Time to draw a pixel until refresh() has measured it
+DRAW_NS_PER_PIXEL = const(5000)
+# Longest time of one refresh, a full frame takes about 12 ms at 400 kHz
+REFRESH_BUDGET_NS = const(2000000)
+# High enough that refresh() never waits to pace the frame rate
+REFRESH_TARGET_FPS = const(1000)
+
+FINGER_COUNT = const(4)
+# Flex bars, one per display page
+BAR_WIDTH = const(96)
+BAR_HEIGHT = const(6)
+ROW_HEIGHT = const(8)
+# Side buttons in the first column, tip buttons in the second
+BUTTON_X = const(100)
+BUTTON_SIZE = const(6)
+BUTTON_COUNT = const(8)
+# System, gyroscope, accelerometer and magnetometer calibration, 0 to 3
+CALIBRATION_X = const(118)
+CALIBRATION_COUNT = const(4)
+CALIBRATION_BAR_WIDTH = const(2)
+CALIBRATION_STEP = const(10)
+
+
+def _follow(estimate, measured):
+    """Moves a cost estimate to a measurement, at once upwards and slowly
+    downwards, so a single fast run does not cause overruns."""
+    if measured >= estimate:
+        return measured
+    return estimate - ((estimate - measured) >> 3)
+
+
+def _fill(bitmap, x0, x1, y0, y1, value):
+    for y in range(y0, y1):
+        for x in range(x0, x1):
+            bitmap[x, y] = value
+
+
+class Dashboard:
+    def __init__(self, i2c, fingers, address=DISPLAY_ADDRESS,
+                 frequency=I2C_FREQUENCY, budget_ns=REFRESH_BUDGET_NS):
+        """Raises ValueError if there is no display at the address.
+
+        The display gets the raw ``busio.I2C`` object, as displayio does
+        its own locking.
+        """
+        I2CDevice(i2c, address)
+        displayio.release_displays()
+        display_bus = displayio.I2CDisplay(getattr(i2c, "i2c", i2c), device_address=address)
+        self.display = adafruit_displayio_ssd1306.SSD1306(
+            display_bus, width=WIDTH, height=HEIGHT, auto_refresh=False
+        )
+        self.fingers = fingers
+        self.budget_ns = budget_ns
+        # measured costs, starting from the wire time of a byte and a guess
+        self.ns_per_byte = BITS_PER_BYTE * NS_PER_S // frequency
+        self.pixel_ns = DRAW_NS_PER_PIXEL
+        self.refreshes = 0
+        self.bytes = 0
+        self.deferred = 0
+        self._deadline = 0
+        palette = displayio.Palette(2)
+        palette[0] = 0x000000
+        palette[1] = 0xFFFFFF
+        group = displayio.Group(max_size=FINGER_COUNT + BUTTON_COUNT + CALIBRATION_COUNT)
+        self._bars = []
+        self._bar_shown = bytearray(FINGER_COUNT)
+        self._next_bar = 0
+        for i in range(FINGER_COUNT):
+            self._bars.append(self._add(group, palette, BAR_WIDTH, BAR_HEIGHT, 0, i * ROW_HEIGHT))
+        self._buttons = []
+        self._button_state = 0
+        for i in range(BUTTON_COUNT):
+            self._buttons.append(self._add(
+                group, palette, BUTTON_SIZE, BUTTON_SIZE,
+                BUTTON_X + (i // 4) * ROW_HEIGHT, (i % 4) * ROW_HEIGHT
+            ))
+        self._calibration = []
+        self._calibration_shown = bytearray(CALIBRATION_COUNT)
+        self._calibration_state = bytearray(CALIBRATION_COUNT)
+        for i in range(CALIBRATION_COUNT):
+            self._calibration.append(self._add(
+                group, palette, CALIBRATION_BAR_WIDTH, HEIGHT,
+                CALIBRATION_X + i * (CALIBRATION_BAR_WIDTH + 1), 0
+            ))
+        self.display.show(group)
+        start = time.monotonic_ns()
+        self.display.refresh(target_frames_per_second=REFRESH_TARGET_FPS, minimum_frames_per_second=0)
+        # the first frame sends the whole display
+        self.ns_per_byte = _follow(
+            self.ns_per_byte, (time.monotonic_ns() - start) // (WIDTH * HEIGHT // ROW_HEIGHT + AREA_OVERHEAD)
+        )
+
+
+    def update_calibration(self, imu):
+        """Reads the calibration levels, run as a task of the IMU's bus cycle."""
+        levels = imu.calibration_status
+        for i in range(CALIBRATION_COUNT):
+            self._calibration_state[i] = levels[i]
+
+
+    def refresh(self, budget_ns):
+        """Draws the changes that fit into the budget and sends them."""
+        if budget_ns > self.budget_ns:
+            budget_ns = self.budget_ns
+        self._deadline = time.monotonic_ns() + budget_ns
+        spent = self._draw_buttons()
+        spent += self._draw_calibration(spent)
+        spent += self._draw_bars(spent)
+        if spent:
+            start = time.monotonic_ns()
+            self.display.refresh(
+                target_frames_per_second=REFRESH_TARGET_FPS, minimum_frames_per_second=0
+            )
+            self.ns_per_byte = _follow(self.ns_per_byte, (time.monotonic_ns() - start) // spent)
+            self.refreshes += 1
+            self.bytes += spent
+        if self._pending():
+            self.deferred += 1
+
+
+    def _add(self, group, palette, width, height, x, y):
+        bitmap = displayio.Bitmap(width, height, 2)
+        group.append(displayio.TileGrid(bitmap, pixel_shader=palette, x=x, y=y))
+        return bitmap
+
+
+    def _left_ns(self, spent):
+        """Returns the time left once the areas drawn so far are sent."""
+        return self._deadline - time.monotonic_ns() - spent * self.ns_per_byte
+
+
+    def _fits(self, spent, pixels, size):
+        """True if an area can still be drawn and sent within the budget."""
+        return pixels * self.pixel_ns + (size + AREA_OVERHEAD) * self.ns_per_byte <= self._left_ns(spent)
+
+
+    def _drawn(self, start, pixels):
+        self.pixel_ns = _follow(self.pixel_ns, (time.monotonic_ns() - start) // pixels)
+
+
+    def _draw_buttons(self):
+        spent = 0
+        state = self.fingers.buttons.state
+        changed = state ^ self._button_state
+        pixels = BUTTON_SIZE * BUTTON_SIZE
+        for i in range(BUTTON_COUNT):
+            mask = 1 << i
+            if not changed & mask:
+                continue
+            if not self._fits(spent, pixels, BUTTON_SIZE):
+                break
+            start = time.monotonic_ns()
+            _fill(self._buttons[i], 0, BUTTON_SIZE, 0, BUTTON_SIZE, 1 if state & mask else 0)
+            self._drawn(start, pixels)
+            self._button_state ^= mask
+            spent += BUTTON_SIZE + AREA_OVERHEAD
+        return spent
+
+
+    def _draw_calibration(self, spent_before):
+        spent = 0
+        size = CALIBRATION_BAR_WIDTH * (HEIGHT // ROW_HEIGHT)
+        for i in range(CALIBRATION_COUNT):
+            shown = self._calibration_shown[i]
+            level = self._calibration_state[i]
+            if level == shown:
+                continue
+            # levels grow upwards from the bottom edge
+            low = min(shown, level) * CALIBRATION_STEP
+            high = max(shown, level) * CALIBRATION_STEP
+            pixels = CALIBRATION_BAR_WIDTH * (high - low)
+            if not self._fits(spent_before + spent, pixels, size):
+                break
+            start = time.monotonic_ns()
+            _fill(
+                self._calibration[i], 0, CALIBRATION_BAR_WIDTH,
+                HEIGHT - high, HEIGHT - low, 1 if level > shown else 0
+            )
+            self._drawn(start, pixels)
+            self._calibration_shown[i] = level
+            spent += size + AREA_OVERHEAD
+        return spent
+
+
+    def _draw_bars(self, spent_before):
+        spent = 0
+        for _ in range(FINGER_COUNT):
+            i = self._next_bar
+            self._next_bar = (i + 1) % FINGER_COUNT
+            shown = self._bar_shown[i]
+            length = self._bar_length(i)
+            if length == shown:
+                continue
+            # a bar lies within one page, every column is one byte
+            left = self._left_ns(spent_before + spent) - AREA_OVERHEAD * self.ns_per_byte
+            columns = left // (BAR_HEIGHT * self.pixel_ns + self.ns_per_byte)
+            if columns <= 0:
+                continue
+            start = time.monotonic_ns()
+            if length > shown:
+                length = min(length, shown + columns)
+                _fill(self._bars[i], shown, length, 0, BAR_HEIGHT, 1)
+            else:
+                length = max(length, shown - columns)
+                _fill(self._bars[i], length, shown, 0, BAR_HEIGHT, 0)
+            self._drawn(start, BAR_HEIGHT * abs(length - shown))
+            spent += abs(length - shown) + AREA_OVERHEAD
+            self._bar_shown[i] = length
+        return spent
+
+
+    def _bar_length(self, i):
+        f = self.fingers[i]
+        if not f.flex:
+            return 0
+        return min(BAR_WIDTH, int(BAR_WIDTH * abs(f.flex_value) / finger.FLEX_FULL_SCALE))
+
+
+    def _pending(self):
+        if self.fingers.buttons.state != self._button_state:
+            return True
+        if self._calibration_state != self._calibration_shown:
+            return True
+        for i in range(FINGER_COUNT):
+            if self._bar_length(i) != self._bar_shown[i]:
+                return True
+        return False
@@ -0,0 +1,117 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 Stefan Rothe
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""
+`eeprom` - Microchip 24AA64 serial EEPROM device driver
+
+8 KiB of memory addressed with two bytes. Writes must not cross a 32 byte
+page, so longer writes are split at page boundaries. After a page write
+the chip does not acknowledge its address until the write cycle is
+complete. Instead of sleeping for the worst case, the driver polls for
+that acknowledge before the next access, so the caller can keep working
+while the chip is busy. Reads of any length run as a single sequential
+transaction.
+"""
+
+from adafruit_bus_device.i2c_device import I2CDevice
+from micropython import const
+import time
+
+EEPROM_SIZE = const(8192)
+PAGE_SIZE = const(32)
+# Give up polling after ten times the maximum write cycle time
+WRITE_TIMEOUT_NS = const(50000000)
+
+
+class EEPROM:
+    def __init__(self, i2c, address=0x50):
+        self.i2c_device = I2CDevice(i2c, address)
+        self.busy_polls = 0
+        self._page = bytearray(2 + PAGE_SIZE)
+        self._busy = False
+
+
+    def __len__(self):
+        return EEPROM_SIZE
+
+
+    @property
+    def busy(self):
+        """True while the last page write is still in its write cycle."""
+        if self._busy:
+            self._busy = not self._acknowledged()
+        return self._busy
+
+
+    def read_into(self, mem_address, buf, start=0, end=None):
+        if end is None:
+            end = len(buf)
+        self._check(mem_address, end - start)
+        self.wait()
+        self._page[0] = mem_address >> 8
+        self._page[1] = mem_address & 0xFF
+        with self.i2c_device as i2c:
+            i2c.write_then_readinto(self._page, buf, out_end=2, in_start=start, in_end=end)
+
+
+    def write(self, mem_address, data):
+        self._check(mem_address, len(data))
+        pos = 0
+        while pos < len(data):
+            address = mem_address + pos
+            size = min(PAGE_SIZE - address % PAGE_SIZE, len(data) - pos)
+            self.wait()
+            page = self._page
+            page[0] = address >> 8
+            page[1] = address & 0xFF
+            for i in range(size):
+                page[2 + i] = data[pos + i]
+            with self.i2c_device as i2c:
+                i2c.write(page, end=2 + size)
+            self._busy = True
+            pos += size
+
+
+    def wait(self):
+        """Polls until the current write cycle is complete."""
+        if not self._busy:
+            return
+        deadline = time.monotonic_ns() + WRITE_TIMEOUT_NS
+        while not self._acknowledged():
+            if time.monotonic_ns() > deadline:
+                raise OSError("EEPROM write timed out")
+        self._busy = False
+
+
+    def _acknowledged(self):
+        self.busy_polls += 1
+        try:
+            with self.i2c_device as i2c:
+                i2c.write(self._page, end=0)
+            return True
+        except OSError:
+            return False
+
+
+    def _check(self, mem_address, size):
+        if mem_address < 0 or mem_address + size > EEPROM_SIZE:
+            raise ValueError("EEPROM address out of range")
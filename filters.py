@@ -0,0 +1,213 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 Stefan Rothe
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""
+`filters` - Fixed-point filters for sensor channels
+
+Every filter keeps the state of all its channels in preallocated arrays
+and works on integers only, so filtering a sample never allocates. Inputs
+are raw 16 bit sensor values, like flex angles in 1/64 degree or BNO055
+output registers. Internal state carries ``FRACTION_BITS`` extra bits.
+All intermediate products stay below 2**30, the small integer range of
+CircuitPython.
+
+A ``Chain`` runs its filters one after the other. ``process(channel,
+value)`` of every filter takes the time since the channel's last sample
+from the chain's ``period_us``.
+"""
+
+from micropython import const
+import array
+
+FRACTION_BITS = const(4)
+ALPHA_BITS = const(8)
+ALPHA_ONE = const(256)
+# Time constant in microseconds of a 1 mHz cutoff, 1e9 / (2 * pi)
+TAU_US_MHZ = const(159154943)
+MAX_CUTOFF_MHZ = const(1000000)
+MAX_PERIOD_US = const(1000000)
+# Largest rate of change in units per second, keeps products in range
+MAX_RATE = const(0x100000)
+# Largest One Euro beta in 1/256 mHz per unit per second
+MAX_BETA = const(512)
+
+
+def _alpha(period_us, cutoff_mhz):
+    """Smoothing factor in 1/ALPHA_ONE of a low pass at the given cutoff."""
+    tau_us = TAU_US_MHZ // cutoff_mhz
+    alpha = (period_us << ALPHA_BITS) // (period_us + tau_us)
+    return alpha if alpha > 0 else 1
+
+
+def _clamp(value, limit):
+    if value > limit:
+        return limit
+    if value < -limit:
+        return -limit
+    return value
+
+
+class EMA:
+    """Exponential moving average with a fixed smoothing factor."""
+
+    def __init__(self, channels, alpha):
+        self.alpha = min(ALPHA_ONE, max(1, int(alpha * ALPHA_ONE)))
+        self.state = array.array("i", [0] * channels)
+        self.primed = bytearray(channels)
+
+
+    def process(self, channel, value, period_us):
+        if not self.primed[channel]:
+            self.primed[channel] = 1
+            self.state[channel] = value << FRACTION_BITS
+            return value
+        state = self.state[channel]
+        state += (self.alpha * ((value << FRACTION_BITS) - state)) >> ALPHA_BITS
+        self.state[channel] = state
+        return (state + (1 << (FRACTION_BITS - 1))) >> FRACTION_BITS
+
+
+    def reset(self):
+        for i in range(len(self.primed)):
+            self.primed[i] = 0
+
+
+class Median:
+    """Median of the last ``window`` values, removes single spikes."""
+
+    def __init__(self, channels, window=3):
+        self.window = window
+        self.history = array.array("i", [0] * (channels * window))
+        self.count = bytearray(channels)
+        self.pos = bytearray(channels)
+        self._sorted = array.array("i", [0] * window)
+
+
+    def process(self, channel, value, period_us):
+        window = self.window
+        base = channel * window
+        pos = self.pos[channel]
+        self.history[base + pos] = value
+        self.pos[channel] = (pos + 1) % window
+        n = self.count[channel]
+        if n < window:
+            n += 1
+            self.count[channel] = n
+        # insertion sort of the filled part of the window
+        values = self._sorted
+        for i in range(n):
+            v = self.history[base + i]
+            j = i
+            while j > 0 and values[j - 1] > v:
+                values[j] = values[j - 1]
+                j -= 1
+            values[j] = v
+        return values[n // 2]
+
+
+    def reset(self):
+        for i in range(len(self.count)):
+            self.count[i] = 0
+            self.pos[i] = 0
+
+
+class OneEuro:
+    """One Euro filter: a low pass whose cutoff rises with the speed.
+
+    Slow movements are smoothed with ``min_cutoff`` in Hz, fast ones
+    follow with little lag. ``beta`` is in Hz per unit per second,
+    ``d_cutoff`` in Hz smooths the speed estimate.
+    """
+
+    def __init__(self, channels, min_cutoff=1.0, beta=0.0, d_cutoff=1.0):
+        self.min_cutoff = max(1, int(min_cutoff * 1000))
+        self.d_cutoff = max(1, int(d_cutoff * 1000))
+        self.beta = int(beta * 1000 * 256)
+        if self.beta > MAX_BETA:
+            raise ValueError("beta too large")
+        self.state = array.array("i", [0] * channels)
+        self.rate = array.array("i", [0] * channels)
+        self.previous = array.array("i", [0] * channels)
+        self.primed = bytearray(channels)
+
+
+    def process(self, channel, value, period_us):
+        if not self.primed[channel]:
+            self.primed[channel] = 1
+            self.state[channel] = value << FRACTION_BITS
+            self.rate[channel] = 0
+            self.previous[channel] = value
+            return value
+        if period_us > MAX_PERIOD_US:
+            period_us = MAX_PERIOD_US
+        # rate of change in units per second, 1e6 / period_us as 15625 / (period_us / 64)
+        delta = value - self.previous[channel]
+        self.previous[channel] = value
+        rate = _clamp(delta * 15625 // ((period_us >> 6) or 1), MAX_RATE)
+        smoothed_rate = self.rate[channel]
+        smoothed_rate += (_alpha(period_us, self.d_cutoff) * (rate - smoothed_rate)) >> ALPHA_BITS
+        self.rate[channel] = smoothed_rate
+        cutoff = self.min_cutoff + ((smoothed_rate if smoothed_rate > 0 else -smoothed_rate) * self.beta >> 8)
+        if cutoff > MAX_CUTOFF_MHZ:
+            cutoff = MAX_CUTOFF_MHZ
+        state = self.state[channel]
+        state += (_alpha(period_us, cutoff) * ((value << FRACTION_BITS) - state)) >> ALPHA_BITS
+        self.state[channel] = state
+        return (state + (1 << (FRACTION_BITS - 1))) >> FRACTION_BITS
+
+
+    def reset(self):
+        for i in range(len(self.primed)):
+            self.primed[i] = 0
+
+
+class Chain:
+    """Runs filters one after the other on selected channels.
+
+    Channels outside the selection pass unchanged.
+    """
+
+    def __init__(self, filters, channels, period_us):
+        self.filters = filters
+        self.period_us = period_us
+        self.selected = bytearray(b"\x01" * channels)
+
+
+    def select(self, start, end):
+        """Filters only the channels from start up to end."""
+        for i in range(len(self.selected)):
+            self.selected[i] = 1 if start <= i < end else 0
+
+
+    def process(self, channel, value):
+        if not self.selected[channel]:
+            return value
+        filters = self.filters
+        for i in range(len(filters)):
+            value = filters[i].process(channel, value, self.period_us)
+        return value
+
+
+    def reset(self):
+        filters = self.filters
+        for i in range(len(filters)):
+            filters[i].reset()
@@ -20,74 +20,228 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
 
+import bargraph
+import buttons
+import filters
 import flex
 import board
 import pca9557
-import time
 import neopixel
+import sensor
+import array
+import time
 
 NEOPIXEL_COUNT = 20
 NEOPIXEL_BRIGHTNESS = 0.2
+# Bending angle in degrees that lights the complete bar
+FLEX_FULL_SCALE = 120
+# Standard deviation in degrees above which a finger counts as moving
+FLEX_MIN_STDDEV = 1.0
+SIDE_BUTTONS_ADDRESS = 0x18
+TIP_BUTTONS_ADDRESS = 0x19
+# Samples in the median window that removes single spikes
+FLEX_MEDIAN_WINDOW = 3
+# One Euro cutoff in Hz at rest, and its rise in Hz per degree per second
+FLEX_MIN_CUTOFF = 1.0
+FLEX_BETA = 0.007
+
+
+def flex_filter():
+    """Default filter chain for the axes of a flex sensor."""
+    return filters.Chain(
+        [
+            filters.Median(flex.MAX_AXES, FLEX_MEDIAN_WINDOW),
+            filters.OneEuro(flex.MAX_AXES, FLEX_MIN_CUTOFF, FLEX_BETA / flex.ADS_ANGLE_SCALE)
+        ],
+        flex.MAX_AXES,
+        0
+    )
 
 class Finger:
-    def __init__(self, i2c, flex_address, button_mask, neopixel_pin):
+    def __init__(self, i2c, flex_address, button_mask, neopixel_pin, boot=None):
+        start = time.monotonic_ns()
         try:
-            self.flex = flex.Flex(i2c, flex_address)
+            self.flex = flex.Flex(i2c, flex_address, wait=False)
         except:
-            print("No flex sensor at", flex_address, "detected")
+            print("No flex sensor at", hex(flex_address), "detected")
             self.flex = None
+        if boot:
+            boot.stop("flex " + hex(flex_address), start)
+            if self.flex:
+                boot.settle(flex.RESET_SETTLE_S)
         self._button_mask = button_mask
         self.button_pressed = False
-        self._flex_value = 0
-        self._neopixel = neopixel.NeoPixel(
-            neopixel_pin, NEOPIXEL_COUNT, brightness=NEOPIXEL_BRIGHTNESS, auto_write=False
+        self.layout_version = 0
+        self.flex_value = 0
+        # filtered angles of all axes, flex_value is the first one
+        self.flex_values = array.array("f", [0.0] * flex.MAX_AXES)
+        self.filter = flex_filter()
+        # samples drained from the ring buffer of the flex sensor
+        self._sample_times = array.array("q", [0] * flex.SAMPLE_BUFFER_SIZE)
+        self._sample_values = array.array("f", [0.0] * (flex.SAMPLE_BUFFER_SIZE * flex.MAX_AXES))
+        self.sensor = sensor.Sensor()
+        self.sensor.configure(-FLEX_FULL_SCALE, FLEX_FULL_SCALE, FLEX_MIN_STDDEV)
+        self.bar = bargraph.BarGraph(
+            neopixel.NeoPixel(
+                neopixel_pin, NEOPIXEL_COUNT, brightness=NEOPIXEL_BRIGHTNESS, auto_write=False
+            ),
+            FLEX_FULL_SCALE
         )
 
 
+    def begin(self, boot=None):
+        """Finishes the flex sensor setup once its reset has settled."""
+        if not self.flex:
+            return
+        start = time.monotonic_ns()
+        address = self.flex.i2c_device.device_address
+        try:
+            self.flex.begin()
+            self.flex.start_streaming()
+        except (OSError, RuntimeError):
+            print("No flex sensor at", hex(address), "detected")
+            self.flex = None
+        if boot:
+            boot.stop("flex " + hex(address), start)
+
+
     def update(self, button_state):
-        self.button_pressed = button_state & self.button_mask
-        if self.flex:
-            self.flex.poll()
-            self.flex_value = self.flex.read_sample()
-            self.flex.stop()
-        if self.flex_value:
-            self.update_neopixel()
+        self.update_button(button_state)
+        self.update_flex()
 
 
-    def update_neopixel(self):
-        k = NEOPIXEL_COUNT * abs(self.flex_value) / 120
-        print(self.flex_value, k)
-        for i in range(NEOPIXEL_COUNT):
-            self._neopixel[i] = (0, 0, 0) if k < i else (255, 0, 0)
-        self._neopixel.show()
+    def update_button(self, button_state):
+        self.button_pressed = bool(button_state & self._button_mask)
+
+
+    def update_flex(self):
+        """Reads a due sample and runs all queued samples through the filter and the sensor."""
+        if not self.flex:
+            return
+        try:
+            self.flex.update()
+        except OSError:
+            self._flex_lost()
+            return
+        n = self.flex.read_samples(self._sample_times, self._sample_values)
+        if not n:
+            return
+        chain = self.filter
+        chain.period_us = self.flex.sample_period // 1000
+        axes = self.flex.axes
+        values = self.flex_values
+        for i in range(n):
+            for axis in range(axes):
+                # queued angles are whole steps of 1/ADS_ANGLE_SCALE degree
+                raw = int(self._sample_values[i * axes + axis] * flex.ADS_ANGLE_SCALE)
+                values[axis] = chain.process(axis, raw) / flex.ADS_ANGLE_SCALE
+            self.sensor.add_measurement(self._sample_times[i] // 1000000, values[0])
+        self.flex_value = values[0]
+        self.bar.set_value(self.flex_value)
+
+
+    def set_flex_rate(self, rate):
+        """Sets the sample rate of the flex sensor, returns False if it was lost."""
+        if not self.flex:
+            return False
+        try:
+            self.flex.set_sample_rate(rate)
+        except OSError:
+            self._flex_lost()
+            return False
+        return True
+
+
+    def _flex_lost(self):
+        print("Flex sensor at", hex(self.flex.i2c_device.device_address), "lost")
+        self.flex = None
+        self.layout_version += 1
 
 
 class Fingers:
-    def __init__(self, i2c):
-        self.index = Finger(i2c, 0x12, 0x1, board.A0)
-        self.middle = Finger(i2c, 0x13, 0x2, board.A1)
-        self.ring = Finger(i2c, 0x14, 0x4, board.A2)
-        self.little = Finger(i2c, 0x15, 0x8, board.A3)
+    def __init__(self, i2c, wait=True, boot=None):
+        """Resets all flex sensors at once.
+
+        With wait=False, the caller waits for the resets to settle and
+        calls begin().
+        """
+        self.index = Finger(i2c, 0x12, 0x1, board.A0, boot)
+        self.middle = Finger(i2c, 0x13, 0x2, board.A1, boot)
+        self.ring = Finger(i2c, 0x14, 0x4, board.A2, boot)
+        self.little = Finger(i2c, 0x15, 0x8, board.A3, boot)
         self._fingers = [self.index, self.middle, self.ring, self.little]
-        self._buttons = pca9557.PCA9557(i2c, 0x19)
+        self.bars = bargraph.BarGraphs()
+        for finger in self._fingers:
+            self.bars.add(finger.bar)
+        self._buttons = pca9557.PCA9557(i2c, TIP_BUTTONS_ADDRESS)
         self._buttons.write_config(0xF0)
         self._buttons.write_polarity(0xF0)
+        try:
+            self._side_buttons = pca9557.PCA9557(i2c, SIDE_BUTTONS_ADDRESS)
+            self._side_buttons.write_config(0xF0)
+            self._side_buttons.write_polarity(0xF0)
+        except ValueError:
+            print("No side buttons at", hex(SIDE_BUTTONS_ADDRESS), "detected")
+            self._side_buttons = None
+        self.buttons = buttons.Buttons(self._side_buttons, self._buttons)
+        if wait:
+            time.sleep(flex.RESET_SETTLE_S)
+            self.begin()
+
+
+    def begin(self, boot=None):
+        for finger in self._fingers:
+            finger.begin(boot)
 
 
     def __getitem__(self, index):
         return self._fingers[index]
 
 
+    @property
+    def layout_version(self):
+        result = 0
+        for finger in self._fingers:
+            result += finger.layout_version
+        return result
+
+
+    def thumb_pressed(self, pin):
+        return self.buttons.pressed(buttons.SIDE_SHIFT + pin)
+
+
     def update(self):
-        state = (self._buttons.read_input() & 0xF0) >> 4
-        self._buttons.write_output(0xFF - state)
+        self.update_buttons()
+        self.update_side_buttons()
+        for finger in self._fingers:
+            finger.update_flex()
+        self.update_leds()
+
+
+    def update_leds(self):
+        self.bars.update()
+
+
+    def submit(self, bus):
+        """Submits the transactions of a full update to a bus.BusManager cycle."""
+        bus.submit(TIP_BUTTONS_ADDRESS, self.update_buttons)
+        if self._side_buttons:
+            bus.submit(SIDE_BUTTONS_ADDRESS, self.update_side_buttons)
         for finger in self._fingers:
-            finger.update(state)
+            if finger.flex:
+                bus.submit(finger.flex.i2c_device.device_address, finger.update_flex)
 
 
-i2c = board.I2C()
-fingers = Fingers(i2c)
+    def update_buttons(self):
+        self.buttons.sample_tip()
+        state = (self.buttons.state >> buttons.TIP_SHIFT) & 0x0F
+        self._buttons.write_output(0xFF - state)
+        for finger in self._fingers:
+            finger.update_button(state)
+
 
-while True:
-    fingers.update()
-    time.sleep(0.001)
+    def update_side_buttons(self):
+        if self._side_buttons:
+            self.buttons.sample_side()
+            state = (self.buttons.state >> buttons.SIDE_SHIFT) & 0x0F
+            self._side_buttons.write_output(0xFF - state)
@@ -23,12 +23,19 @@
 """
 `flex` - Bend Labs Soft Flex sensor device driver
 
-Currently only supports one-axis sensor
+Supports the one-axis and two-axis sensors. A sample holds one angle in
+degrees per axis.
+
+In streaming mode the sensor is switched to poll mode once and a sample is
+read only when one is due according to the sample rate. Samples are stored
+with their ``time.monotonic_ns()`` timestamp in a fixed-size ring buffer,
+from which ``read_samples()`` takes all queued samples at once.
 """
 
 from adafruit_bus_device.i2c_device import I2CDevice
 from micropython import const
-import board
+import array
+import struct
 import time
 
 ADS_1_HZ = const(16384)
@@ -40,35 +47,186 @@ ADS_200_HZ = const(81)
 ADS_333_HZ = const(49)
 ADS_500_HZ = const(32)
 
+# The sample rate is given in ticks of this clock
+ADS_CLOCK_HZ = const(16384)
+NS_PER_S = const(1000000000)
+SAMPLE_BUFFER_SIZE = const(32)
+# Time the sensor needs after a reset
+RESET_SETTLE_S = 0.05
+MAX_AXES = const(2)
+# Commands are a command byte and two argument bytes
+COMMAND_SIZE = const(3)
+# Packet type of a sample, followed by a little endian 16 bit angle per axis
+ADS_SAMPLE = const(0)
+ADS_DEV_ID = const(2)
+# Angles are sent in 1/64 degree
+ADS_ANGLE_SCALE = 64.0
+
+
+class SampleBuffer:
+    """Ring buffer of timestamped samples, ``axes`` values per sample."""
+
+    def __init__(self, size=SAMPLE_BUFFER_SIZE, axes=1):
+        self.axes = axes
+        self.times = array.array("q", [0] * size)
+        self.values = array.array("f", [0.0] * (size * axes))
+        self.count = 0
+        self.overruns = 0
+        self._head = 0
+
+
+    def __len__(self):
+        return self.count
+
+
+    def append(self, timestamp, values):
+        size = len(self.times)
+        axes = self.axes
+        pos = (self._head + self.count) % size
+        self.times[pos] = timestamp
+        for axis in range(axes):
+            self.values[pos * axes + axis] = values[axis]
+        if self.count < size:
+            self.count += 1
+        else:
+            # buffer full, drop oldest sample
+            self._head = (self._head + 1) % size
+            self.overruns += 1
+
+
+    def clear(self):
+        self.count = 0
+        self._head = 0
+
+
+    def drain(self, times, values):
+        """Moves the oldest samples into the given arrays.
+
+        ``values`` receives ``axes`` values per sample, one sample after
+        the other. Returns the number of samples moved.
+        """
+        size = len(self.times)
+        axes = self.axes
+        n = min(self.count, len(times), len(values) // axes)
+        for i in range(n):
+            pos = (self._head + i) % size
+            times[i] = self.times[pos]
+            for axis in range(axes):
+                values[i * axes + axis] = self.values[pos * axes + axis]
+        self._head = (self._head + n) % size
+        self.count -= n
+        return n
+
+
 class Flex:
-    def __init__(self, i2c, address=0x12):
+    def __init__(self, i2c, address=0x12, wait=True):
         self.i2c_device = I2CDevice(i2c, address)
-        self.buf = bytearray(3)
+        self.buf = bytearray(1 + 2 * MAX_AXES)
+        self.axes = 1
+        self.polling = False
+        self.streaming = False
+        # angle of the first axis and angles of all axes of the last sample
+        self.sample = None
+        self.values = array.array("f", [0.0] * MAX_AXES)
+        # the same angles in 1/ADS_ANGLE_SCALE degree as read from the sensor
+        self.raw = array.array("h", [0] * MAX_AXES)
+        self.sample_time = 0
+        self.samples = SampleBuffer()
+        self._sample_size = 1 + 2 * self.axes
+        self._next_sample = 0
         self.reset()
-        # Wait for device to  be reset
-        time.sleep(0.05)
-        self.axes = self._read_device_type()
-        if self.axes != 1:
+        if wait:
+            # Wait for device to  be reset
+            time.sleep(RESET_SETTLE_S)
+            self.begin()
+
+
+    def begin(self):
+        """Finishes initialization once RESET_SETTLE_S has passed after the reset."""
+        axes = self._read_device_type()
+        if axes is None or not 1 <= axes <= MAX_AXES:
             raise RuntimeError("Invalid device type.")
+        if axes != self.axes or self.samples.axes != axes:
+            self.axes = axes
+            self.samples = SampleBuffer(axes=axes)
+        self._sample_size = 1 + 2 * axes
         self.set_sample_rate(ADS_10_HZ)
 
 
     def read_sample(self):
+        """Reads a sample into ``values`` and ``raw``, returns the angle of the first axis.
+
+        Returns None if the sensor had no sample.
+        """
+        buf = self.buf
         with self.i2c_device as i2c:
-            i2c.readinto(self.buf, end=len(self.buf))
-        if self.buf[0] == 0:
-            self.sample = self._parse_int_16(self.buf[1:]) / 64.0
-            return self.sample
+            i2c.readinto(buf, end=self._sample_size)
+        if buf[0] != ADS_SAMPLE:
+            return None
+        values = self.values
+        raw = self.raw
+        if self.axes == 1:
+            raw[0] = struct.unpack_from("<h", buf, 1)[0]
+            values[0] = raw[0] / ADS_ANGLE_SCALE
+        else:
+            raw[0], raw[1] = struct.unpack_from("<hh", buf, 1)
+            values[0] = raw[0] / ADS_ANGLE_SCALE
+            values[1] = raw[1] / ADS_ANGLE_SCALE
+        self.sample = values[0]
+        return self.sample
+
+
+    def read_samples(self, times, values):
+        """Moves all queued samples into the given arrays at once.
+
+        ``values`` receives ``axes`` angles per sample. Returns the number
+        of samples moved.
+        """
+        return self.samples.drain(times, values)
 
 
     def poll(self):
         self._set_poll_mode(True)
 
 
+    def start_streaming(self):
+        self._set_poll_mode(True)
+        self.streaming = True
+        self.samples.clear()
+        self._next_sample = time.monotonic_ns() + self.sample_period
+
+
+    def stop_streaming(self):
+        self.streaming = False
+        self.stop()
+
+
+    def update(self):
+        """Reads a sample into the ring buffer if one is due in streaming mode.
+
+        Returns True if a new sample was stored.
+        """
+        if not self.streaming:
+            return False
+        now = time.monotonic_ns()
+        if now < self._next_sample:
+            return False
+        self._next_sample += self.sample_period
+        if self._next_sample <= now:
+            # fell behind by more than a period, resynchronize
+            self._next_sample = now + self.sample_period
+        value = self.read_sample()
+        if value is None:
+            return False
+        self.sample_time = now
+        self.samples.append(now, self.values)
+        return True
+
+
     def reset(self):
         self.buf[0] = 2
         with self.i2c_device as i2c:
-            i2c.write(self.buf)
+            i2c.write(self.buf, end=COMMAND_SIZE)
 
 
     def stop(self):
@@ -80,7 +238,7 @@ class Flex:
         self.buf[0] = 4
         self.buf[1] = address
         with self.i2c_device as i2c:
-            i2c.write(self.buf)
+            i2c.write(self.buf, end=COMMAND_SIZE)
         self.device_address = address
 
 
@@ -89,20 +247,21 @@ class Flex:
         self.buf[1] = sps & 0x00FF
         self.buf[2] = (sps & 0xFF00) >> 8
         with self.i2c_device as i2c:
-            i2c.write(self.buf)
-
-
-    def _parse_int_16(self, buf):
-        value = buf[0] + (buf[1] << 8)
-        if buf[1] & 0x80:
-            value -= 0xFFFF
-        return value
+            i2c.write(self.buf, end=COMMAND_SIZE)
+        self.sample_rate = sps
+        self.sample_hz = ADS_CLOCK_HZ // sps
+        self.sample_period = sps * NS_PER_S // ADS_CLOCK_HZ
+        if self.streaming:
+            # a faster rate takes effect now, not after the current slow period
+            next_sample = time.monotonic_ns() + self.sample_period
+            if next_sample < self._next_sample:
+                self._next_sample = next_sample
 
 
     def _read_device_type(self):
         with self.i2c_device as i2c:
-            i2c.write_then_readinto(bytearray([10]), self.buf, in_end=len(self.buf))
-        if self.buf[0] == 2:
+            i2c.write_then_readinto(bytearray([10]), self.buf, in_end=COMMAND_SIZE)
+        if self.buf[0] == ADS_DEV_ID:
             return self.buf[1]
         else:
             return None
@@ -112,5 +271,5 @@ class Flex:
         self.buf[0] = 5
         self.buf[1] = 1 if enable else 0
         with self.i2c_device as i2c:
-            i2c.write(self.buf)
+            i2c.write(self.buf, end=COMMAND_SIZE)
         self.polling = enable
@@ -0,0 +1,207 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 Stefan Rothe
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""
+`gestures` - Wave gestures from the IMU linear acceleration and the flex sensors
+
+Every sample is a feature vector of the linear acceleration in 0.1 m/s^2
+and the mean bend of the fingers. Each gesture has a template of
+``TEMPLATE_LENGTH`` feature vectors that is matched against the stream
+with subsequence dynamic time warping: one column of the warping matrix
+per template is updated in place for every sample, so a match may start
+at any sample and no history is kept.
+
+Cells whose cost exceeds the threshold of their template are abandoned,
+and the column update stops at the first abandoned cell past the reach of
+the previous column. A sample costs at most ``GESTURE_COUNT *
+TEMPLATE_LENGTH`` cells, and far fewer while the hand rests.
+
+A detected gesture stays active for ``HOLD_SAMPLES`` samples and is
+latched in ``detected`` until the consumer clears it, like the button
+events.
+"""
+
+from micropython import const
+import adafruit_bno055
+import array
+import math
+
+GESTURE_HZ = 50
+WAVE_LEFT = const(0)
+WAVE_RIGHT = const(1)
+WAVE_UP = const(2)
+WAVE_DOWN = const(3)
+GESTURE_COUNT = const(4)
+# x, y, z linear acceleration and mean finger bend
+FEATURE_COUNT = const(4)
+BEND_FEATURE = const(3)
+FINGER_COUNT = const(4)
+# Sensor axes pointing to the right and up with the hand held flat, palm down
+HORIZONTAL_AXIS = const(0)
+VERTICAL_AXIS = const(2)
+ACCELERATION_SCALE = 10
+# Feature units per degree of mean finger bend, a fist prevents waves
+BEND_SCALE = 0.25
+TEMPLATE_LENGTH = const(16)
+# Peak acceleration of a wave in 0.1 m/s^2
+WAVE_PEAK = 50
+# Largest warping cost of a match, in feature units
+WAVE_THRESHOLD = 200
+HOLD_SAMPLES = const(10)
+INFINITE = const(0x3FFFFFFF)
+FEATURE_MAX = const(0x7FFF)
+
+
+def wave_template(axis, sign, length=TEMPLATE_LENGTH, peak=WAVE_PEAK):
+    """Acceleration and deceleration along one axis with an open hand."""
+    samples = []
+    for i in range(length):
+        sample = [0] * FEATURE_COUNT
+        sample[axis] = int(sign * peak * math.sin(2 * math.pi * (i + 0.5) / length))
+        samples.append(sample)
+    return samples
+
+
+class Gestures:
+    def __init__(self, fingers, imu, length=TEMPLATE_LENGTH):
+        self.fingers = fingers
+        self.imu = imu
+        self.length = length
+        self.features = array.array("h", [0] * FEATURE_COUNT)
+        self.templates = array.array("h", [0] * (GESTURE_COUNT * length * FEATURE_COUNT))
+        self.thresholds = array.array("i", [-1] * GESTURE_COUNT)
+        # last warping column of every template and its highest finite cell
+        self.columns = array.array("i", [INFINITE] * (GESTURE_COUNT * length))
+        self.reach = array.array("h", [-1] * GESTURE_COUNT)
+        self.hold = bytearray(GESTURE_COUNT)
+        # bits of the gestures held active, and of those detected since cleared
+        self.state = 0
+        self.detected = 0
+        self.samples = 0
+        self.cells = 0
+        self.set_template(WAVE_LEFT, wave_template(HORIZONTAL_AXIS, -1), WAVE_THRESHOLD)
+        self.set_template(WAVE_RIGHT, wave_template(HORIZONTAL_AXIS, 1), WAVE_THRESHOLD)
+        self.set_template(WAVE_UP, wave_template(VERTICAL_AXIS, 1), WAVE_THRESHOLD)
+        self.set_template(WAVE_DOWN, wave_template(VERTICAL_AXIS, -1), WAVE_THRESHOLD)
+
+
+    def set_template(self, gesture, samples, threshold):
+        """Sets the feature vectors of a gesture, a negative threshold disables it."""
+        if len(samples) != self.length:
+            raise ValueError("Template length must be " + str(self.length))
+        offset = gesture * self.length * FEATURE_COUNT
+        for sample in samples:
+            for feature in range(FEATURE_COUNT):
+                self.templates[offset] = sample[feature]
+                offset += 1
+        self.thresholds[gesture] = threshold
+        self.reset()
+
+
+    def reset(self):
+        for i in range(len(self.columns)):
+            self.columns[i] = INFINITE
+        for i in range(GESTURE_COUNT):
+            self.reach[i] = -1
+
+
+    def update(self):
+        """Reads the features of a sample from the IMU and fingers and matches them."""
+        features = self.features
+        fusion = self.imu.fusion
+        for axis in range(3):
+            value = int(fusion[adafruit_bno055.LINEAR_ACCELERATION + axis] * ACCELERATION_SCALE)
+            features[axis] = min(FEATURE_MAX, max(-FEATURE_MAX, value))
+        bend = 0
+        n = 0
+        for i in range(FINGER_COUNT):
+            finger = self.fingers[i]
+            if finger.flex:
+                bend += abs(finger.flex_value)
+                n += 1
+        features[BEND_FEATURE] = min(FEATURE_MAX, int(bend * BEND_SCALE / n)) if n else 0
+        self.add_sample()
+
+
+    def add_sample(self):
+        """Matches ``features`` against all templates."""
+        self.samples += 1
+        for gesture in range(GESTURE_COUNT):
+            if self.hold[gesture]:
+                self.hold[gesture] -= 1
+                if not self.hold[gesture]:
+                    self.state &= ~(1 << gesture)
+        found = -1
+        for gesture in range(GESTURE_COUNT):
+            if self.thresholds[gesture] >= 0 and self._step(gesture) and found < 0:
+                found = gesture
+        if found >= 0:
+            self.reset()
+            if not self.state:
+                self.state |= 1 << found
+                self.detected |= 1 << found
+                self.hold[found] = HOLD_SAMPLES
+        return found
+
+
+    def _step(self, gesture):
+        """Updates the warping column of a template, returns True on a match."""
+        length = self.length
+        limit = self.thresholds[gesture]
+        columns = self.columns
+        templates = self.templates
+        features = self.features
+        base = gesture * length
+        reach = self.reach[gesture]
+        # a match may start at every sample: the cell before the first one costs 0
+        diagonal = 0
+        left = 0
+        new_reach = -1
+        cells = 0
+        i = 0
+        while i < length:
+            up = columns[base + i]
+            best = diagonal if diagonal < up else up
+            if left < best:
+                best = left
+            cost = INFINITE
+            if best <= limit:
+                offset = (base + i) * FEATURE_COUNT
+                cost = best
+                for feature in range(FEATURE_COUNT):
+                    d = features[feature] - templates[offset + feature]
+                    cost += d if d > 0 else -d
+                if cost > limit:
+                    cost = INFINITE
+                else:
+                    new_reach = i
+            cells += 1
+            columns[base + i] = cost
+            diagonal = up
+            left = cost
+            i += 1
+            if cost == INFINITE and i > reach + 1:
+                break
+        # cells past the break were infinite in the previous column already
+        self.cells += cells
+        self.reach[gesture] = new_reach
+        return new_reach == length - 1
@@ -0,0 +1,407 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 Stefan Rothe
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""
+`host.aggregator` - Merges the streams of several gloves on one timeline
+
+Every glove has its own clock. ``Clock`` maps device time to host time
+with an offset and a drift, fitted by least squares to the smallest
+transport delay seen in each block of device time, so queueing jitter
+only ever makes a delay longer and drops out. ``Aggregator`` resamples
+the channels of all gloves onto a common output rate, ``latency`` seconds
+behind the host clock: analog channels are interpolated linearly, buttons
+hold their last state. A glove without a sample for ``stale`` seconds
+shows up as NaN.
+
+Gloves are told apart by their Junxion board ID, which every glove
+keeps in its EEPROM and ``python -m host.bridge PORT --board-id ID``
+changes. A serial glove whose ID is taken already is reported and
+dropped. Junxion data frames
+carry no timestamp, so the device time of a serial glove is its frame
+count divided by the nominal frame rate; the fitted drift absorbs the
+difference to the real rate. Frames the glove skipped or the link lost
+would shift this count for good, so ``SerialGlove`` compares the arrival
+times with the clock: when even the earliest of ``GAP_WINDOW`` frames
+arrives a frame period or more behind the fitted line, the missing
+frames are added to the count. Recordings carry the device time.
+
+Run ``python -m host.aggregator --serial /dev/ttyUSB0 --serial /dev/ttyUSB1``
+to print merged frames as JSON lines.
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+
+import numpy as np
+
+import recording
+from host import bridge, protocol
+from host.recording import Recording
+
+OUTPUT_RATE = 100
+LATENCY = 0.05
+STALE = 0.5
+# Samples kept per glove, enough for the latency and the stale time
+HISTORY = 256
+# Device time per clock block and number of blocks in the fit
+CLOCK_BLOCK = 1.0
+CLOCK_BLOCKS = 32
+# Nominal data frame rate of a glove, JUNXION_HZ in code.py
+JUNXION_RATE = 100
+# Frames whose earliest arrival decides whether frames were lost
+GAP_WINDOW = 10
+# Seconds between requests of the board ID until the glove replies
+BOARD_ID_RETRY_S = 1.0
+# Recording frames replayed per step
+REPLAY_BATCH = 10
+
+
+class Clock:
+    def __init__(self, block=CLOCK_BLOCK, blocks=CLOCK_BLOCKS):
+        self.block = block
+        self.offset = 0.0
+        self.drift = 0.0
+        self._device = np.zeros(blocks)
+        self._delay = np.zeros(blocks)
+        self._count = 0
+        self._block_end = None
+        self._min_device = 0.0
+        self._min_delay = np.inf
+
+    def add(self, device_time, host_time):
+        delay = host_time - device_time
+        if self._block_end is None:
+            self._block_end = device_time + self.block
+        elif device_time >= self._block_end:
+            self._push()
+            self._block_end = device_time + self.block
+            self._min_delay = delay
+            self._min_device = device_time
+            self._fit()
+            return
+        if delay < self._min_delay:
+            self._min_delay = delay
+            self._min_device = device_time
+            self._fit()
+
+    def to_host(self, device_time):
+        return device_time + self.offset + self.drift * device_time
+
+    def _push(self):
+        i = self._count % len(self._device)
+        self._device[i] = self._min_device
+        self._delay[i] = self._min_delay
+        self._count += 1
+        self._min_delay = np.inf
+
+    def _fit(self):
+        n = min(self._count, len(self._device))
+        device = np.append(self._device[:n], self._min_device)
+        delay = np.append(self._delay[:n], self._min_delay)
+        if n == 0:
+            self.offset = self._min_delay
+            self.drift = 0.0
+            return
+        # center the device times to keep the fit well conditioned
+        center = device.mean()
+        x = device - center
+        drift = (x * (delay - delay.mean())).sum() / (x * x).sum()
+        self.drift = drift
+        self.offset = delay.mean() - drift * center
+
+
+class Glove:
+    """Sample history and clock of one glove."""
+
+    def __init__(self, board_id, channels, held=(), history=HISTORY):
+        self.board_id = board_id
+        self.channels = list(channels)
+        self.clock = Clock()
+        self.samples = 0
+        self._index = {name: i for i, name in enumerate(self.channels)}
+        self._held = np.array([name in held for name in self.channels], bool)
+        self._times = np.zeros(history)
+        self._values = np.full((history, len(self.channels)), np.nan, np.float32)
+
+    def add(self, device_time, host_time, values):
+        """Adds a sample, ``values`` maps channel names to values."""
+        self.clock.add(device_time, host_time)
+        i = self.samples % len(self._times)
+        self._times[i] = device_time
+        row = self._values[i]
+        row[:] = np.nan
+        for name, value in values.items():
+            channel = self._index.get(name)
+            if channel is not None:
+                row[channel] = value
+        self.samples += 1
+
+    def resample(self, times, stale=STALE):
+        """Returns the channel values at the given host times."""
+        n = min(self.samples, len(self._times))
+        result = np.full((len(times), len(self.channels)), np.nan, np.float32)
+        if n == 0:
+            return result
+        # oldest sample first
+        order = (np.arange(n) + self.samples) % n if n == len(self._times) else slice(0, n)
+        host = self.clock.to_host(self._times[:n][order])
+        values = self._values[:n][order]
+        after = np.searchsorted(host, times, side="right")
+        before = np.clip(after - 1, 0, n - 1)
+        after = np.clip(after, 0, n - 1)
+        span = host[after] - host[before]
+        weight = np.where(span > 0, (times - host[before]) / np.where(span > 0, span, 1), 0.0)
+        weight = np.clip(weight, 0.0, 1.0)[:, None]
+        interpolated = values[before] + (values[after] - values[before]) * weight
+        result[:] = np.where(self._held, values[before], interpolated)
+        # nothing known yet or nothing heard for too long
+        missing = (times < host[0]) | (times - host[before] > stale)
+        result[missing] = np.nan
+        return result
+
+
+class Aggregator:
+    def __init__(self, rate=OUTPUT_RATE, latency=LATENCY, stale=STALE):
+        self.period = 1.0 / rate
+        self.latency = latency
+        self.stale = stale
+        self.gloves = {}
+        self._next = None
+
+    def add_glove(self, board_id, channels, held=()):
+        if board_id in self.gloves:
+            raise ValueError(
+                "two gloves with board ID %d, give one another ID with "
+                "python -m host.bridge PORT --board-id ID" % board_id
+            )
+        glove = Glove(board_id, channels, held)
+        self.gloves[board_id] = glove
+        return glove
+
+    def tick(self, now):
+        """Returns the output times due at host time ``now`` and the values
+        of every glove at these times, keyed by board ID."""
+        end = now - self.latency
+        if self._next is None:
+            self._next = end
+        count = int((end - self._next) / self.period) + 1
+        if count <= 0:
+            return np.zeros(0), {}
+        times = self._next + self.period * np.arange(count)
+        self._next = times[-1] + self.period
+        return times, {
+            board_id: glove.resample(times, self.stale) for board_id, glove in self.gloves.items()
+        }
+
+
+class SerialGlove(bridge.Bridge):
+    """Serial glove that feeds its data frames into an aggregator."""
+
+    def __init__(self, port, aggregator, rate=JUNXION_RATE, keyframe_interval=0):
+        super().__init__(port, keyframe_interval)
+        self.aggregator = aggregator
+        self.rate = rate
+        self.glove = None
+        self.ready = asyncio.Event()
+        self.error = None
+        self.lost_frames = 0
+        self._frame = 0
+        self._lateness = np.inf
+        self._window = 0
+        self._board_id_retry = None
+
+    async def start(self, unix_path=None, osc_targets=()):
+        await super().start(unix_path, osc_targets)
+        self._board_id_retry = asyncio.get_running_loop().call_later(
+            BOARD_ID_RETRY_S, self._retry_board_id
+        )
+
+    async def stop(self):
+        if self._board_id_retry:
+            self._board_id_retry.cancel()
+            self._board_id_retry = None
+        await super().stop()
+
+    def _retry_board_id(self):
+        self._board_id_retry = None
+        if self.board_id is None and not self.closed.is_set():
+            self.send(protocol.BOARD_ID)
+            self._board_id_retry = asyncio.get_running_loop().call_later(
+                BOARD_ID_RETRY_S, self._retry_board_id
+            )
+
+    def publish(self, sample):
+        if self.closed.is_set():
+            # given up, frames of the same read may still follow
+            return
+        if self.glove is None:
+            if self.board_id is None:
+                # frames before the board ID are dropped, start() asks again
+                return
+            config = self.config
+            names = ["analog/%d" % pin for pin in config.analog]
+            held = ["digital/%d" % pin for pin in config.digital]
+            try:
+                self.glove = self.aggregator.add_glove(self.board_id, names + held, held)
+            except ValueError as error:
+                self._give_up(str(error))
+                return
+            self.ready.set()
+        values = {"analog/%d" % pin: value for pin, value in sample.analog.items()}
+        for pin, value in sample.digital.items():
+            values["digital/%d" % pin] = value
+        if self.glove.samples:
+            self._check_gap(sample.time)
+        self.glove.add(self._frame / self.rate, sample.time, values)
+        self._frame += 1
+
+    def _give_up(self, error):
+        """Reports the error once and stops the glove and the reading of its port."""
+        self.error = error
+        print("%s: %s" % (self.port.path, error), file=sys.stderr)
+        asyncio.get_running_loop().remove_reader(self.port.fd)
+        self.send(protocol.DATA_OFF)
+        self.closed.set()
+
+    def _check_gap(self, host_time):
+        """Adds frames to the count that arrived too late to be on time."""
+        lateness = host_time - self.glove.clock.to_host(self._frame / self.rate)
+        self._lateness = min(self._lateness, lateness)
+        self._window += 1
+        if self._window < GAP_WINDOW:
+            return
+        lost = int(round(self._lateness * self.rate))
+        if lost > 0:
+            self._frame += lost
+            self.lost_frames += lost
+        self._lateness = np.inf
+        self._window = 0
+
+
+async def replay(path, board_id, aggregator, speed=1.0):
+    """Feeds a recording into the aggregator as if it was streamed now."""
+    with Recording(path) as session:
+        header = session.header
+        names = []
+        for finger in range(header.fingers):
+            for axis in range(header.flex_axes):
+                names.append("flex/%d/%d" % (finger, axis))
+        held = ["button/%d" % i for i in range(header.buttons)]
+        glove = aggregator.add_glove(board_id, names + held, held)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        times = session.time / 1e9
+        flex = session.flex.reshape(len(session), -1) / recording.FLEX_SCALE
+        buttons = session.buttons
+        for first in range(0, len(session), REPLAY_BATCH):
+            delay = start + times[first] / speed - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            for i in range(first, min(first + REPLAY_BATCH, len(session))):
+                values = dict(zip(names, flex[i].tolist()))
+                for b in range(header.buttons):
+                    values[held[b]] = (int(buttons[i]) >> b) & 1
+                glove.add(times[i], start + times[i] / speed, values)
+
+
+def _recording_source(text):
+    path, _, board_id = text.rpartition("=")
+    if not path:
+        raise argparse.ArgumentTypeError("expected PATH=BOARD_ID")
+    return path, int(board_id)
+
+
+def _frame(time, values, gloves):
+    result = {"time": time}
+    for board_id, row in values.items():
+        result[str(board_id)] = {
+            name: (None if np.isnan(value) else float(value))
+            for name, value in zip(gloves[board_id].channels, row.tolist())
+        }
+    return result
+
+
+async def run(args, out=sys.stdout):
+    aggregator = Aggregator(args.rate, args.latency)
+    links = []
+    for path in args.serial:
+        link = SerialGlove(bridge.SerialPort(path), aggregator, keyframe_interval=args.delta)
+        await link.start()
+        links.append(link)
+    replays = [
+        asyncio.ensure_future(replay(path, board_id, aggregator, args.speed))
+        for path, board_id in args.recording
+    ]
+    loop = asyncio.get_running_loop()
+    status = 0
+    try:
+        while True:
+            await asyncio.sleep(aggregator.period)
+            times, values = aggregator.tick(loop.time())
+            for i, time in enumerate(times):
+                frame = _frame(time, {k: v[i] for k, v in values.items()}, aggregator.gloves)
+                out.write(json.dumps(frame) + "\n")
+            out.flush()
+            for link in [link for link in links if link.closed.is_set()]:
+                # unplugged, or given up because of its board ID
+                if link.error:
+                    status = 1
+                await link.stop()
+                link.port.close()
+                links.remove(link)
+            if not links and all(r.done() for r in replays):
+                break
+    finally:
+        for link in links:
+            await link.stop()
+            link.port.close()
+        for task in replays:
+            task.cancel()
+    return status
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--serial", action="append", default=[], metavar="PORT")
+    parser.add_argument(
+        "--recording", type=_recording_source, action="append", default=[], metavar="PATH=BOARD_ID"
+    )
+    parser.add_argument("--rate", type=float, default=OUTPUT_RATE, help="output frames per second")
+    parser.add_argument("--latency", type=float, default=LATENCY, help="output delay in seconds")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed of recordings")
+    parser.add_argument(
+        "--delta", type=bridge.keyframe_interval, default=0, metavar="FRAMES",
+        help="receive only changed values from serial gloves, with a full frame every FRAMES frames"
+    )
+    args = parser.parse_args(argv)
+    if not args.serial and not args.recording:
+        parser.error("no gloves given")
+    try:
+        return asyncio.run(run(args))
+    except KeyboardInterrupt:
+        return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
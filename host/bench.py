@@ -0,0 +1,139 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 Stefan Rothe
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""
+`host.bench` - Benchmarks of the glove's update loop on the simulated bus
+
+Run with ``python -m host.bench``. Reports the loop rate, I2C transactions
+and bytes per cycle of ``Fingers.update``, once with the plain bus and once
+planned through ``bus.BusManager``. With ``--max-transactions`` the exit
+status is non-zero if a scenario needs more transactions per cycle.
+"""
+
+import argparse
+import sys
+import time
+
+from host import sim
+
+sim.install()
+
+import bus  # noqa: E402
+import finger  # noqa: E402
+import flex  # noqa: E402
+import neopixel  # noqa: E402
+
+FLEX_RATES = {
+    "1": flex.ADS_1_HZ,
+    "10": flex.ADS_10_HZ,
+    "20": flex.ADS_20_HZ,
+    "50": flex.ADS_50_HZ,
+    "100": flex.ADS_100_HZ,
+    "200": flex.ADS_200_HZ,
+    "333": flex.ADS_333_HZ,
+    "500": flex.ADS_500_HZ,
+}
+
+
+class Result:
+    def __init__(self, name, cycles, elapsed_ns, i2c, shows):
+        self.name = name
+        self.cycles = cycles
+        self.loop_hz = cycles * 1e9 / elapsed_ns
+        self.transactions = i2c.transactions / cycles
+        self.bytes = i2c.bytes / cycles
+        self.locks = i2c.lock_count / cycles
+        self.shows = shows / cycles
+
+    def __str__(self):
+        return "%-16s %10.0f %10.2f %10.2f %10.2f %10.2f" % (
+            self.name, self.loop_hz, self.transactions, self.bytes, self.locks, self.shows
+        )
+
+
+HEADER = "%-16s %10s %10s %10s %10s %10s" % (
+    "scenario", "loop Hz", "trans/cyc", "bytes/cyc", "locks/cyc", "shows/cyc"
+)
+
+
+def _setup(args, managed=False):
+    i2c = sim.glove(frequency=args.frequency, latency_ns=int(args.latency_us * 1000))
+    manager = bus.BusManager(i2c) if managed else None
+    fingers = finger.Fingers(manager or i2c)
+    for f in fingers:
+        if f.flex:
+            f.flex.set_sample_rate(FLEX_RATES[args.flex_rate])
+            f.flex.start_streaming()
+    return i2c, manager, fingers
+
+
+def _measure(name, i2c, cycles, step):
+    i2c.reset_stats()
+    shows = neopixel.NeoPixel.shows
+    start = time.perf_counter_ns()
+    for _ in range(cycles):
+        step()
+    elapsed = time.perf_counter_ns() - start
+    return Result(name, cycles, elapsed, i2c, neopixel.NeoPixel.shows - shows)
+
+
+def bench_update(args):
+    i2c, _, fingers = _setup(args)
+    return _measure("fingers.update", i2c, args.cycles, fingers.update)
+
+
+def bench_bus_cycle(args):
+    i2c, manager, fingers = _setup(args, managed=True)
+
+    def step():
+        fingers.submit(manager)
+        manager.run_cycle()
+        fingers.update_leds()
+
+    return _measure("bus cycle", i2c, args.cycles, step)
+
+
+BENCHMARKS = [bench_update, bench_bus_cycle]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cycles", type=int, default=2000)
+    parser.add_argument("--frequency", type=int, default=400000, help="bus frequency in Hz")
+    parser.add_argument("--latency-us", type=float, default=0.0, help="extra latency per transaction")
+    parser.add_argument("--flex-rate", choices=sorted(FLEX_RATES, key=int), default="10")
+    parser.add_argument("--max-transactions", type=float, help="fail above this many per cycle")
+    args = parser.parse_args(argv)
+
+    print(HEADER)
+    failed = False
+    for benchmark in BENCHMARKS:
+        result = benchmark(args)
+        print(result)
+        if args.max_transactions is not None and result.transactions > args.max_transactions:
+            print("  more than", args.max_transactions, "transactions per cycle")
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,476 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 Stefan Rothe
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""
+`host.bridge` - Daemon that shares the glove's serial port
+
+Owns the serial port, speaks the Junxion protocol with the glove and
+publishes every decoded data frame to any number of local clients:
+
+* OSC over UDP, one bundle per frame with the messages
+  ``<prefix>/digital/<pin>`` and ``<prefix>/analog/<pin>``
+* a Unix stream socket, one JSON object per line and frame
+
+Every client holds at most one unsent frame. A newer frame replaces it,
+so a slow client sees fewer frames but never old ones, and never delays
+the others. Unix socket clients may send the read-only commands ``B``,
+``J`` and ``P``, one per line. They are forwarded to the glove and only
+the client that asked gets the reply, as ``{"board_id": ...}``,
+``{"junxion_id": [...]}`` or one ``{"histogram": {...}}`` line per
+histogram of the profile, ended by ``{"histogram": null}``. Commands
+that change the glove for every client, like ``S``, are ignored.
+
+Run with ``python -m host.bridge /dev/ttyUSB0 --unix /tmp/glove.sock
+--osc 127.0.0.1:9000``. Any pty works in place of the serial port.
+"""
+
+import argparse
+import asyncio
+import collections
+import json
+import os
+import socket
+import struct
+import sys
+import termios
+import tty
+
+from host import protocol
+
+BAUDRATE = 115200
+READ_SIZE = 4096
+OSC_PREFIX = "/glove"
+# Send buffer of a Unix socket client, a few frames, so frames that wait
+# for a slow client are replaced instead of piling up in the kernel
+CLIENT_BUFFER_SIZE = 4096
+# Seconds to wait for the input configuration before asking again
+CONFIG_RETRY_S = 1.0
+# Longest keyframe interval the glove accepts, the frame index is a byte
+MAX_KEYFRAME_INTERVAL = 255
+# Board IDs are a byte
+MAX_BOARD_ID = 255
+# Commands Unix socket clients may send, they only read from the glove
+CLIENT_COMMANDS = (protocol.BOARD_ID, protocol.JUNXION_ID, protocol.PROFILE)
+_BAUDRATES = {
+    9600: termios.B9600,
+    19200: termios.B19200,
+    38400: termios.B38400,
+    57600: termios.B57600,
+    115200: termios.B115200,
+    230400: termios.B230400,
+}
+# OSC time tag that means "immediately"
+_OSC_IMMEDIATE = struct.pack(">Q", 1)
+
+
+def _osc_string(text):
+    data = text.encode() + b"\x00"
+    return data + b"\x00" * (-len(data) % 4)
+
+
+def osc_message(address, value):
+    return _osc_string(address) + _osc_string(",i") + struct.pack(">i", value)
+
+
+def osc_bundle(messages):
+    result = bytearray(_osc_string("#bundle") + _OSC_IMMEDIATE)
+    for message in messages:
+        result += struct.pack(">i", len(message)) + message
+    return bytes(result)
+
+
+class SerialPort:
+    """Serial port or pty in raw, non-blocking mode."""
+
+    def __init__(self, path, baudrate=BAUDRATE):
+        self.path = path
+        self.fd = os.open(path, os.O_RDWR | os.O_NOCTTY | os.O_NONBLOCK)
+        self._pending = bytearray()
+        self._writer_added = False
+        if os.isatty(self.fd):
+            tty.setraw(self.fd)
+            attributes = termios.tcgetattr(self.fd)
+            attributes[4] = attributes[5] = _BAUDRATES[baudrate]
+            termios.tcsetattr(self.fd, termios.TCSANOW, attributes)
+
+    def read(self):
+        """Returns the bytes received so far, ``b""`` once the port is gone."""
+        try:
+            return os.read(self.fd, READ_SIZE)
+        except BlockingIOError:
+            return None
+        except OSError:
+            # a pty whose other side was closed
+            return b""
+
+    def write(self, data):
+        """Writes without blocking, the bytes the port does not take yet are queued.
+
+        Queued bytes are written from the event loop once the port is
+        writable.
+        """
+        self._pending += data
+        self._flush()
+
+    def close(self):
+        if self._writer_added:
+            asyncio.get_running_loop().remove_writer(self.fd)
+            self._writer_added = False
+        os.close(self.fd)
+
+    def _flush(self):
+        pending = self._pending
+        try:
+            while pending:
+                del pending[:os.write(self.fd, pending)]
+        except BlockingIOError:
+            pass
+        if pending and not self._writer_added:
+            asyncio.get_running_loop().add_writer(self.fd, self._writable)
+            self._writer_added = True
+        elif not pending and self._writer_added:
+            asyncio.get_running_loop().remove_writer(self.fd)
+            self._writer_added = False
+
+    def _writable(self):
+        try:
+            self._flush()
+        except OSError:
+            # the port is gone, read() reports it
+            del self._pending[:]
+            asyncio.get_running_loop().remove_writer(self.fd)
+            self._writer_added = False
+
+
+class OscClient:
+    def __init__(self, transport, prefix=OSC_PREFIX):
+        self.transport = transport
+        self.prefix = prefix
+        self.sent = 0
+        self.dropped = 0
+
+    def publish(self, sample, line):
+        if self.transport.get_write_buffer_size():
+            # the socket did not keep up, the buffered bundle is stale already
+            self.dropped += 1
+            return
+        messages = []
+        for pin, value in sample.digital.items():
+            messages.append(osc_message("%s/digital/%d" % (self.prefix, pin), value))
+        for pin, value in sample.analog.items():
+            messages.append(osc_message("%s/analog/%d" % (self.prefix, pin), value))
+        self.transport.sendto(osc_bundle(messages))
+        self.sent += 1
+
+    def close(self):
+        self.transport.close()
+
+
+class StreamClient:
+    def __init__(self, bridge, reader, writer):
+        self.bridge = bridge
+        self.reader = reader
+        self.writer = writer
+        writer.get_extra_info("socket").setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, CLIENT_BUFFER_SIZE)
+        writer.transport.set_write_buffer_limits(high=0)
+        self.sent = 0
+        self.dropped = 0
+        self._pending = None
+        # replies to commands are never dropped
+        self._replies = collections.deque()
+        self._ready = asyncio.Event()
+
+    def publish(self, sample, line):
+        if self._pending is not None:
+            self.dropped += 1
+        self._pending = line
+        self._ready.set()
+
+    def reply(self, line):
+        self._replies.append(line)
+        self._ready.set()
+
+    async def run(self):
+        commands = asyncio.ensure_future(self._receive())
+        try:
+            while not self.writer.is_closing():
+                await self._ready.wait()
+                self._ready.clear()
+                while self._replies:
+                    self.writer.write(self._replies.popleft())
+                line, self._pending = self._pending, None
+                if line is not None:
+                    self.writer.write(line)
+                    self.sent += 1
+                await self.writer.drain()
+        except (ConnectionError, BrokenPipeError):
+            pass
+        finally:
+            commands.cancel()
+            self.bridge.clients.remove(self)
+            self.writer.close()
+
+    async def _receive(self):
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                self.writer.close()
+                self._ready.set()
+                return
+            command = line.strip()
+            if command in CLIENT_COMMANDS:
+                self.bridge.request(self, command)
+
+    def close(self):
+        # abort, a client that does not read would keep a graceful close waiting
+        self.writer.transport.abort()
+        self._ready.set()
+
+
+class Bridge:
+    def __init__(self, port, keyframe_interval=0, assign_board_id=None):
+        if keyframe_interval != 0 and not 2 <= keyframe_interval <= MAX_KEYFRAME_INTERVAL:
+            raise ValueError("keyframe interval must be 0 or 2 to %d" % MAX_KEYFRAME_INTERVAL)
+        if assign_board_id is not None and not 0 <= assign_board_id <= MAX_BOARD_ID:
+            raise ValueError("board ID must be 0 to %d" % MAX_BOARD_ID)
+        self.port = port
+        self.keyframe_interval = keyframe_interval
+        self.assign_board_id = assign_board_id
+        self.parser = protocol.FrameParser()
+        self.config = None
+        self.decoder = None
+        self.board_id = None
+        self.junxion_id = None
+        self.clients = []
+        # clients waiting for the reply to a command, oldest request first
+        self._requests = {command: collections.deque() for command in CLIENT_COMMANDS}
+        self.frames = 0
+        self.layout_changes = 0
+        self.closed = asyncio.Event()
+        self._config_requested = False
+        self._config_retry = None
+        self._server = None
+
+    async def start(self, unix_path=None, osc_targets=()):
+        loop = asyncio.get_running_loop()
+        loop.add_reader(self.port.fd, self._receive)
+        if unix_path:
+            self._server = await asyncio.start_unix_server(self._accept, unix_path)
+        for host, port in osc_targets:
+            transport, _ = await loop.create_datagram_endpoint(
+                asyncio.DatagramProtocol, remote_addr=(host, port)
+            )
+            self.clients.append(OscClient(transport))
+        self.send(protocol.JUNXION_ID)
+        if self.assign_board_id is not None:
+            # the glove keeps the new ID and replies with it
+            self.send(protocol.SET_BOARD_ID, bytes((self.assign_board_id,)))
+        else:
+            self.send(protocol.BOARD_ID)
+        self._request_config()
+
+    async def stop(self):
+        asyncio.get_running_loop().remove_reader(self.port.fd)
+        if self._config_retry:
+            self._config_retry.cancel()
+        if not self.closed.is_set():
+            self.send(protocol.DATA_OFF)
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+        for client in list(self.clients):
+            client.close()
+        # let the client tasks see their closed connections
+        await asyncio.sleep(0)
+        self.closed.set()
+
+    def send(self, command, payload=b""):
+        try:
+            self.port.write(protocol.encode(command, payload))
+        except OSError:
+            self.closed.set()
+
+    def request(self, client, command):
+        """Forwards a command of a client, the reply goes to this client only."""
+        self._requests[command].append(client)
+        self.send(command)
+
+    def publish(self, sample):
+        line = (json.dumps(sample.to_dict()) + "\n").encode()
+        for client in self.clients:
+            client.publish(sample, line)
+
+    def _reply(self, command, value, last=True):
+        """Sends a reply to the oldest client waiting for one to ``command``."""
+        waiting = self._requests[command]
+        while waiting and waiting[0] not in self.clients:
+            # the client is gone
+            waiting.popleft()
+        if not waiting:
+            # the bridge asked itself
+            return
+        waiting[0].reply((json.dumps(value) + "\n").encode())
+        if last:
+            waiting.popleft()
+
+    async def _accept(self, reader, writer):
+        client = StreamClient(self, reader, writer)
+        self.clients.append(client)
+        try:
+            await client.run()
+        except asyncio.CancelledError:
+            pass
+
+    def _request_config(self):
+        """Asks for the input configuration until the glove replies."""
+        if not self._config_requested:
+            self._config_requested = True
+            self.send(protocol.INPUT_CONFIG)
+            self._config_retry = asyncio.get_running_loop().call_later(
+                CONFIG_RETRY_S, self._retry_config
+            )
+
+    def _retry_config(self):
+        self._config_retry = None
+        if self._config_requested and not self.closed.is_set():
+            self._config_requested = False
+            self._request_config()
+
+    def _receive(self):
+        data = self.port.read()
+        if data == b"":
+            asyncio.get_running_loop().remove_reader(self.port.fd)
+            self.closed.set()
+            return
+        if data:
+            for command, payload in self.parser.feed(data):
+                self._handle(command, payload)
+
+    def _handle(self, command, payload):
+        if command in (protocol.DATA, protocol.DELTA_DATA):
+            if self.config is None:
+                self._request_config()
+                return
+            try:
+                payload = self.decoder.feed(command, payload)
+                if payload is None:
+                    # a delta frame was lost, wait for the next keyframe
+                    return
+                sample = self.config.decode(payload, asyncio.get_running_loop().time())
+            except ValueError:
+                # the pins changed on the glove, ask for the new layout
+                self.config = None
+                self.layout_changes += 1
+                self._request_config()
+                return
+            self.frames += 1
+            self.publish(sample)
+        elif command == protocol.INPUT_CONFIG_REPLY:
+            self.config = protocol.InputConfig(payload)
+            self.decoder = protocol.DeltaDecoder(self.config)
+            self._config_requested = False
+            if self._config_retry:
+                self._config_retry.cancel()
+                self._config_retry = None
+            if self.keyframe_interval:
+                self.send(protocol.DELTA, bytes((self.keyframe_interval,)))
+            self.send(protocol.DATA_ON)
+        elif command == protocol.BOARD_ID_REPLY and payload:
+            self.board_id = payload[0]
+            self._reply(protocol.BOARD_ID, {"board_id": self.board_id})
+        elif command == protocol.JUNXION_ID_REPLY:
+            self.junxion_id = payload
+            self._reply(protocol.JUNXION_ID, {"junxion_id": list(payload)})
+        elif command == protocol.HISTOGRAM:
+            try:
+                histogram = protocol.decode_histogram(payload)
+            except ValueError:
+                return
+            self._reply(protocol.PROFILE, {"histogram": histogram}, last=histogram is None)
+
+
+def keyframe_interval(text):
+    """Argument type of ``--delta``: 0 for full frames only, or 2 to 255."""
+    try:
+        interval = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected a number of frames")
+    if interval != 0 and not 2 <= interval <= MAX_KEYFRAME_INTERVAL:
+        raise argparse.ArgumentTypeError("expected 0 or 2 to %d" % MAX_KEYFRAME_INTERVAL)
+    return interval
+
+
+def board_id(text):
+    """Argument type of ``--board-id``: 0 to 255."""
+    try:
+        value = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected a number")
+    if not 0 <= value <= MAX_BOARD_ID:
+        raise argparse.ArgumentTypeError("expected 0 to %d" % MAX_BOARD_ID)
+    return value
+
+
+def _osc_target(text):
+    host, _, port = text.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+async def run(args):
+    bridge = Bridge(SerialPort(args.port, args.baudrate), args.delta, args.board_id)
+    await bridge.start(args.unix, args.osc)
+    try:
+        await bridge.closed.wait()
+    finally:
+        await bridge.stop()
+        bridge.port.close()
+        if args.unix and os.path.exists(args.unix):
+            os.unlink(args.unix)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("port", help="serial port or pty of the glove")
+    parser.add_argument("--baudrate", type=int, choices=sorted(_BAUDRATES), default=BAUDRATE)
+    parser.add_argument("--unix", help="path of the Unix socket for JSON clients")
+    parser.add_argument(
+        "--osc", type=_osc_target, action="append", default=[], metavar="HOST:PORT",
+        help="send OSC bundles to this address, may be repeated"
+    )
+    parser.add_argument(
+        "--delta", type=keyframe_interval, default=0, metavar="FRAMES",
+        help="receive only changed values, with a full frame every FRAMES frames (2 to 255)"
+    )
+    parser.add_argument(
+        "--board-id", type=board_id, metavar="ID",
+        help="give the glove this board ID, it keeps the ID across restarts"
+    )
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(run(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,248 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 Stefan Rothe
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""
+`host.protocol` - Host side of the Junxion serial protocol
+
+Every frame in both directions is ``0xFF 0xFF length command payload``.
+``FrameParser`` splits a byte stream into frames and resynchronizes after
+garbage like the parser of ``junxion.Junxion``. ``InputConfig`` holds the
+pin list of a ``p`` frame and decodes ``d`` frames with it.
+``DeltaDecoder`` rebuilds full ``d`` payloads from the keyframes and
+``c`` delta frames the glove sends after a ``C`` command.
+``decode_histogram()`` reads the ``h`` frames of a profile.
+"""
+
+import struct
+
+SYNC = 0xFF
+HEADER_SIZE = 4
+
+# Commands sent to the glove
+DATA_ON = b"D"
+DATA_OFF = b"S"
+BOARD_ID = b"B"
+JUNXION_ID = b"J"
+INPUT_CONFIG = b"I"
+PROFILE = b"P"
+# Payload: keyframe interval in frames, 0 sends full frames only
+DELTA = b"C"
+# Payload: new board ID, which the glove keeps in its EEPROM
+SET_BOARD_ID = b"A"
+
+# Frames sent by the glove
+DATA = ord("d")
+DELTA_DATA = ord("c")
+INPUT_CONFIG_REPLY = ord("p")
+BOARD_ID_REPLY = ord("b")
+JUNXION_ID_REPLY = ord("j")
+HISTOGRAM = ord("h")
+
+# Buckets of a profile histogram, BUCKET_COUNT in profiler.py
+HISTOGRAM_BUCKETS = 16
+_HISTOGRAM_PREFIX = ">BBIII"
+_HISTOGRAM_PREFIX_SIZE = struct.calcsize(_HISTOGRAM_PREFIX)
+_HISTOGRAM_KINDS = {ord("s"): "stage", ord("i"): "device"}
+
+# Pin types of the input configuration
+DIGITAL = ord("d")
+ANALOG = ord("a")
+OWN = ord("o")
+
+
+def encode(command, payload=b""):
+    """Returns the frame of a command, ``command`` is a single byte."""
+    return bytes((SYNC, SYNC, len(payload))) + command + bytes(payload)
+
+
+def decode_histogram(payload):
+    """Returns the histogram of an ``h`` frame as a dict, ``None`` for the
+    empty frame that ends a profile."""
+    if not payload:
+        return None
+    size = _HISTOGRAM_PREFIX_SIZE + 4 * HISTOGRAM_BUCKETS
+    if len(payload) < size or payload[0] not in _HISTOGRAM_KINDS:
+        raise ValueError("malformed histogram frame")
+    kind, key, count, max_us, data_bytes = struct.unpack_from(_HISTOGRAM_PREFIX, payload)
+    buckets = struct.unpack_from(">%dI" % HISTOGRAM_BUCKETS, payload, _HISTOGRAM_PREFIX_SIZE)
+    return {
+        "kind": _HISTOGRAM_KINDS[kind],
+        "key": key,
+        "name": payload[size:].decode(),
+        "count": count,
+        "max_us": max_us,
+        "bytes": data_bytes,
+        "buckets": list(buckets),
+    }
+
+
+class FrameParser:
+    """Splits received bytes into ``(command, payload)`` frames."""
+
+    def __init__(self):
+        self.frames = 0
+        self.dropped_bytes = 0
+        self._buffer = bytearray()
+
+    def feed(self, data):
+        """Returns the list of frames completed by ``data``."""
+        buffer = self._buffer
+        buffer += data
+        result = []
+        pos = 0
+        while True:
+            start = buffer.find(b"\xff\xff", pos)
+            if start < 0:
+                # keep a trailing sync byte, it may start the next frame
+                end = len(buffer) - 1 if buffer.endswith(b"\xff") else len(buffer)
+                self.dropped_bytes += end - pos
+                pos = end
+                break
+            self.dropped_bytes += start - pos
+            pos = start
+            # more than two sync bytes, the first ones were stray
+            while len(buffer) > pos + 2 and buffer[pos + 2] == SYNC:
+                self.dropped_bytes += 1
+                pos += 1
+            if len(buffer) < pos + HEADER_SIZE:
+                break
+            size = HEADER_SIZE + buffer[pos + 2]
+            if len(buffer) < pos + size:
+                break
+            result.append((buffer[pos + 3], bytes(buffer[pos + HEADER_SIZE:pos + size])))
+            self.frames += 1
+            pos += size
+        del buffer[:pos]
+        return result
+
+
+class Sample:
+    """Decoded data frame, pin values keyed by pin id."""
+
+    def __init__(self, time, digital, analog, own):
+        self.time = time
+        self.digital = digital
+        self.analog = analog
+        self.own = own
+
+    def to_dict(self):
+        return {
+            "time": self.time,
+            "digital": {str(k): v for k, v in self.digital.items()},
+            "analog": {str(k): v for k, v in self.analog.items()},
+            "own": {str(k): v for k, v in self.own.items()},
+        }
+
+
+class InputConfig:
+    """Pin layout of the glove, from the payload of a ``p`` frame."""
+
+    def __init__(self, payload):
+        if len(payload) % 3:
+            raise ValueError("input configuration must consist of 3 byte entries")
+        self.digital = []
+        self.analog = []
+        self.own = []
+        pins = {DIGITAL: self.digital, ANALOG: self.analog, OWN: self.own}
+        for i in range(0, len(payload), 3):
+            kind, pin = payload[i], payload[i + 1]
+            if kind not in pins:
+                raise ValueError("unknown pin type %r" % chr(kind))
+            pins[kind].append(pin)
+        words = (len(self.digital) + 15) // 16
+        self.data_size = 2 * (words + len(self.analog) + len(self.own))
+        self._format = ">%dH" % (words + len(self.analog) + len(self.own))
+        self._words = words
+
+    def decode(self, payload, time=None):
+        """Returns the ``Sample`` of a ``d`` frame payload.
+
+        Raises ValueError if the payload does not match the layout, which
+        means the layout changed and must be requested again.
+        """
+        if len(payload) != self.data_size:
+            raise ValueError("data frame of %d bytes, layout expects %d" % (len(payload), self.data_size))
+        values = struct.unpack(self._format, payload)
+        digital = {}
+        for i, pin in enumerate(self.digital):
+            digital[pin] = (values[i // 16] >> (i % 16)) & 1
+        offset = self._words
+        analog = dict(zip(self.analog, values[offset:offset + len(self.analog)]))
+        offset += len(self.analog)
+        own = dict(zip(self.own, values[offset:]))
+        return Sample(time, digital, analog, own)
+
+
+class DeltaDecoder:
+    """Rebuilds the full data payloads of a layout from ``d`` and ``c`` frames.
+
+    A ``c`` frame holds the index of the frame since the last keyframe, a
+    bitmap of the changed 16 bit words, bit ``i % 8`` of byte ``i // 8``
+    for word ``i``, and the changed words. After a lost frame the values
+    are unknown until the next keyframe.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.keyframes = 0
+        self.deltas = 0
+        self.lost = 0
+        self._words = config.data_size // 2
+        self._bitmap_size = (self._words + 7) // 8
+        self._frame = None
+        self._index = 0
+
+    def feed(self, command, payload):
+        """Returns the full payload of a data frame, or None until a keyframe arrives.
+
+        Raises ValueError if the frame does not match the layout.
+        """
+        if command == DATA:
+            if len(payload) != self.config.data_size:
+                raise ValueError(
+                    "data frame of %d bytes, layout expects %d" % (len(payload), self.config.data_size)
+                )
+            self._frame = bytearray(payload)
+            self._index = 0
+            self.keyframes += 1
+            return bytes(payload)
+        if command != DELTA_DATA:
+            raise ValueError("not a data frame: %r" % chr(command))
+        bitmap = payload[1:1 + self._bitmap_size]
+        changed = sum(bin(b).count("1") for b in bitmap)
+        if len(bitmap) != self._bitmap_size or len(payload) != 1 + self._bitmap_size + 2 * changed:
+            raise ValueError("delta frame of %d bytes does not match the layout" % len(payload))
+        if self._frame is None:
+            return None
+        if payload[0] != self._index + 1:
+            self.lost += 1
+            self._frame = None
+            return None
+        self._index = payload[0]
+        frame = self._frame
+        pos = 1 + self._bitmap_size
+        for word in range(self._words):
+            if bitmap[word >> 3] & (1 << (word & 7)):
+                frame[2 * word:2 * word + 2] = payload[pos:pos + 2]
+                pos += 2
+        self.deltas += 1
+        return bytes(frame)
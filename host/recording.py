@@ -0,0 +1,283 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 Stefan Rothe
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""
+`host.recording` - Memory-mapped reader for recorded glove sessions
+
+``Recording`` maps a capture file and exposes its channels as NumPy views
+into the mapping. Nothing is parsed or copied when a file is opened, so
+sessions of several hours load instantly. ``capture()`` writes the stream
+of ``recording.Recorder`` to a file and drops frames damaged on the way.
+
+Run ``python -m host.recording capture /dev/ttyACM1 session.sgr`` to
+record and ``python -m host.recording info session.sgr`` to summarize.
+"""
+
+import argparse
+import mmap
+import os
+import struct
+import sys
+import tty
+
+import numpy as np
+
+import recording
+
+# Offsets and lengths of the IMU values, as in adafruit_bno055
+IMU_CHANNELS = {
+    "acceleration": (0, 3),
+    "magnetic": (3, 3),
+    "gyro": (6, 3),
+    "euler": (9, 3),
+    "quaternion": (12, 4),
+    "linear_acceleration": (16, 3),
+    "gravity": (19, 3),
+}
+# Bytes read from the serial port at once
+READ_SIZE = 4096
+_SYNC_BYTES = struct.pack("<H", recording.SYNC)
+
+
+class Header:
+    def __init__(self, data, offset=0):
+        (
+            magic, self.version, self.fingers, self.flex_axes, self.buttons, self.imu_values,
+            self.flags, self.rate, self.header_size, self.frame_size,
+        ) = struct.unpack_from(recording.HEADER_FORMAT, data, offset)
+        if magic != recording.MAGIC:
+            raise ValueError("not a glove recording")
+        if self.version != recording.VERSION:
+            raise ValueError("unsupported recording version %d" % self.version)
+        expected = recording.frame_size(self.fingers, self.flex_axes, self.imu_values)
+        if self.frame_size != expected:
+            raise ValueError("frame size %d does not match the layout" % self.frame_size)
+
+    def dtype(self):
+        """Returns the NumPy record type of one frame."""
+        fields = [
+            ("sync", "<u2"),
+            ("sequence", "<u2"),
+            ("time", "<i8"),
+            ("flex", "<i2", (self.fingers, self.flex_axes)),
+            ("buttons", "u1"),
+            ("padding", "u1"),
+        ]
+        if self.imu_values:
+            fields.append(("imu", "<f4", (self.imu_values,)))
+        return np.dtype(fields)
+
+
+class Recording:
+    """A capture file mapped into memory.
+
+    ``frames`` and the channel attributes are views into the mapping.
+    Views still held when the recording is closed keep the mapping alive,
+    it is released together with the last of them.
+    """
+
+    def __init__(self, path):
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError("empty recording")
+        self.header = Header(self._map)
+        dtype = self.header.dtype()
+        count = (len(self._map) - self.header.header_size) // dtype.itemsize
+        self.frames = np.frombuffer(self._map, dtype, count, self.header.header_size)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+    def __len__(self):
+        return len(self.frames)
+
+    def close(self):
+        self.frames = None
+        try:
+            self._map.close()
+        except BufferError:
+            # views are left, the mapping goes with the last of them
+            pass
+        finally:
+            self._map = None
+            self._file.close()
+
+    @property
+    def time(self):
+        """Nanoseconds since the start of the recording."""
+        return self.frames["time"]
+
+    @property
+    def flex(self):
+        """Angles in 1/64 degree, indexed by frame, finger and axis."""
+        return self.frames["flex"]
+
+    @property
+    def buttons(self):
+        """Button bits of every frame, see ``buttons.Buttons.state``."""
+        return self.frames["buttons"]
+
+    @property
+    def imu(self):
+        """IMU values of every frame, ``None`` if recorded without IMU."""
+        if not self.header.imu_values:
+            return None
+        return self.frames["imu"]
+
+    def imu_channel(self, name):
+        """Returns a view of one IMU output, like ``"euler"`` or ``"quaternion"``."""
+        start, length = IMU_CHANNELS[name]
+        return self.imu[:, start:start + length]
+
+    def degrees(self, finger, axis=0):
+        """Returns the angles of one flex channel in degrees."""
+        return self.flex[:, finger, axis] / recording.FLEX_SCALE
+
+    def button(self, button):
+        return (self.buttons >> button) & 1 == 1
+
+    def gaps(self):
+        """Returns the indexes of frames that follow lost frames."""
+        step = np.diff(self.frames["sequence"].astype(np.int32)) & 0xFFFF
+        return np.flatnonzero(step != 1) + 1
+
+
+class Capture:
+    """Writes a recorder stream to a file, frame by frame.
+
+    Bytes before the header are skipped. A frame is only written once the
+    sync word of the next frame follows it, so a frame the glove wrote only
+    in part is dropped up to the next sync word instead of being spliced
+    with the following one.
+    """
+
+    def __init__(self, out):
+        self.out = out
+        self.header = None
+        self.frames = 0
+        self.dropped_bytes = 0
+        self._buffer = bytearray()
+
+    def feed(self, data):
+        self._buffer += data
+        if self.header is None and not self._read_header():
+            return
+        buffer = self._buffer
+        size = self.header.frame_size
+        pos = 0
+        while len(buffer) - pos >= size + len(_SYNC_BYTES):
+            if buffer[pos:pos + 2] == _SYNC_BYTES and buffer[pos + size:pos + size + 2] == _SYNC_BYTES:
+                self.out.write(buffer[pos:pos + size])
+                self.frames += 1
+                pos += size
+                continue
+            next_sync = buffer.find(_SYNC_BYTES, pos + 1)
+            if next_sync < 0:
+                next_sync = len(buffer) - 1
+            self.dropped_bytes += next_sync - pos
+            pos = next_sync
+        del buffer[:pos]
+
+    def flush(self):
+        """Writes the last frame at the end of the stream if it is complete."""
+        buffer = self._buffer
+        if self.header is not None and buffer:
+            size = self.header.frame_size
+            if len(buffer) == size and buffer[:2] == _SYNC_BYTES:
+                self.out.write(buffer)
+                self.frames += 1
+            else:
+                self.dropped_bytes += len(buffer)
+            del buffer[:]
+
+    def _read_header(self):
+        buffer = self._buffer
+        start = buffer.find(recording.MAGIC)
+        if start < 0:
+            keep = len(recording.MAGIC) - 1
+            self.dropped_bytes += max(0, len(buffer) - keep)
+            del buffer[:-keep]
+            return False
+        if len(buffer) - start < recording.HEADER_SIZE:
+            return False
+        self.header = Header(buffer, start)
+        self.dropped_bytes += start
+        self.out.write(buffer[start:start + self.header.header_size])
+        del buffer[:start + self.header.header_size]
+        return True
+
+
+def capture(port, path):
+    """Records from a serial port until interrupted, returns the ``Capture``."""
+    fd = os.open(port, os.O_RDONLY | os.O_NOCTTY)
+    try:
+        if os.isatty(fd):
+            tty.setraw(fd)
+        with open(path, "wb") as out:
+            result = Capture(out)
+            try:
+                while True:
+                    data = os.read(fd, READ_SIZE)
+                    if not data:
+                        break
+                    result.feed(data)
+            except KeyboardInterrupt:
+                pass
+            result.flush()
+    finally:
+        os.close(fd)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    capture_parser = commands.add_parser("capture", help="record from a serial port")
+    capture_parser.add_argument("port")
+    capture_parser.add_argument("path")
+    info_parser = commands.add_parser("info", help="summarize a recording")
+    info_parser.add_argument("path")
+    args = parser.parse_args(argv)
+
+    if args.command == "capture":
+        result = capture(args.port, args.path)
+        print("frames:", result.frames, "dropped bytes:", result.dropped_bytes)
+        return 0
+    with Recording(args.path) as session:
+        header = session.header
+        duration = session.time[-1] / 1e9 if len(session) else 0.0
+        print("fingers: %d x %d axes, buttons: %d, imu values: %d, rate: %d Hz" % (
+            header.fingers, header.flex_axes, header.buttons, header.imu_values, header.rate
+        ))
+        print("frames: %d, duration: %.1f s, gaps: %d" % (len(session), duration, len(session.gaps())))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,267 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 Stefan Rothe
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""
+`host.sensor_batch` - Vectorized gesture detection over recorded sessions
+
+Runs the detection of ``sensor.Sensor`` over whole arrays of timestamps
+and raw values with NumPy. Scaling, clamping and the windowed variance
+are computed for all samples at once; the gesture state machine jumps
+from event to event with vectorized searches. The results are identical
+to feeding the samples one by one into ``Sensor.add_measurement``.
+
+Timestamps must be non-decreasing and use the unit of
+``gesture_timeout_ms``, as on the glove.
+"""
+
+import numpy as np
+
+import sensor
+
+# Samples searched at once before the search window is doubled
+CHUNK_SIZE = 1024
+
+
+class Params:
+    """One parameter set, named like the attributes of ``sensor.Sensor``."""
+
+    def __init__(
+        self,
+        raw_min,
+        raw_max,
+        min_stddev,
+        window=sensor.VALUE_COUNT,
+        gesture_threshold=sensor.GESTURE_THRESOLD,
+        gesture_timeout_ms=sensor.GESTURE_TIMEOUT_MS,
+    ):
+        self.raw_min = raw_min
+        self.raw_max = raw_max
+        self.min_stddev = min_stddev
+        self.window = window
+        self.gesture_threshold = gesture_threshold
+        self.gesture_timeout_ms = gesture_timeout_ms
+
+    def sensor(self):
+        """Returns an online ``sensor.Sensor`` configured with these parameters."""
+        result = sensor.Sensor(self.window)
+        result.configure(self.raw_min, self.raw_max, self.min_stddev)
+        result.gesture_threshold = self.gesture_threshold
+        result.gesture_timeout_ms = self.gesture_timeout_ms
+        return result
+
+    def __repr__(self):
+        return "Params(%r, %r, %r, window=%r, gesture_threshold=%r, gesture_timeout_ms=%r)" % (
+            self.raw_min, self.raw_max, self.min_stddev,
+            self.window, self.gesture_threshold, self.gesture_timeout_ms,
+        )
+
+
+class Result:
+    """Per-sample outputs and gesture events of one detection run.
+
+    ``activity``, ``value`` and ``gesture`` hold the state of the
+    corresponding ``Sensor`` attributes after each sample, ``scaled`` the
+    scaled measurement. The events are the samples at which a gesture was
+    detected, with their index, time and gesture code.
+    """
+
+    def __init__(self, params, activity, scaled, value, gesture, event_index, event_gesture, times):
+        self.params = params
+        self.activity = activity
+        self.scaled = scaled
+        self.value = value
+        self.gesture = gesture
+        self.event_index = event_index
+        self.event_time = times[event_index]
+        self.event_gesture = event_gesture
+
+
+def _scale(raw, raw_min, raw_max):
+    factor = sensor.MAX_VALUE / (raw_max - raw_min)
+    clamped = np.clip(raw, min(raw_min, raw_max), max(raw_min, raw_max))
+    return np.trunc((clamped - raw_min) * factor).astype(np.int64), factor
+
+
+def _window_sums(scaled, window):
+    """Returns the running sum and sum of squares of the ring buffer after each sample."""
+    centered = np.concatenate((np.zeros(window, np.int64), scaled - sensor.ZERO_VALUE))
+    sums = np.cumsum(centered)
+    squares = np.cumsum(centered * centered)
+    return sums[window:] - sums[:-window], squares[window:] - squares[:-window]
+
+
+def _first(mask):
+    index = int(np.argmax(mask))
+    return index if mask[index] else None
+
+
+class _Machine:
+    """Gesture state machine of ``Sensor.add_measurement`` over arrays."""
+
+    def __init__(self, params, times, active, scaled):
+        self.times = times
+        self.active = active
+        self.scaled = scaled
+        self.threshold = params.gesture_threshold
+        self.upper = sensor.MAX_VALUE - params.gesture_threshold
+        self.timeout_ms = params.gesture_timeout_ms
+        self.gesture_state = np.zeros(len(times), np.uint8)
+        self.event_index = []
+        self.event_gesture = []
+        self.value_min = sensor.MAX_VALUE
+        self.value_max = 0
+        self.time_min = 0
+        self.time_max = 0
+        self.gesture = 0
+        self.timeout = 0
+
+    def run(self):
+        i = 0
+        n = len(self.times)
+        while i < n:
+            if self.gesture:
+                i = self._wait(i)
+            else:
+                i = self._accumulate(i)
+
+    def _chunks(self, i):
+        n = len(self.times)
+        size = CHUNK_SIZE
+        while i < n:
+            end = min(n, i + size)
+            yield i, end
+            i = end
+            size *= 2
+
+    def _detect(self, index):
+        time = self.times[index]
+        self.gesture = sensor.GESTURE_UP if self.time_min < self.time_max else sensor.GESTURE_DOWN
+        self.timeout = time + self.timeout_ms
+        self.gesture_state[index] = self.gesture
+        self.event_index.append(index)
+        self.event_gesture.append(self.gesture)
+
+    def _accumulate(self, i):
+        """Updates min and max until a gesture is detected, returns the next index."""
+        for start, end in self._chunks(i):
+            active = self.active[start:end]
+            times = self.times[start:end]
+            values = self.scaled[start:end]
+            # an inactive sample clears the timeout for all later samples
+            timeout = np.where(np.cumsum(~active) == 0, self.timeout, 0)
+            eligible = active & (times >= timeout)
+            mins = np.minimum.accumulate(np.where(eligible, values, sensor.MAX_VALUE + 1))
+            maxs = np.maximum.accumulate(np.where(eligible, values, -1))
+            run_min = np.minimum(mins, self.value_min)
+            run_max = np.maximum(maxs, self.value_max)
+            hit = _first(eligible & (run_min < self.threshold) & (run_max > self.upper))
+            last = len(active) - 1 if hit is None else hit
+            if mins[last] < self.value_min:
+                self.time_min = times[_first(mins == mins[last])]
+                self.value_min = int(mins[last])
+            if maxs[last] > self.value_max:
+                self.time_max = times[_first(maxs == maxs[last])]
+                self.value_max = int(maxs[last])
+            if not active[:last + 1].all():
+                self.timeout = 0
+            if hit is not None:
+                self._detect(start + hit)
+                return start + hit + 1
+        return len(self.times)
+
+    def _wait(self, i):
+        """Holds the gesture until inactivity or its timeout, returns the next index."""
+        for start, end in self._chunks(i):
+            active = self.active[start:end]
+            stop = _first(~active | (self.times[start:end] >= self.timeout))
+            if stop is None:
+                self.gesture_state[start:end] = self.gesture
+                continue
+            index = start + stop
+            self.gesture_state[start:index] = self.gesture
+            self.gesture = 0
+            if not active[stop]:
+                self.timeout = 0
+                return index + 1
+            # timeout reached, restart from this sample
+            value = int(self.scaled[index])
+            self.value_min = self.value_max = value
+            self.time_min = self.time_max = self.times[index]
+            if value < self.threshold and value > self.upper:
+                self._detect(index)
+            return index + 1
+        return len(self.times)
+
+
+def _check_times(times):
+    if len(times) > 1 and np.any(np.diff(times) < 0):
+        raise ValueError("timestamps must be non-decreasing")
+
+
+def _detect(params, times, scaled, factor, sums):
+    window = params.window
+    window_sum, window_squares = sums
+    stddev = params.min_stddev * abs(factor)
+    activity_threshold = stddev ** 2
+    activity = activity_threshold * window * window < window * window_squares - window_sum * window_sum
+
+    # Sensor.value holds the last active scaled value
+    last_active = np.maximum.accumulate(np.where(activity, np.arange(len(times)), -1))
+    value = np.where(last_active >= 0, scaled[np.maximum(last_active, 0)], sensor.ZERO_VALUE)
+
+    machine = _Machine(params, times, activity, scaled)
+    machine.run()
+    return Result(
+        params, activity, scaled, value, machine.gesture_state,
+        np.array(machine.event_index, np.int64), np.array(machine.event_gesture, np.uint8), times,
+    )
+
+
+def detect(times, raw, params):
+    """Runs the detection with one parameter set, returns a ``Result``."""
+    return sweep(times, raw, [params])[0]
+
+
+def sweep(times, raw, params_list):
+    """Runs the detection for every parameter set, returns a list of ``Result``.
+
+    Scaled values and window sums are shared between parameter sets with
+    the same raw range and window size.
+    """
+    times = np.asarray(times)
+    raw = np.asarray(raw, dtype=np.float64)
+    if times.shape != raw.shape or times.ndim != 1:
+        raise ValueError("times and raw values must be one-dimensional arrays of equal length")
+    _check_times(times)
+    scaled_cache = {}
+    sums_cache = {}
+    results = []
+    for params in params_list:
+        key = (params.raw_min, params.raw_max)
+        if key not in scaled_cache:
+            scaled_cache[key] = _scale(raw, params.raw_min, params.raw_max)
+        scaled, factor = scaled_cache[key]
+        sums_key = key + (params.window,)
+        if sums_key not in sums_cache:
+            sums_cache[sums_key] = _window_sums(scaled, params.window)
+        results.append(_detect(params, times, scaled, factor, sums_cache[sums_key]))
+    return results
@@ -0,0 +1,180 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 Stefan Rothe
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""
+`host.sim` - Simulated I2C bus for running the drivers on Linux
+
+``install()`` puts stand-ins for the CircuitPython modules ``board``,
+``busio``, ``displayio``, ``micropython``, ``neopixel``, ``supervisor``,
+``adafruit_bus_device``, ``adafruit_displayio_ssd1306`` and
+``adafruit_register`` in front of ``sys.path``. The buses returned by
+``board.I2C()`` and ``busio.I2C()`` are populated with register-level
+models of the glove's devices at the addresses listed in the README.
+"""
+
+import errno
+import os
+import sys
+import time
+
+from host.sim.devices import BNO055Model, EEPROMModel, FlexModel, PCA9557Model, SSD1306Model
+
+MODULES_PATH = os.path.join(os.path.dirname(__file__), "modules")
+REPO_PATH = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+LIB_PATH = os.path.join(REPO_PATH, "lib")
+
+# Each byte on the bus takes 8 data bits and one acknowledge bit
+BITS_PER_BYTE = 9
+# Start condition, address byte and stop condition of a transaction
+TRANSACTION_OVERHEAD_BITS = 20
+
+
+def install():
+    """Makes the stand-in modules, the repository and its lib importable."""
+    for path in (LIB_PATH, REPO_PATH, MODULES_PATH):
+        if path in sys.path:
+            sys.path.remove(path)
+        sys.path.insert(0, path)
+
+
+def busy_wait(ns):
+    if ns > 0:
+        end = time.perf_counter_ns() + ns
+        while time.perf_counter_ns() < end:
+            pass
+
+
+class AddressStats:
+    def __init__(self):
+        self.transactions = 0
+        self.bytes = 0
+
+
+class SimI2C:
+    """Simulated I2C bus with the interface of ``busio.I2C``.
+
+    Every transaction takes the wire time at the bus frequency plus the
+    latency of the addressed device model.
+    """
+
+    def __init__(self, frequency=400000):
+        self.frequency = frequency
+        self.devices = {}
+        self.locked = False
+        self.lock_count = 0
+        self.transactions = 0
+        self.bytes = 0
+        self.stats = {}
+
+    def add(self, device):
+        self.devices[device.address] = device
+        return device
+
+    def remove(self, address):
+        self.devices.pop(address, None)
+
+    def reset_stats(self):
+        self.lock_count = 0
+        self.transactions = 0
+        self.bytes = 0
+        self.stats = {}
+
+    def try_lock(self):
+        if self.locked:
+            return False
+        self.locked = True
+        self.lock_count += 1
+        return True
+
+    def unlock(self):
+        self.locked = False
+
+    def deinit(self):
+        self.devices = {}
+
+    def scan(self):
+        return sorted(self.devices)
+
+    def writeto(self, address, buffer, *, start=0, end=None, stop=True):
+        device = self._begin(address)
+        if end is None:
+            end = len(buffer)
+        data = bytes(buffer[start:end])
+        device.write(data)
+        self._finish(device, address, len(data))
+
+    def readfrom_into(self, address, buffer, *, start=0, end=None):
+        device = self._begin(address)
+        if end is None:
+            end = len(buffer)
+        data = device.read(end - start)
+        buffer[start:end] = data
+        self._finish(device, address, end - start)
+
+    def writeto_then_readfrom(
+        self, address, buffer_out, buffer_in, *, out_start=0, out_end=None, in_start=0, in_end=None
+    ):
+        device = self._begin(address)
+        if out_end is None:
+            out_end = len(buffer_out)
+        if in_end is None:
+            in_end = len(buffer_in)
+        data = bytes(buffer_out[out_start:out_end])
+        device.write(data)
+        buffer_in[in_start:in_end] = device.read(in_end - in_start)
+        self._finish(device, address, len(data) + in_end - in_start)
+
+    def _begin(self, address):
+        if not self.locked:
+            raise RuntimeError("Function requires lock")
+        device = self.devices.get(address)
+        if device is None:
+            raise OSError(errno.ENODEV, "No device at address 0x%x" % address)
+        return device
+
+    def _finish(self, device, address, size):
+        self.transactions += 1
+        self.bytes += size
+        stats = self.stats.get(address)
+        if stats is None:
+            stats = self.stats[address] = AddressStats()
+        stats.transactions += 1
+        stats.bytes += size
+        bits = TRANSACTION_OVERHEAD_BITS + BITS_PER_BYTE * size
+        busy_wait(bits * 1000000000 // self.frequency + device.latency_ns)
+
+
+def glove(frequency=400000, latency_ns=0):
+    """Returns a bus populated with the devices of a complete glove."""
+    return populate(SimI2C(frequency), latency_ns)
+
+
+def populate(i2c, latency_ns=0):
+    """Adds the devices of a complete glove to a bus."""
+    for address in (0x12, 0x13, 0x14, 0x15):
+        i2c.add(FlexModel(address, latency_ns=latency_ns))
+    i2c.add(PCA9557Model(0x18, latency_ns=latency_ns))
+    i2c.add(PCA9557Model(0x19, latency_ns=latency_ns))
+    i2c.add(BNO055Model(0x28, latency_ns=latency_ns))
+    i2c.add(SSD1306Model(0x3C, latency_ns=latency_ns))
+    i2c.add(EEPROMModel(0x50, latency_ns=latency_ns))
+    return i2c
@@ -0,0 +1,292 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 Stefan Rothe
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""
+`host.sim.devices` - Register-level models of the glove's I2C devices
+
+A model receives the bytes of each write and produces the bytes of each
+read, the same way the real device answers on the bus. ``latency_ns`` is
+added to the wire time of every transaction addressed to the model.
+"""
+
+import errno
+import math
+import struct
+import time
+
+# Bend Labs command bytes, see flex.py
+ADS_SET_SAMPLE_RATE = 1
+ADS_RESET = 2
+ADS_SET_ADDRESS = 4
+ADS_POLL = 5
+ADS_GET_DEV_ID = 10
+# Bend Labs response packet types
+ADS_SAMPLE = 0
+ADS_DEV_ID = 2
+
+
+class DeviceModel:
+    def __init__(self, address, latency_ns=0):
+        self.address = address
+        self.latency_ns = latency_ns
+        self.writes = 0
+        self.reads = 0
+
+    def write(self, data):
+        self.writes += 1
+        if data:
+            self.on_write(data)
+
+    def read(self, size):
+        self.reads += 1
+        data = self.on_read(size)
+        return bytes(data[:size]).ljust(size, b"\x00")
+
+    def on_write(self, data):
+        pass
+
+    def on_read(self, size):
+        return b""
+
+
+def sine_angle(amplitude=90.0, hz=0.5):
+    """Returns a signal producing a bending angle that sweeps over time."""
+    def signal(axis):
+        t = time.monotonic()
+        return amplitude * math.sin(2 * math.pi * hz * t + axis)
+    return signal
+
+
+class FlexModel(DeviceModel):
+    """Bend Labs Soft Flex sensor.
+
+    Answers the reset, poll, sample rate, address and device type commands
+    used by ``flex.Flex``. Every read while polling returns a sample packet
+    with the angles produced by ``signal`` in units of 1/64 degree.
+    """
+
+    def __init__(self, address, axes=1, signal=None, latency_ns=0):
+        super().__init__(address, latency_ns)
+        self.axes = axes
+        self.signal = signal or sine_angle()
+        self.sample_rate = 0
+        self.polling = False
+        self.resets = 0
+        self._response = None
+
+    def on_write(self, data):
+        command = data[0]
+        if command == ADS_SET_SAMPLE_RATE:
+            self.sample_rate = data[1] | (data[2] << 8)
+        elif command == ADS_RESET:
+            self.resets += 1
+            self.polling = False
+            self._response = None
+        elif command == ADS_SET_ADDRESS:
+            self.address = data[1]
+        elif command == ADS_POLL:
+            self.polling = bool(data[1])
+        elif command == ADS_GET_DEV_ID:
+            self._response = bytes((ADS_DEV_ID, self.axes, 0))
+
+    def on_read(self, size):
+        if self._response is not None:
+            response = self._response
+            self._response = None
+            return response
+        if not self.polling:
+            return b"\xff"
+        packet = bytearray((ADS_SAMPLE,))
+        for axis in range(self.axes):
+            raw = int(round(self.signal(axis) * 64))
+            packet += struct.pack("<h", max(-0x8000, min(0x7FFF, raw)))
+        return packet
+
+
+class RegisterModel(DeviceModel):
+    """Device with a register pointer that auto-increments on access."""
+
+    def __init__(self, address, size, latency_ns=0):
+        super().__init__(address, latency_ns)
+        self.registers = bytearray(size)
+        self.pointer = 0
+
+    def on_write(self, data):
+        self.pointer = data[0]
+        for value in data[1:]:
+            self.write_register(self.pointer, value)
+            self.pointer = (self.pointer + 1) % len(self.registers)
+
+    def on_read(self, size):
+        result = bytearray(size)
+        for i in range(size):
+            result[i] = self.read_register(self.pointer)
+            self.pointer = (self.pointer + 1) % len(self.registers)
+        return result
+
+    def read_register(self, register):
+        return self.registers[register]
+
+    def write_register(self, register, value):
+        self.registers[register] = value
+
+
+class PCA9557Model(RegisterModel):
+    """PCA9557 I/O expander.
+
+    ``pins`` holds the logic levels applied to the inputs from outside.
+    The pointer does not auto-increment on this device.
+    """
+
+    def __init__(self, address, pins=0xFF, latency_ns=0):
+        super().__init__(address, 4, latency_ns)
+        self.pins = pins
+        # power-on defaults of output, polarity and configuration register
+        self.registers[1:4] = bytes((0x00, 0xF0, 0xFF))
+
+    def on_write(self, data):
+        self.pointer = data[0] & 0x03
+        if len(data) > 1:
+            self.registers[self.pointer] = data[-1]
+
+    def on_read(self, size):
+        return bytes(self.read_register(self.pointer) for _ in range(size))
+
+    def read_register(self, register):
+        if register == 0:
+            config = self.registers[3]
+            levels = (self.pins & config) | (self.registers[1] & ~config & 0xFF)
+            return levels ^ self.registers[2]
+        return self.registers[register]
+
+
+BNO055_CHIP_ID = 0xA0
+BNO055_DATA_START = 0x08
+BNO055_DATA_END = 0x34
+BNO055_CALIB_STAT = 0x35
+BNO055_MODE = 0x3D
+BNO055_OFFSETS_START = 0x55
+BNO055_OFFSETS_END = 0x6B
+
+
+class BNO055Model(RegisterModel):
+    """Bosch BNO055 IMU, page 0 of the register map.
+
+    The data registers from accelerometer to gravity vector are filled
+    from ``signal`` whenever a read starts inside that block.
+    """
+
+    def __init__(self, address=0x28, signal=None, latency_ns=0):
+        super().__init__(address, 0x80, latency_ns)
+        self.signal = signal or sine_angle(amplitude=1000.0, hz=1.0)
+        self.registers[0x00] = BNO055_CHIP_ID
+        self.offsets_written = False
+
+    def on_read(self, size):
+        if BNO055_DATA_START <= self.pointer < BNO055_DATA_END:
+            for register in range(BNO055_DATA_START, BNO055_DATA_END, 2):
+                value = int(self.signal(register)) & 0xFFFF
+                self.registers[register] = value & 0xFF
+                self.registers[register + 1] = value >> 8
+        return super().on_read(size)
+
+    def read_register(self, register):
+        if register == BNO055_CALIB_STAT:
+            fusion = self.registers[BNO055_MODE] > 0x07
+            return 0xFF if fusion and self.offsets_written else 0x00
+        return self.registers[register]
+
+    def write_register(self, register, value):
+        if BNO055_OFFSETS_START <= register < BNO055_OFFSETS_END:
+            if self.registers[BNO055_MODE] != 0x00:
+                # offsets are only writable in config mode
+                return
+            self.offsets_written = True
+        self.registers[register] = value
+
+
+class EEPROMModel(DeviceModel):
+    """Microchip 24AA64 serial EEPROM.
+
+    Writes take effect within a 32 byte page, wrapping at the page end.
+    During the write cycle the device does not acknowledge its address.
+    """
+
+    PAGE_SIZE = 32
+
+    def __init__(self, address=0x50, size=8192, write_cycle_ns=5000000, latency_ns=0):
+        super().__init__(address, latency_ns)
+        self.memory = bytearray(b"\xff" * size)
+        self.write_cycle_ns = write_cycle_ns
+        self.page_writes = 0
+        self.pointer = 0
+        self._busy_until = 0
+
+    @property
+    def busy(self):
+        return time.perf_counter_ns() < self._busy_until
+
+    def write(self, data):
+        if self.busy:
+            raise OSError(errno.ENODEV, "EEPROM write cycle in progress")
+        super().write(data)
+
+    def read(self, size):
+        if self.busy:
+            raise OSError(errno.ENODEV, "EEPROM write cycle in progress")
+        return super().read(size)
+
+    def on_write(self, data):
+        if len(data) < 2:
+            return
+        self.pointer = ((data[0] << 8) | data[1]) % len(self.memory)
+        if len(data) > 2:
+            page = self.pointer - self.pointer % self.PAGE_SIZE
+            for i, value in enumerate(data[2:]):
+                self.memory[page + (self.pointer + i) % self.PAGE_SIZE] = value
+            self.page_writes += 1
+            self._busy_until = time.perf_counter_ns() + self.write_cycle_ns
+
+    def on_read(self, size):
+        result = bytearray(size)
+        for i in range(size):
+            result[i] = self.memory[self.pointer]
+            self.pointer = (self.pointer + 1) % len(self.memory)
+        return result
+
+
+class SSD1306Model(DeviceModel):
+    """SSD1306 display controller, counts command and pixel data bytes."""
+
+    # First byte of a transfer: 0x00 commands follow, 0x40 pixel data
+    CONTROL_DATA = 0x40
+
+    def __init__(self, address=0x3C, latency_ns=0):
+        super().__init__(address, latency_ns)
+        self.command_bytes = 0
+        self.data_bytes = 0
+
+    def on_write(self, data):
+        if data[0] == self.CONTROL_DATA:
+            self.data_bytes += len(data) - 1
+        else:
+            self.command_bytes += len(data) - 1
@@ -0,0 +1,41 @@
+"""Stand-in for ``adafruit_displayio_ssd1306``.
+
+``refresh()`` sends the dirty area of every tile grid expanded to whole
+pages of eight rows, with column and page addressing commands in front,
+as displayio does for the SSD1306.
+"""
+
+PAGE_HEIGHT = 8
+
+
+class SSD1306:
+    def __init__(self, bus, *, width, height, auto_refresh=True, **kwargs):
+        self.bus = bus
+        self.width = width
+        self.height = height
+        self.auto_refresh = auto_refresh
+        self.root_group = None
+        self.refreshes = 0
+
+    def show(self, group):
+        self.root_group = group
+        for tile_grid in group:
+            bitmap = tile_grid.bitmap
+            bitmap.dirty = [0, 0, bitmap.width, bitmap.height]
+
+    def refresh(self, *, target_frames_per_second=60, minimum_frames_per_second=1):
+        if self.root_group is None:
+            return True
+        for tile_grid in self.root_group:
+            area = tile_grid.bitmap.dirty
+            if area is None:
+                continue
+            tile_grid.bitmap.dirty = None
+            x0 = tile_grid.x + area[0]
+            x1 = tile_grid.x + area[2]
+            page0 = (tile_grid.y + area[1]) // PAGE_HEIGHT
+            page1 = (tile_grid.y + area[3] - 1) // PAGE_HEIGHT
+            self.bus.send(bytes((0x00, 0x21, x0, x1 - 1, 0x22, page0, page1)))
+            self.bus.send(b"\x40" + bytes((x1 - x0) * (page1 - page0 + 1)))
+        self.refreshes += 1
+        return True
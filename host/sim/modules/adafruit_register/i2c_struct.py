@@ -0,0 +1,38 @@
+"""Stand-in for ``adafruit_register.i2c_struct`` with the same behaviour."""
+
+import struct
+
+
+class Struct:
+    def __init__(self, register_address, struct_format):
+        self.format = struct_format
+        self.buffer = bytearray(1 + struct.calcsize(self.format))
+        self.buffer[0] = register_address
+
+    def __get__(self, obj, objtype=None):
+        with obj.i2c_device as i2c:
+            i2c.write_then_readinto(self.buffer, self.buffer, out_end=1, in_start=1)
+        return struct.unpack_from(self.format, memoryview(self.buffer)[1:])
+
+    def __set__(self, obj, value):
+        struct.pack_into(self.format, self.buffer, 1, *value)
+        with obj.i2c_device as i2c:
+            i2c.write(self.buffer)
+
+
+class UnaryStruct:
+    def __init__(self, register_address, struct_format):
+        self.format = struct_format
+        self.address = register_address
+
+    def __get__(self, obj, objtype=None):
+        buf = bytearray(1 + struct.calcsize(self.format))
+        buf[0] = self.address
+        with obj.i2c_device as i2c:
+            i2c.write_then_readinto(buf, buf, out_end=1, in_start=1)
+        return struct.unpack_from(self.format, buf, 1)[0]
+
+    def __set__(self, obj, value):
+        buf = struct.pack("<B" + self.format[1:], self.address, value)
+        with obj.i2c_device as i2c:
+            i2c.write(buf)
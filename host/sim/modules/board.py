@@ -0,0 +1,26 @@
+"""Stand-in for the CircuitPython ``board`` module of a Feather M4 Express."""
+
+from host import sim
+
+A0 = "A0"
+A1 = "A1"
+A2 = "A2"
+A3 = "A3"
+A4 = "A4"
+A5 = "A5"
+D9 = "D9"
+NEOPIXEL = "NEOPIXEL"
+RX = "RX"
+SCL = "SCL"
+SDA = "SDA"
+TX = "TX"
+
+_i2c = None
+
+
+def I2C():
+    """Returns the shared bus, populated with a complete glove."""
+    global _i2c
+    if _i2c is None:
+        _i2c = sim.glove()
+    return _i2c
@@ -0,0 +1,56 @@
+"""Stand-in for the CircuitPython ``busio`` module."""
+
+from host import sim
+
+
+class I2C(sim.SimI2C):
+    def __init__(self, scl, sda, *, frequency=100000, timeout=255):
+        super().__init__(frequency)
+        sim.populate(self)
+
+
+class UART:
+    """In-memory UART. ``feed()`` queues bytes from the host, ``written``
+    collects everything the glove sends."""
+
+    def __init__(self, tx=None, rx=None, *, baudrate=9600, timeout=1, receiver_buffer_size=64, **kwargs):
+        self.baudrate = baudrate
+        self.receiver_buffer_size = receiver_buffer_size
+        self.written = bytearray()
+        self._rx = bytearray()
+
+    def feed(self, data):
+        self._rx += data
+        # like the hardware, bytes beyond the receive buffer are lost
+        del self._rx[:max(0, len(self._rx) - self.receiver_buffer_size)]
+
+    @property
+    def in_waiting(self):
+        return len(self._rx)
+
+    def read(self, nbytes=None):
+        if not self._rx:
+            return None
+        if nbytes is None:
+            nbytes = len(self._rx)
+        data = bytes(self._rx[:nbytes])
+        del self._rx[:nbytes]
+        return data
+
+    def readinto(self, buf, nbytes=None):
+        if not self._rx:
+            return None
+        n = min(len(buf), len(self._rx)) if nbytes is None else min(nbytes, len(buf), len(self._rx))
+        buf[:n] = self._rx[:n]
+        del self._rx[:n]
+        return n
+
+    def write(self, buf):
+        self.written += buf
+        return len(buf)
+
+    def reset_input_buffer(self):
+        self._rx = bytearray()
+
+    def deinit(self):
+        pass
@@ -0,0 +1,77 @@
+"""Stand-in for the CircuitPython ``displayio`` module.
+
+Bitmaps track the rectangle changed since the last refresh the same way
+displayio does, so the display stand-in can send only the dirty areas.
+"""
+
+
+def release_displays():
+    pass
+
+
+class Bitmap:
+    def __init__(self, width, height, value_count):
+        self.width = width
+        self.height = height
+        self._pixels = bytearray(width * height)
+        self.dirty = None
+
+    def __getitem__(self, index):
+        x, y = index
+        return self._pixels[y * self.width + x]
+
+    def __setitem__(self, index, value):
+        x, y = index
+        self._pixels[y * self.width + x] = value
+        if self.dirty is None:
+            self.dirty = [x, y, x + 1, y + 1]
+        else:
+            area = self.dirty
+            area[0] = min(area[0], x)
+            area[1] = min(area[1], y)
+            area[2] = max(area[2], x + 1)
+            area[3] = max(area[3], y + 1)
+
+    def fill(self, value):
+        for i in range(len(self._pixels)):
+            self._pixels[i] = value
+        self.dirty = [0, 0, self.width, self.height]
+
+
+class Palette:
+    def __init__(self, color_count):
+        self._colors = [0] * color_count
+
+    def __getitem__(self, index):
+        return self._colors[index]
+
+    def __setitem__(self, index, color):
+        self._colors[index] = color
+
+
+class TileGrid:
+    def __init__(self, bitmap, *, pixel_shader, x=0, y=0):
+        self.bitmap = bitmap
+        self.pixel_shader = pixel_shader
+        self.x = x
+        self.y = y
+
+
+class Group(list):
+    def __init__(self, *, max_size=4, scale=1, x=0, y=0):
+        super().__init__()
+        self.max_size = max_size
+
+
+class I2CDisplay:
+    def __init__(self, i2c_bus, *, device_address, reset=None):
+        self.i2c = i2c_bus
+        self.device_address = device_address
+
+    def send(self, data):
+        while not self.i2c.try_lock():
+            pass
+        try:
+            self.i2c.writeto(self.device_address, data)
+        finally:
+            self.i2c.unlock()
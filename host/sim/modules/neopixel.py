@@ -0,0 +1,51 @@
+"""Stand-in for the CircuitPython ``neopixel`` module.
+
+``show()`` takes the time the real strip needs to receive the frame.
+"""
+
+from host import sim
+
+GRB = (1, 0, 2)
+RGB = (0, 1, 2)
+
+# 24 bits per pixel at 800 kHz
+SHOW_NS_PER_PIXEL = 30000
+# Latch time after each frame
+SHOW_RESET_NS = 50000
+
+
+class NeoPixel:
+    shows = 0
+
+    def __init__(self, pin, n, *, bpp=3, brightness=1.0, auto_write=True, pixel_order=None):
+        self.pin = pin
+        self.n = n
+        self.brightness = brightness
+        self.auto_write = auto_write
+        self.shows = 0
+        self._pixels = [(0,) * bpp] * n
+
+    def __len__(self):
+        return self.n
+
+    def __getitem__(self, index):
+        return self._pixels[index]
+
+    def __setitem__(self, index, value):
+        self._pixels[index] = value
+        if self.auto_write:
+            self.show()
+
+    def fill(self, color):
+        for i in range(self.n):
+            self._pixels[i] = color
+        if self.auto_write:
+            self.show()
+
+    def show(self):
+        self.shows += 1
+        NeoPixel.shows += 1
+        sim.busy_wait(self.n * SHOW_NS_PER_PIXEL + SHOW_RESET_NS)
+
+    def deinit(self):
+        pass
@@ -0,0 +1,8 @@
+"""Stand-in for the CircuitPython ``supervisor`` module."""
+
+
+class _Runtime:
+    serial_bytes_available = False
+
+
+runtime = _Runtime()
@@ -25,7 +25,11 @@ ANALOG_PIN_MAP = [
     SENSOR_FLEX_INDEX_FINGER,
     SENSOR_FLEX_MIDDLE_FINGER,
     SENSOR_FLEX_RING_FINGER,
-    SENSOR_FLEX_LITTLE_FINGER
+    SENSOR_FLEX_LITTLE_FINGER,
+    SENSOR_FLEX_INDEX_FINGER_AXIS_2,
+    SENSOR_FLEX_MIDDLE_FINGER_AXIS_2,
+    SENSOR_FLEX_RING_FINGER_AXIS_2,
+    SENSOR_FLEX_LITTLE_FINGER_AXIS_2
 ]
 
 DIGITAL_PIN_BUTTON = [
@@ -53,35 +57,120 @@ DIGITAL_PIN_MAP = [
 ]
 """
 
+from micropython import const
+import array
+import buttons
+import struct
+
+BOARD_ID = 1
+FINGER_COUNT = const(4)
+# digital pins 8 to 11 carry the gestures.WAVE_LEFT to WAVE_DOWN gestures
+GESTURE_PIN = const(8)
+GESTURE_COUNT = const(4)
+# 0xFF 0xFF, payload length, command
+HEADER_SIZE = 4
+SYNC = const(0xFF)
+# Longest command payload accepted from the host
+MAX_PAYLOAD = const(16)
+RX_BUFFER_SIZE = const(64)
+# Longest keyframe interval of delta mode, the frame index fits a byte
+MAX_KEYFRAME_INTERVAL = const(255)
+
+COMMAND_SET_BOARD_ID = const(0x41) # 'A'
+COMMAND_BOARD_ID = const(0x42)     # 'B'
+COMMAND_DELTA = const(0x43)        # 'C'
+COMMAND_DATA_ON = const(0x44)      # 'D'
+COMMAND_INPUT_CONFIG = const(0x49) # 'I'
+COMMAND_JUNXION_ID = const(0x4A)   # 'J'
+COMMAND_PROFILE = const(0x50)      # 'P'
+COMMAND_DATA_OFF = const(0x53)     # 'S'
+
+# receive parser states
+_WAIT_SYNC = const(0)
+_WAIT_SYNC_2 = const(1)
+_WAIT_LENGTH = const(2)
+_WAIT_COMMAND = const(3)
+_WAIT_PAYLOAD = const(4)
+
 class JunxionAdapter:
-    def __init__(self, device):
-        self.analog_pin_count = 4
-        self.digital_pin_count = 8
+    def __init__(self, device, board_id=BOARD_ID, gestures=None, settings=None):
+        # pins 4 to 7 carry the second axis of two-axis flex sensors
+        self.analog_pin_count = 2 * FINGER_COUNT
+        self.digital_pin_count = GESTURE_PIN + GESTURE_COUNT
         self.own_pin_count = 0
         self.device = device
+        self.gestures = gestures
+        self.settings = settings
+        self._board_id = board_id
+        # buttons pressed since the last frame, even if released already
+        self._latched = 0
+        self._gestures_latched = 0
+        self._event_times = array.array("q", [0] * buttons.EVENT_QUEUE_SIZE)
+        self._event_codes = array.array("B", [0] * buttons.EVENT_QUEUE_SIZE)
+
+
+    @property
+    def layout_version(self):
+        """Changes whenever the availability of a pin changes."""
+        return self.device.layout_version
 
 
     def board_id(self):
-        return self.device.board_id
+        return self._board_id
+
+
+    def set_board_id(self, board_id):
+        """Changes the board ID and keeps it in the settings, if there are any."""
+        self._board_id = board_id
+        if self.settings:
+            try:
+                self.settings.save_board_id(board_id)
+            except OSError:
+                print("EEPROM lost, board ID", board_id, "not kept")
+
+
+    def update(self):
+        """Collects the button events and gestures since the last frame."""
+        self._latched = 0
+        if self.gestures:
+            self._gestures_latched = self.gestures.detected
+            self.gestures.detected = 0
+        events = self.device.buttons.events
+        while len(events):
+            n = events.drain(self._event_times, self._event_codes)
+            for i in range(n):
+                code = self._event_codes[i]
+                if code & buttons.PRESS:
+                    self._latched |= 1 << (code & buttons.BUTTON_MASK)
 
 
     def analog_pin_available(self, pin):
-        return bool(self.device.fingers[pin].flex_sensor)
+        if pin < FINGER_COUNT:
+            return bool(self.device[pin].flex)
+        flex = self.device[pin - FINGER_COUNT].flex
+        return bool(flex) and flex.axes > 1
 
 
     def analog_pin_value(self, pin):
-        return self.device.fingers[pin].flex_sensor.value
+        if pin < FINGER_COUNT:
+            return self.device[pin].sensor.value
+        # second axis, scaled to the range of the first
+        finger = self.device[pin - FINGER_COUNT]
+        return finger.sensor.scale(finger.flex_values[1])
 
 
     def digital_pin_available(self, pin):
+        if GESTURE_PIN <= pin < GESTURE_PIN + GESTURE_COUNT:
+            return self.gestures is not None
         return 0 <= pin < 8
 
 
     def digital_pin_active(self, pin):
-        if 0 <= pin < 4:
-            return self.device.button[pin].pressed
-        elif 4 <= pin < 8:
-            return self.device.fingers[pin - 4].button_pressed
+        if 0 <= pin < 8:
+            return bool((self.device.buttons.state | self._latched) & (1 << pin))
+        elif GESTURE_PIN <= pin < GESTURE_PIN + GESTURE_COUNT and self.gestures:
+            bit = 1 << (pin - GESTURE_PIN)
+            return bool((self.gestures.state | self._gestures_latched) & bit)
         else:
             return False
 
@@ -95,116 +184,273 @@ class JunxionAdapter:
 
 
 class Junxion:
-    def __init__(self, device):
+    def __init__(self, device, uart, profiler=None):
         self.device = device
+        self.uart = uart
+        self.profiler = profiler
         self._data_enabled = False
-        self.header_received = False
-        self.package_size = 0
+        self._layout_version = None
+        self._digital_pins = []
+        self._analog_pins = []
+        self._own_pins = []
+        self._data_frame = bytearray(HEADER_SIZE)
+        # delta mode: a 'd' keyframe every interval frames, 'c' frames in between
+        self.keyframe_interval = 0
+        self._frame_index = 0
+        self._previous = bytearray(0)
+        self._delta_frame = bytearray(HEADER_SIZE)
+        # receive parser
+        self.commands = 0
+        self.dropped_bytes = 0
+        self.malformed = 0
+        self._rx = bytearray(RX_BUFFER_SIZE)
+        self._state = _WAIT_SYNC
+        self._command = 0
+        self._length = 0
+        self._payload = bytearray(MAX_PAYLOAD)
+        self._payload_pos = 0
+        self.update_layout()
 
 
     def update(self):
-        if not self.header_received and self.uart.in_waiting >= 3:
-            header = self.uart.read(3)
-            if header[0] == 0xFF and header[1] == 0xFF:
-                self.header_received = True
-                self.package_size = header[2]
-        if self.header_received and self.uart.in_waiting > self.package_size:
-            command = self.uart.read(1)
-            self.handle_command(command)
-            self.header_received = False
+        self.receive()
         if self._data_enabled:
             self.send_data()
 
 
-    def handle_command(self, command):
-        if command == 'D':
+    def receive(self):
+        """Handles all complete commands received so far without blocking."""
+        while self.uart.in_waiting:
+            n = self.uart.readinto(self._rx)
+            if not n:
+                return
+            for i in range(n):
+                self._parse(self._rx[i])
+
+
+    def handle_command(self, command, payload, length):
+        if command == COMMAND_DATA_ON:
             self._data_enabled = True
-        elif command == 'S':
+        elif command == COMMAND_DATA_OFF:
             self._data_enabled = False
-        elif command == 'B':
+        elif command == COMMAND_BOARD_ID:
             self.send_board_id()
-        elif command == 'J':
+        elif command == COMMAND_SET_BOARD_ID and length:
+            self.device.set_board_id(payload[0])
+            self.send_board_id()
+        elif command == COMMAND_JUNXION_ID:
             self.send_junxion_id()
-        elif command == 'I':
+        elif command == COMMAND_INPUT_CONFIG:
             self.send_input_config()
+        elif command == COMMAND_PROFILE and self.profiler:
+            self.send_profile()
+        elif command == COMMAND_DELTA:
+            self.set_keyframe_interval(payload[0] if length else 0)
+        else:
+            return False
+        return True
+
+
+    def _parse(self, byte):
+        state = self._state
+        if state == _WAIT_SYNC:
+            if byte == SYNC:
+                self._state = _WAIT_SYNC_2
+            else:
+                self.dropped_bytes += 1
+        elif state == _WAIT_SYNC_2:
+            if byte == SYNC:
+                self._state = _WAIT_LENGTH
+            else:
+                self.dropped_bytes += 2
+                self._state = _WAIT_SYNC
+        elif state == _WAIT_LENGTH:
+            if byte == SYNC:
+                # more than two sync bytes, the first one was stray
+                self.dropped_bytes += 1
+            elif byte > MAX_PAYLOAD:
+                self.malformed += 1
+                self._state = _WAIT_SYNC
+            else:
+                self._length = byte
+                self._state = _WAIT_COMMAND
+        elif state == _WAIT_COMMAND:
+            self._command = byte
+            self._payload_pos = 0
+            if self._length == 0:
+                self._dispatch()
+            else:
+                self._state = _WAIT_PAYLOAD
+        else:
+            self._payload[self._payload_pos] = byte
+            self._payload_pos += 1
+            if self._payload_pos >= self._length:
+                self._dispatch()
+
+
+    def _dispatch(self):
+        self._state = _WAIT_SYNC
+        if self.handle_command(self._command, self._payload, self._length):
+            self.commands += 1
+        else:
+            self.malformed += 1
+
+
+    def update_layout(self):
+        """Collects the available pins and allocates the data frame for them."""
+        device = self.device
+        self._layout_version = device.layout_version
+        self._digital_pins = [i for i in range(device.digital_pin_count) if device.digital_pin_available(i)]
+        self._analog_pins = [i for i in range(device.analog_pin_count) if device.analog_pin_available(i)]
+        self._own_pins = [i for i in range(device.own_pin_count) if device.own_pin_available(i)]
+        words = (len(self._digital_pins) + 15) // 16
+        size = 2 * (words + len(self._analog_pins) + len(self._own_pins))
+        self._data_frame = bytearray(HEADER_SIZE + size)
+        self._data_frame[0] = 0xFF
+        self._data_frame[1] = 0xFF
+        self._data_frame[2] = size
+        self._data_frame[3] = ord('d')
+        # frame index byte, change bitmap and at most all values
+        self._previous = bytearray(size)
+        self._delta_frame = bytearray(HEADER_SIZE + 1 + (size // 2 + 7) // 8 + size)
+        self._delta_frame[0] = 0xFF
+        self._delta_frame[1] = 0xFF
+        self._delta_frame[3] = ord('c')
+        self._frame_index = 0
+
+
+    def set_keyframe_interval(self, interval):
+        """Sends a 'd' keyframe every interval data frames and 'c' delta frames in between.
+
+        Intervals of 0 and 1 send keyframes only.
+        """
+        self.keyframe_interval = min(interval, MAX_KEYFRAME_INTERVAL)
+        self._frame_index = 0
 
 
     def send_data(self):
         device = self.device
-        data = []
+        if device.layout_version != self._layout_version:
+            self.update_layout()
+        device.update()
+        frame = self._data_frame
+        offset = HEADER_SIZE
         state = 0
         pos = 0
         # collect digital pin states
-        for i in range(device.digital_pin_count):
-            if device.digital_pin_available(i):
-                if device.digital_pin_active(i):
-                    state = state | (1 << pos)
-                ++pos
-                if pos >= 16:
-                    data.append(state / 256)
-                    data.append(state % 256)
-                    state = 0
-                    pos = 0
+        for pin in self._digital_pins:
+            if device.digital_pin_active(pin):
+                state |= 1 << pos
+            pos += 1
+            if pos >= 16:
+                struct.pack_into(">H", frame, offset, state)
+                offset += 2
+                state = 0
+                pos = 0
         if pos > 0:
-            data.append(state / 256)
-            data.append(state % 256)
+            struct.pack_into(">H", frame, offset, state)
+            offset += 2
         # collect analog pin states
-        for i in range(device.analog_pin_count):
-            if device.analog_pin_available(i):
-                value = device.analog_pin_value(i)
-                data.append(value / 256)
-                data.append(value % 256)
-        # collect own pin states                
-        for i in range(device.own_pin_count):
-            if device.own_pin_available(i):
-                value = device.own_pin_value(i)
-                data.append(value / 256)
-                data.append(value % 256)
-        self._send('d', data)
-
-
-    def send_input_config():
+        for pin in self._analog_pins:
+            struct.pack_into(">H", frame, offset, device.analog_pin_value(pin))
+            offset += 2
+        # collect own pin states
+        for pin in self._own_pins:
+            struct.pack_into(">H", frame, offset, device.own_pin_value(pin))
+            offset += 2
+        if self._frame_index:
+            self._send_delta()
+        else:
+            self.uart.write(frame)
+            self._previous[:] = memoryview(frame)[HEADER_SIZE:]
+        if self.keyframe_interval > 1:
+            self._frame_index = (self._frame_index + 1) % self.keyframe_interval
+
+
+    def _send_delta(self):
+        """Sends the 16 bit words of the data frame that changed since the last frame.
+
+        Payload: the index of the frame since the last keyframe, a bitmap
+        with bit i % 8 of byte i // 8 set if word i changed, and the
+        changed words in order.
+        """
+        frame = self._data_frame
+        previous = self._previous
+        delta = self._delta_frame
+        words = len(previous) // 2
+        bitmap = HEADER_SIZE + 1
+        for i in range((words + 7) // 8):
+            delta[bitmap + i] = 0
+        out = bitmap + (words + 7) // 8
+        for word in range(words):
+            pos = 2 * word
+            high = frame[HEADER_SIZE + pos]
+            low = frame[HEADER_SIZE + pos + 1]
+            if high != previous[pos] or low != previous[pos + 1]:
+                delta[bitmap + (word >> 3)] |= 1 << (word & 7)
+                delta[out] = high
+                delta[out + 1] = low
+                out += 2
+                previous[pos] = high
+                previous[pos + 1] = low
+        delta[2] = out - HEADER_SIZE
+        delta[4] = self._frame_index
+        self.uart.write(memoryview(delta)[:out])
+
+
+    def send_input_config(self):
         device = self.device
+        if device.layout_version != self._layout_version:
+            self.update_layout()
         data = []
-        for i in range(device.digital_pin_count):
-            if device.digital_pin_available(i):
-                data.append(ord('d')) # type
-                data.append(i) # id
-                data.append(1) # resolution
-        for i in range(device.analog_pin_count):
-            if device.analog_pin_available(i):
-                data.append(ord('a')) # type
-                data.append(i) # id
-                data.append(16) # resolution
-        for i in range(device.own_pin_count):
-            if device.own_pin_available(i):
-                data.append(ord('o')) # type
-                data.append(i) # id
-                data.append(16) # resolution
+        for i in self._digital_pins:
+            data.append(ord('d')) # type
+            data.append(i) # id
+            data.append(1) # resolution
+        for i in self._analog_pins:
+            data.append(ord('a')) # type
+            data.append(i) # id
+            data.append(16) # resolution
+        for i in self._own_pins:
+            data.append(ord('o')) # type
+            data.append(i) # id
+            data.append(16) # resolution
         self._send('p', data)
 
 
-    def send_board_id(self):
-        self._send_('b', 1, [self.device.board_id()])
+    def send_profile(self):
+        """Sends one 'h' frame per profiler stage and I2C device, then an
+        empty 'h' frame that ends the profile.
 
-
-    def send_junxion_id(self):
-        self._send('j', [1, 52])
+        Payload: kind ('s' stage, 'i' device), stage index or device address,
+        count, max us and bytes as big endian 32 bit values, the bucket
+        counts as big endian 32 bit values and the name.
+        """
+        for i, histogram in enumerate(self.profiler.stages):
+            self._send_histogram('s', i, histogram, 0)
+        for address in sorted(self.profiler.devices):
+            device = self.profiler.devices[address]
+            self._send_histogram('i', address, device, device.bytes)
+        self._send('h', [])
 
 
-    def _send_uint_16(self, data):
-        self.uart.write(bytes([data / 256, data % 256]))
+    def _send_histogram(self, kind, key, histogram, size):
+        data = [ord(kind), key]
+        for value in (histogram.count, histogram.max_ns // 1000, size):
+            data.extend(struct.pack(">I", value & 0xFFFFFFFF))
+        for count in histogram.buckets:
+            data.extend(struct.pack(">I", count))
+        data.extend(histogram.name.encode())
+        self._send('h', data)
 
 
-    def _send(self, command, data):
-        d = [0xFF, 0xFF, len(data), ord(command)] + data
-        print(d)
-#        self.uart.write(bytes(d))
+    def send_board_id(self):
+        self._send('b', [self.device.board_id()])
 
 
-def test():
-    j = Junxion(None)
-    j.send_junxion_id()
+    def send_junxion_id(self):
+        self._send('j', [1, 52])
 
 
-test()
\ No newline at end of file
+    def _send(self, command, data):
+        self.uart.write(bytes([0xFF, 0xFF, len(data), ord(command)] + data))
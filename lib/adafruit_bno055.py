@@ -30,6 +30,7 @@ inertial measurement unit module with sensor fusion.
 
 * Author(s): Radomir Dopieralski
 """
+import array
 import time
 import struct
 
@@ -79,6 +80,35 @@ _CALIBRATION_REGISTER = const(0x35)
 _TRIGGER_REGISTER = const(0x3F)
 _POWER_REGISTER = const(0x3E)
 _ID_REGISTER = const(0x00)
+_DATA_REGISTER = const(0x08)
+_OFFSETS_REGISTER = const(0x55)
+OFFSETS_SIZE = const(22)
+_DATA_SIZE = const(44)
+
+# Offsets of the outputs in the array filled by BNO055_I2C.read_fusion()
+ACCELERATION = const(0)  # x, y, z in m/s^2
+MAGNETIC = const(3)  # x, y, z in microteslas
+GYRO = const(6)  # x, y, z in rad/s
+EULER = const(9)  # heading, roll, pitch in degrees
+QUATERNION = const(12)  # w, x, y, z
+LINEAR_ACCELERATION = const(16)  # x, y, z in m/s^2
+GRAVITY = const(19)  # x, y, z in m/s^2
+FUSION_SIZE = const(22)
+
+_FUSION_SCALES = (
+    (1 / 100,) * 3
+    + (1 / 16,) * 3
+    + (0.001090830782496456,) * 3
+    + (1 / 16,) * 3
+    + (1 / (1 << 14),) * 4
+    + (1 / 100,) * 3
+    + (1 / 100,) * 3
+)
+_FUSION_MODES = (COMPASS_MODE, M4G_MODE, NDOF_FMC_OFF_MODE, NDOF_MODE)
+
+# Switching times, datasheet table 3.6
+CONFIG_MODE_SETTLE_S = 0.02
+OPERATION_MODE_SETTLE_S = 0.01
 
 
 class _ScaledReadOnlyStruct(Struct):  # pylint: disable=too-few-public-methods
@@ -102,8 +132,13 @@ class BNO055_I2C:  # pylint: disable=too-many-public-methods
 
     _linear_acceleration = _ScaledReadOnlyStruct(0x28, "<hhh", 1 / 100)
 
-    def __init__(self, i2c, address=0x28):
+    def __init__(self, i2c, address=0x28, wait=True):
         self.buffer = bytearray(2)
+        self.fusion = array.array("f", [0.0] * FUSION_SIZE)
+        # optional filters.Chain over the raw register values, one channel per output
+        self.fusion_filter = None
+        self._data = bytearray(_DATA_SIZE)
+        self._mode = None  # unknown until the first write
         self.i2c_device = I2CDevice(i2c, address)
         chip_id = self._read_register(_ID_REGISTER)
         if chip_id != _CHIP_ID:
@@ -114,21 +149,39 @@ class BNO055_I2C:  # pylint: disable=too-many-public-methods
         self.accel_range = ACCEL_4G
         self.gyro_range = GYRO_2000_DPS
         self.magnet_rate = MAGNET_20HZ
+        if not wait:
+            # caller waits CONFIG_MODE_SETTLE_S and calls begin_mode()
+            self._write_register(_MODE_REGISTER, CONFIG_MODE)
+            self._mode = CONFIG_MODE
+            return
         time.sleep(0.01)
         self.mode = NDOF_MODE
         time.sleep(0.01)
 
+    def begin_mode(self, new_mode=NDOF_MODE):
+        """Switches from settled config mode to a new mode without waiting.
+
+        Returns the time in seconds until the new mode delivers data.
+        """
+        self._write_register(_MODE_REGISTER, new_mode)
+        self._mode = new_mode
+        return OPERATION_MODE_SETTLE_S
+
     @property
     def mode(self):
-        return self._read_register(_MODE_REGISTER)
+        """Operation mode, cached from the last write to the mode register."""
+        return self._mode
 
     @mode.setter
     def mode(self, new_mode):
-        self._write_register(_MODE_REGISTER, CONFIG_MODE)  # Empirically necessary
-        time.sleep(0.02)  # Datasheet table 3.6
+        if self._mode != CONFIG_MODE:
+            self._write_register(_MODE_REGISTER, CONFIG_MODE)  # Empirically necessary
+            self._mode = CONFIG_MODE
+            time.sleep(CONFIG_MODE_SETTLE_S)  # Datasheet table 3.6
         if new_mode != CONFIG_MODE:
             self._write_register(_MODE_REGISTER, new_mode)
-            time.sleep(0.01)  # Table 3.6
+            self._mode = new_mode
+            time.sleep(OPERATION_MODE_SETTLE_S)  # Table 3.6
 
     @property
     def calibration_status(self):
@@ -146,6 +199,35 @@ class BNO055_I2C:  # pylint: disable=too-many-public-methods
         sys, gyro, accel, mag = self.calibration_status
         return sys == gyro == accel == mag == 0x03
 
+    @property
+    def offsets(self):
+        """Offset and radius registers of accelerometer, magnetometer and gyro.
+
+        22 bytes from ACC_OFFSET_X_LSB to MAG_RADIUS_MSB. Reading and writing
+        switches to config mode and back to the current mode.
+        """
+        last_mode = self._mode
+        self.mode = CONFIG_MODE
+        buf = bytearray(1 + OFFSETS_SIZE)
+        buf[0] = _OFFSETS_REGISTER
+        with self.i2c_device as i2c:
+            i2c.write_then_readinto(buf, buf, out_end=1, in_start=1)
+        self.mode = last_mode
+        return buf[1:]
+
+    @offsets.setter
+    def offsets(self, value):
+        if len(value) != OFFSETS_SIZE:
+            raise ValueError("offsets must be %d bytes" % OFFSETS_SIZE)
+        last_mode = self._mode
+        self.mode = CONFIG_MODE
+        buf = bytearray(1 + OFFSETS_SIZE)
+        buf[0] = _OFFSETS_REGISTER
+        buf[1:] = value
+        with self.i2c_device as i2c:
+            i2c.write(buf)
+        self.mode = last_mode
+
     @property
     def external_crystal(self):
         """Switches the use of external crystal on or off."""
@@ -170,10 +252,34 @@ class BNO055_I2C:  # pylint: disable=too-many-public-methods
         """Returns the linear acceleration, without gravity, in m/s.
         Returns an empty tuple of length 3 when this property has been disabled by the current mode.
         """
-        if self.mode in [0x09, 0x0B, 0x0C]:
+        if self._mode in _FUSION_MODES:
             return self._linear_acceleration
         return (None, None, None)
 
+    def read_fusion(self):
+        """Reads all sensor and fusion outputs in a single transaction.
+
+        Returns the ``fusion`` array of this driver, indexed by the
+        ``ACCELERATION`` to ``GRAVITY`` offsets. The array is reused and
+        overwritten by the next call. Fusion outputs are zero when the
+        current mode does not compute them. With a ``fusion_filter``, the
+        outputs it selects are filtered before scaling.
+        """
+        data = self._data
+        data[0] = _DATA_REGISTER
+        with self.i2c_device as i2c:
+            i2c.write_then_readinto(data, data, out_end=1)
+        fusion = self.fusion
+        fusion_filter = self.fusion_filter
+        for i in range(FUSION_SIZE):
+            value = data[2 * i] | (data[2 * i + 1] << 8)
+            if value & 0x8000:
+                value -= 0x10000
+            if fusion_filter:
+                value = fusion_filter.process(i, value)
+            fusion[i] = value * _FUSION_SCALES[i]
+        return fusion
+
     def _write_register(self, register, value):
         self.buffer[0] = register
         self.buffer[1] = value
@@ -20,6 +20,13 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
 
+"""
+`pca9557` - TI PCA9557 I/O expander device driver
+
+Output, polarity and configuration registers are mirrored in shadow
+copies, so writes that would not change a register are skipped.
+"""
+
 from adafruit_bus_device.i2c_device import I2CDevice
 
 REGISTER_INPUT    = 0x00
@@ -31,26 +38,54 @@ class PCA9557:
     def __init__(self, i2c, address=None):
         self.i2c_device = I2CDevice(i2c, address)
         self.buf = bytearray(2)
+        self.skipped_writes = 0
+        self._input_command = bytearray([REGISTER_INPUT])
+        self._shadow = bytearray(4)
+        # bit n is set once the shadow of register n is known
+        self._shadow_valid = 0
 
     def read_input(self):
         with self.i2c_device as i2c:
-            i2c.write_then_readinto(bytearray([REGISTER_INPUT]), self.buf, in_end=1)
+            i2c.write_then_readinto(self._input_command, self.buf, in_end=1)
         return self.buf[0]
 
-    def write_config(self, config):
-        self.buf[0] = REGISTER_CONFIG
-        self.buf[1] = config
+    def read_register(self, register):
+        """Reads a register from the device and refreshes its shadow."""
+        self.buf[0] = register
         with self.i2c_device as i2c:
-            i2c.write(self.buf)
+            i2c.write_then_readinto(self.buf, self.buf, out_end=1, in_end=1)
+        if register != REGISTER_INPUT:
+            self._shadow[register] = self.buf[0]
+            self._shadow_valid |= 1 << register
+        return self.buf[0]
+
+    def modify(self, register, mask, value):
+        """Sets the bits selected by mask to value, other bits keep their state.
+
+        Only reads the register if its shadow is not known yet, and only
+        writes it if a bit changes.
+        """
+        if not self._shadow_valid & (1 << register):
+            self.read_register(register)
+        self._write(register, (self._shadow[register] & ~mask) | (value & mask))
+
+    def write_config(self, config):
+        self._write(REGISTER_CONFIG, config)
 
     def write_output(self, output):
-        self.buf[0] = REGISTER_OUTPUT
-        self.buf[1] = output
-        with self.i2c_device as i2c:
-            i2c.write(self.buf)
-        
+        self._write(REGISTER_OUTPUT, output)
+
     def write_polarity(self, polarity):
-        self.buf[0] = REGISTER_POLARITY
-        self.buf[1] = polarity
+        self._write(REGISTER_POLARITY, polarity)
+
+    def _write(self, register, value):
+        value &= 0xFF
+        if self._shadow_valid & (1 << register) and self._shadow[register] == value:
+            self.skipped_writes += 1
+            return
+        self.buf[0] = register
+        self.buf[1] = value
         with self.i2c_device as i2c:
             i2c.write(self.buf)
+        self._shadow[register] = value
+        self._shadow_valid |= 1 << register
@@ -0,0 +1,84 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 Stefan Rothe
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""
+`policy` - Activity-adaptive flex sensor rates
+
+A finger starts at the idle rate. As soon as its ``sensor.Sensor``
+reports activity, the flex sensor switches to the active rate and the
+finger's scheduler task to the matching rate and a higher priority. It
+switches back only after no activity was seen for the hold time, so a
+short pause in a movement does not flap between the rates.
+
+The activity window spans fewer milliseconds at the active rate, slow
+movements can look idle there; the hold time bridges these gaps.
+"""
+
+from micropython import const
+import flex
+import time
+
+IDLE_RATE = flex.ADS_10_HZ
+ACTIVE_RATE = flex.ADS_500_HZ
+IDLE_HOLD_MS = const(2000)
+IDLE_PRIORITY = const(0)
+ACTIVE_PRIORITY = const(1)
+
+
+class AdaptiveRate:
+    def __init__(self, finger, task=None, idle_rate=IDLE_RATE, active_rate=ACTIVE_RATE,
+                 hold_ms=IDLE_HOLD_MS):
+        """Use ``update()`` as the callback of the finger's flex task."""
+        self.finger = finger
+        self.task = task
+        self.idle_rate = idle_rate
+        self.active_rate = active_rate
+        self.hold_ms = hold_ms
+        self.active = False
+        self.changes = 0
+        self._last_activity = 0
+
+
+    def update(self):
+        finger = self.finger
+        finger.update_flex()
+        if not finger.flex:
+            return
+        now = time.monotonic_ns() // 1000000
+        if finger.sensor.activity:
+            self._last_activity = now
+            if not self.active:
+                self._switch(True)
+        elif self.active and now - self._last_activity >= self.hold_ms:
+            self._switch(False)
+
+
+    def _switch(self, active):
+        finger = self.finger
+        if not finger.set_flex_rate(self.active_rate if active else self.idle_rate):
+            # the sensor is gone, the finger marked it lost
+            return
+        self.active = active
+        self.changes += 1
+        if self.task:
+            self.task.set_rate(finger.flex.sample_hz)
+            self.task.priority = ACTIVE_PRIORITY if active else IDLE_PRIORITY
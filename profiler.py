@@ -0,0 +1,139 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 Stefan Rothe
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""
+`profiler` - Per-stage timing histograms
+
+Durations are counted in fixed power of two buckets, so recording a
+sample only increments an array element and never allocates. Stages are
+created once during setup; devices are created on their first I2C
+transaction.
+"""
+
+from micropython import const
+import array
+
+# Bucket 0 counts durations below 1 us, bucket i durations from 2**(i-1) us
+# up to 2**i us, the last bucket everything from 2**(BUCKET_COUNT-2) us on
+BUCKET_COUNT = const(16)
+
+
+class Histogram:
+    def __init__(self, name):
+        self.name = name
+        self.buckets = array.array('L', [0] * BUCKET_COUNT)
+        self.count = 0
+        self.max_ns = 0
+
+
+    def add(self, ns):
+        us = ns // 1000
+        bucket = 0
+        while us and bucket < BUCKET_COUNT - 1:
+            us >>= 1
+            bucket += 1
+        self.buckets[bucket] += 1
+        self.count += 1
+        if ns > self.max_ns:
+            self.max_ns = ns
+
+
+    def percentile(self, percent):
+        """Returns the upper bound in microseconds of the bucket holding the percentile."""
+        if not self.count:
+            return 0
+        limit = (self.count * percent + 99) // 100
+        seen = 0
+        for bucket in range(BUCKET_COUNT):
+            seen += self.buckets[bucket]
+            if seen >= limit:
+                break
+        return 1 << bucket
+
+
+    def reset(self):
+        for bucket in range(BUCKET_COUNT):
+            self.buckets[bucket] = 0
+        self.count = 0
+        self.max_ns = 0
+
+
+class Device(Histogram):
+    """Transaction durations, transactions and bytes of one I2C device."""
+
+    def __init__(self, address):
+        super().__init__(hex(address))
+        self.address = address
+        self.bytes = 0
+
+
+    def add_transaction(self, ns, size):
+        self.add(ns)
+        self.bytes += size
+
+
+    def reset(self):
+        super().reset()
+        self.bytes = 0
+
+
+class Profiler:
+    def __init__(self):
+        self.stages = []
+        self.devices = {}
+
+
+    def stage(self, name):
+        histogram = Histogram(name)
+        self.stages.append(histogram)
+        return histogram
+
+
+    def device(self, address):
+        device = self.devices.get(address)
+        if device is None:
+            device = Device(address)
+            self.devices[address] = device
+        return device
+
+
+    def reset(self):
+        for histogram in self.stages:
+            histogram.reset()
+        for device in self.devices.values():
+            device.reset()
+
+
+    def report(self):
+        for histogram in self.stages:
+            self._print(histogram)
+        for address in sorted(self.devices):
+            device = self.devices[address]
+            self._print(device, "bytes:", device.bytes)
+
+
+    def _print(self, histogram, *extra):
+        print(
+            histogram.name, "count:", histogram.count, "p50 us:", histogram.percentile(50),
+            "p90 us:", histogram.percentile(90), "p99 us:", histogram.percentile(99),
+            "max us:", histogram.max_ns // 1000, *extra
+        )
@@ -0,0 +1,163 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 Stefan Rothe
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""
+`recording` - Binary session recording streamed over USB serial
+
+A recording starts with a header that describes the channel layout,
+followed by fixed-size frames. All values are little endian.
+
+Header::
+
+    magic        4s "SGRC"
+    version      B
+    fingers      B  number of flex sensors
+    flex axes    B  channels per flex sensor
+    buttons      B  number of button bits
+    imu values   B  number of IMU values, 0 without IMU
+    flags        B  reserved, 0
+    rate         H  nominal frames per second
+    header size  H
+    frame size   H
+
+Frame::
+
+    sync         H  0x4753, "SG"
+    sequence     H  counts up, wraps at 0xFFFF
+    time         q  nanoseconds since the start of the recording
+    flex         h  per finger and axis, angles in 1/64 degree
+    buttons      B  one bit per button, see ``buttons``
+    padding      x
+    imu          f  per IMU value, ordered like ``BNO055_I2C.fusion``
+
+This module has no CircuitPython dependencies, so the host reader uses
+the same layout definitions.
+"""
+
+import struct
+import time
+
+MAGIC = b"SGRC"
+VERSION = 1
+HEADER_FORMAT = "<4sBBBBBBHHH"
+HEADER_SIZE = 16
+FRAME_PREFIX_FORMAT = "<HHq"
+FRAME_PREFIX_SIZE = 12
+SYNC = 0x4753
+# Flex angles are stored in the unit of the sensor, 1/64 degree
+FLEX_SCALE = 64
+INT16_MIN = -0x8000
+INT16_MAX = 0x7FFF
+FINGER_COUNT = 4
+BUTTON_COUNT = 8
+
+
+def frame_size(fingers, flex_axes, imu_values):
+    return FRAME_PREFIX_SIZE + 2 * fingers * flex_axes + 2 + 4 * imu_values
+
+
+def pack_header(fingers, flex_axes, buttons, imu_values, rate):
+    return struct.pack(
+        HEADER_FORMAT, MAGIC, VERSION, fingers, flex_axes, buttons, imu_values, 0, rate,
+        HEADER_SIZE, frame_size(fingers, flex_axes, imu_values)
+    )
+
+
+class Recorder:
+    """Streams frames of the glove's state to a serial stream.
+
+    If the stream has a ``connected`` attribute, as ``usb_cdc.Serial``
+    does, recording starts when the host opens the port and stops when it
+    closes it. Otherwise ``start()`` and ``stop()`` control it.
+    """
+
+    def __init__(self, stream, fingers, imu=None, rate=100):
+        self.stream = stream
+        self.fingers = fingers
+        self.imu = imu
+        imu_values = len(imu.fusion) if imu else 0
+        # every finger gets as many channels as the sensor with most axes
+        self.flex_axes = 1
+        for i in range(FINGER_COUNT):
+            if fingers[i].flex and fingers[i].flex.axes > self.flex_axes:
+                self.flex_axes = fingers[i].flex.axes
+        self.header = pack_header(FINGER_COUNT, self.flex_axes, BUTTON_COUNT, imu_values, rate)
+        self._frame = bytearray(frame_size(FINGER_COUNT, self.flex_axes, imu_values))
+        self._imu_offset = len(self._frame) - 4 * imu_values
+        self.recording = False
+        self.frames = 0
+        self.dropped = 0
+        self._sequence = 0
+        self._started = 0
+
+
+    def start(self):
+        self.stream.write(self.header)
+        self._sequence = 0
+        self._started = time.monotonic_ns()
+        self.recording = True
+
+
+    def stop(self):
+        self.recording = False
+
+
+    def update(self):
+        connected = getattr(self.stream, "connected", None)
+        if connected is not None and connected != self.recording:
+            if connected:
+                self.start()
+            else:
+                self.stop()
+        if not self.recording:
+            return
+        frame = self._frame
+        struct.pack_into(
+            FRAME_PREFIX_FORMAT, frame, 0, SYNC, self._sequence, time.monotonic_ns() - self._started
+        )
+        offset = FRAME_PREFIX_SIZE
+        for i in range(FINGER_COUNT):
+            flex = self.fingers[i].flex
+            for axis in range(self.flex_axes):
+                struct.pack_into("<h", frame, offset, _flex_value(flex, axis))
+                offset += 2
+        frame[offset] = self.fingers.buttons.state
+        if self.imu:
+            fusion = self.imu.fusion
+            offset = self._imu_offset
+            for i in range(len(fusion)):
+                struct.pack_into("<f", frame, offset, fusion[i])
+                offset += 4
+        written = self.stream.write(frame)
+        if written is not None and written < len(frame):
+            # the host reader resynchronizes on the next sync word
+            self.dropped += 1
+        else:
+            self.frames += 1
+        self._sequence = (self._sequence + 1) & 0xFFFF
+
+
+def _flex_value(flex, axis):
+    if not flex or axis >= flex.axes:
+        return 0
+    value = int(flex.values[axis] * FLEX_SCALE)
+    return max(INT16_MIN, min(INT16_MAX, value))
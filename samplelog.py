@@ -0,0 +1,179 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 Stefan Rothe
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""
+`samplelog` - Wear-leveled circular sample log in the 24AA64 EEPROM
+
+Fixed-size binary frames are appended to a ring that spans the log
+region of the EEPROM. Frames are collected in RAM and written one full
+page at a time, so every pass over the ring costs each page exactly one
+write cycle. Every frame starts with a 16 bit sequence number that counts
+up along the ring. When the log is opened, the first break in the
+sequence marks the position after the newest frame.
+
+Frame layout, little endian::
+
+    sequence   H  0 to 0xFFFE, 0xFFFF marks an erased frame
+    time       I  milliseconds
+    flex       4h angles in 1/64 degree, index to little finger
+    buttons    B  tip buttons, one bit per finger
+    thumb      B  side buttons, one bit per button
+"""
+
+from micropython import const
+import struct
+
+import eeprom
+
+FRAME_FORMAT = "<HI4hBB"
+FRAME_SIZE = const(16)
+FRAMES_PER_PAGE = const(2)
+# The region below the log is reserved for the calibration and settings records
+LOG_START = const(0x0100)
+LOG_END = const(0x2000)
+ERASED = const(0xFFFF)
+# Frames read per transaction when opening the log
+READ_FRAMES = const(16)
+
+
+def next_sequence(sequence):
+    return (sequence + 1) % ERASED
+
+
+class SampleLog:
+    def __init__(self, memory, start=LOG_START, end=LOG_END):
+        if start % eeprom.PAGE_SIZE or end % eeprom.PAGE_SIZE:
+            raise ValueError("log region must be page aligned")
+        self.memory = memory
+        self.start = start
+        self.capacity = (end - start) // FRAME_SIZE
+        self.count = 0
+        self._head = 0
+        self._sequence = 0
+        self._page = bytearray(eeprom.PAGE_SIZE)
+        self._page_frames = 0
+        self._buf = bytearray(READ_FRAMES * FRAME_SIZE)
+        self._open()
+
+
+    def __len__(self):
+        return self.count
+
+
+    def append(self, time_ms, index, middle, ring, little, buttons, thumb):
+        """Adds a frame, the page is written when its last frame is added."""
+        struct.pack_into(
+            FRAME_FORMAT, self._page, self._page_frames * FRAME_SIZE,
+            self._sequence, time_ms & 0xFFFFFFFF, index, middle, ring, little, buttons, thumb
+        )
+        self._sequence = next_sequence(self._sequence)
+        self._page_frames += 1
+        if self._page_frames == FRAMES_PER_PAGE:
+            self.flush()
+
+
+    def flush(self):
+        """Writes the frames collected for the current page."""
+        page_start = self._head - self._head % FRAMES_PER_PAGE
+        pending = self._page_frames - self._head % FRAMES_PER_PAGE
+        if pending == 0:
+            return
+        self.memory.write(
+            self._address(page_start), memoryview(self._page)[:self._page_frames * FRAME_SIZE]
+        )
+        self._head = (self._head + pending) % self.capacity
+        self.count = min(self.capacity, self.count + pending)
+        if self._page_frames == FRAMES_PER_PAGE:
+            self._page_frames = 0
+
+
+    def clear(self):
+        """Erases the log region, one write cycle per page."""
+        for i in range(len(self._page)):
+            self._page[i] = 0xFF
+        for page in range(self.capacity // FRAMES_PER_PAGE):
+            self.memory.write(self._address(page * FRAMES_PER_PAGE), self._page)
+        self._page_frames = 0
+        self._head = 0
+        self.count = 0
+        self._sequence = 0
+
+
+    def dump(self, out):
+        """Writes all stored frames, oldest first, to a stream.
+
+        Each contiguous span of the ring is read in one sequential
+        transaction, into a buffer allocated for the dump.
+        """
+        self.flush()
+        pos = (self._head - self.count) % self.capacity
+        remaining = self.count
+        while remaining:
+            n = min(remaining, self.capacity - pos)
+            buf = bytearray(n * FRAME_SIZE)
+            self.memory.read_into(self._address(pos), buf)
+            out.write(buf)
+            pos = (pos + n) % self.capacity
+            remaining -= n
+
+
+    def _address(self, frame):
+        return self.start + frame * FRAME_SIZE
+
+
+    def _open(self):
+        previous = None
+        pos = 0
+        while pos < self.capacity:
+            n = min(READ_FRAMES, self.capacity - pos)
+            self.memory.read_into(self._address(pos), self._buf, end=n * FRAME_SIZE)
+            for i in range(n):
+                sequence = self._buf[i * FRAME_SIZE] | (self._buf[i * FRAME_SIZE + 1] << 8)
+                if sequence == ERASED or (previous is not None and sequence != next_sequence(previous)):
+                    self._found_head(pos + i, previous)
+                    return
+                previous = sequence
+            pos += n
+        self._found_head(0, previous)
+
+
+    def _found_head(self, head, newest):
+        self._head = head
+        if newest is None:
+            # log is empty
+            self.count = 0
+            self._sequence = 0
+            return
+        self._sequence = next_sequence(newest)
+        # the frames after the head are older unless they were never written
+        self._buf[0] = 0
+        self._buf[1] = 0
+        self.memory.read_into(self._address(head), self._buf, end=2)
+        older = self._buf[0] | (self._buf[1] << 8)
+        self.count = head if older == ERASED else self.capacity
+        if head % FRAMES_PER_PAGE:
+            # keep the frames of the partially written page for the next page write
+            self.memory.read_into(
+                self._address(head - head % FRAMES_PER_PAGE), self._page,
+                end=(head % FRAMES_PER_PAGE) * FRAME_SIZE
+            )
+            self._page_frames = head % FRAMES_PER_PAGE
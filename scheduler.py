@@ -0,0 +1,253 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 Stefan Rothe
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""
+`scheduler` - Deadline-based cooperative task scheduler
+
+Every task runs at its own rate. Deadlines are kept on the
+``time.monotonic_ns()`` clock, so a slow task delays but never reorders
+the faster ones. Runs that start later than the tolerance are counted as
+late, whole periods that passed without a run are counted as missed.
+
+If a ``bus.BusManager`` is given, all tasks due in one pass are submitted
+with their device address and run as one bus cycle under a single lock.
+Tasks without an address run after the cycle, outside the bus lock.
+
+Idle tasks run only in the slack before the next deadline. Their callback
+gets the time it may take: the slack plus the late tolerance, so an idle
+task never makes another task late.
+
+If a ``profiler.Profiler`` is given, every task records the duration of
+its runs in a stage of the same name. The whole bus cycle and the time
+spent sleeping are recorded as the stages ``i2c cycle`` and ``sleep``.
+"""
+
+from micropython import const
+import time
+
+NS_PER_S = const(1000000000)
+# Runs starting later than this after their deadline are counted as late
+LATE_TOLERANCE_NS = const(500000)
+# Below this slack the scheduler spins instead of sleeping
+MIN_SLEEP_NS = const(1000000)
+
+
+class Task:
+    def __init__(self, name, callback, hz, address=None, histogram=None):
+        self.name = name
+        self.callback = callback
+        self.address = address
+        self.histogram = histogram
+        # among due tasks, higher priorities run first
+        self.priority = 0
+        self.idle = False
+        self.budget_ns = 0
+        self.deadline = 0
+        # bound once, so every bus cycle submits the same method object
+        self.run = self._run
+        self.set_rate(hz)
+        self.reset_stats()
+
+
+    def set_rate(self, hz):
+        self.hz = hz
+        self.period = NS_PER_S // hz
+        if self.deadline:
+            # a faster rate takes effect now, not after the current slow period
+            deadline = time.monotonic_ns() + self.period
+            if deadline < self.deadline:
+                self.deadline = deadline
+
+
+    def reset_stats(self):
+        self.runs = 0
+        self.late = 0
+        self.missed = 0
+        self.max_lateness = 0
+
+
+    def _run(self):
+        start = time.monotonic_ns()
+        if self.idle:
+            self.callback(self.budget_ns)
+        else:
+            self.callback()
+        if self.histogram is not None:
+            self.histogram.add(time.monotonic_ns() - start)
+        self.runs += 1
+
+
+class Scheduler:
+    def __init__(self, tolerance=LATE_TOLERANCE_NS, bus=None, profiler=None):
+        self.tasks = []
+        self.idle_tasks = []
+        self.tolerance = tolerance
+        self.bus = bus
+        self.profiler = profiler
+        self._cycle = None
+        self._sleep = None
+        if profiler:
+            self._sleep = profiler.stage("sleep")
+            if bus:
+                self._cycle = profiler.stage("i2c cycle")
+
+
+    def add(self, name, callback, hz, address=None):
+        histogram = self.profiler.stage(name) if self.profiler else None
+        task = Task(name, callback, hz, address, histogram)
+        task.deadline = time.monotonic_ns()
+        self.tasks.append(task)
+        return task
+
+
+    def add_idle(self, name, callback, hz):
+        task = self.add(name, callback, hz)
+        self.tasks.remove(task)
+        task.idle = True
+        self.idle_tasks.append(task)
+        return task
+
+
+    def run(self):
+        while True:
+            slack = self.run_once()
+            if slack >= MIN_SLEEP_NS:
+                start = time.monotonic_ns()
+                time.sleep((slack - MIN_SLEEP_NS // 2) / NS_PER_S)
+                if self._sleep:
+                    self._sleep.add(time.monotonic_ns() - start)
+
+
+    def run_once(self):
+        """Runs due tasks in deadline order, at most one run per task.
+
+        Returns the number of nanoseconds until the next deadline.
+        """
+        if self.bus:
+            slack = self._run_cycle()
+        else:
+            slack = self._run_due()
+        if self.idle_tasks:
+            slack = self._run_idle(slack)
+        return slack
+
+
+    def report(self):
+        for task in self.tasks + self.idle_tasks:
+            print(
+                task.name, task.hz, "Hz runs:", task.runs, "late:", task.late,
+                "missed:", task.missed, "max late us:", task.max_lateness // 1000
+            )
+        if self.bus:
+            print(
+                "bus cycle us:", self.bus.cycle_ns // 1000,
+                "max us:", self.bus.max_cycle_ns // 1000,
+                "transactions:", self.bus.cycle_transactions, "bytes:", self.bus.cycle_bytes
+            )
+
+
+    def reset_stats(self):
+        for task in self.tasks:
+            task.reset_stats()
+        for task in self.idle_tasks:
+            task.reset_stats()
+
+
+    def _earliest(self):
+        result = self.tasks[0]
+        for task in self.tasks:
+            if task.deadline < result.deadline:
+                result = task
+        return result
+
+
+    def _run_due(self):
+        for _ in range(len(self.tasks)):
+            now = time.monotonic_ns()
+            task = self._next_due(now)
+            if task is None:
+                break
+            self._run(task, now)
+        return max(0, self._earliest().deadline - time.monotonic_ns())
+
+
+    def _next_due(self, now):
+        """Returns the due task with the highest priority and earliest deadline."""
+        result = None
+        for task in self.tasks:
+            if task.deadline > now:
+                continue
+            if (
+                result is None or task.priority > result.priority
+                or (task.priority == result.priority and task.deadline < result.deadline)
+            ):
+                result = task
+        return result
+
+
+    def _run_idle(self, slack):
+        if slack <= 0:
+            return slack
+        start = time.monotonic_ns()
+        for task in self.idle_tasks:
+            now = time.monotonic_ns()
+            budget = slack + self.tolerance - (now - start)
+            if budget <= 0:
+                break
+            if task.deadline <= now:
+                task.budget_ns = budget
+                self._run(task, now)
+        return max(0, self._earliest().deadline - time.monotonic_ns())
+
+
+    def _run(self, task, now):
+        self._advance(task, now)
+        task.run()
+
+
+    def _run_cycle(self):
+        now = time.monotonic_ns()
+        submitted = False
+        for task in self.tasks:
+            if task.deadline <= now and task.address is not None:
+                self._advance(task, now)
+                self.bus.submit(task.address, task.run, task.priority)
+                submitted = True
+        self.bus.run_cycle()
+        if submitted and self._cycle:
+            self._cycle.add(self.bus.cycle_ns)
+        for task in self.tasks:
+            if task.deadline <= now and task.address is None:
+                self._run(task, now)
+        return max(0, self._earliest().deadline - time.monotonic_ns())
+
+
+    def _advance(self, task, now):
+        lateness = now - task.deadline
+        if lateness > self.tolerance:
+            task.late += 1
+            if lateness > task.max_lateness:
+                task.max_lateness = lateness
+        # skip periods that have already passed instead of running them back to back
+        skipped = lateness // task.period
+        task.missed += skipped
+        task.deadline += (skipped + 1) * task.period
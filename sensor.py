@@ -20,7 +20,20 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
 
+"""
+`sensor` - Activity and gesture detection for a single sensor channel
+
+Activity is detected from the variance of the last ``window`` scaled
+values. The window keeps the running sum and sum of squares of its
+values, so each new measurement updates the variance in constant time.
+Values are stored as integers relative to ``ZERO_VALUE``, which keeps the
+running sums exact.
+"""
+
+import array
+
 GESTURE_THRESOLD = 10
+GESTURE_TIMEOUT_MS = 500
 MAX_VALUE = 0xFFFF
 ZERO_VALUE = 0x7FFF
 VALUE_COUNT = 16
@@ -29,36 +42,43 @@ GESTURE_UP   = 0x01
 GESTURE_DOWN = 0x02
 
 
-def mean(list):
-    return sum(list) / len(list)
-
-
-def sum_of_squares(list):
-    result = 0
-    for item in list:
-        result += item ** 2
-    return result
-
-
 class Sensor:
-    def __init__(self):
+    def __init__(self, window=VALUE_COUNT):
         self.activity = False
         self.activity_threshold = 0
         self.factor = 1.0
         self.gesture = 0
+        self.gesture_threshold = GESTURE_THRESOLD
         self.gesture_timeout = 0
+        self.gesture_timeout_ms = GESTURE_TIMEOUT_MS
         self.pos = 0
         self.time_min = 0
         self.time_max = 0
         self.raw_min = -1.0
         self.raw_max = 1.0
+        self.min_stddev = 0
         self.value = ZERO_VALUE
-        self.value_max = MAX_VALUE
-        self.value_min = 0
-        self.values = [ZERO_VALUE] * VALUE_COUNT
+        self.value_max = 0
+        self.value_min = MAX_VALUE
+        # scaled values relative to ZERO_VALUE
+        self.values = array.array("i", [0] * window)
+        self._sum = 0
+        self._sum_of_squares = 0
+
+
+    @property
+    def mean(self):
+        return ZERO_VALUE + self._sum / len(self.values)
 
-        
-    def add_measurement(time, value):
+
+    @property
+    def variance(self):
+        n = len(self.values)
+        return (n * self._sum_of_squares - self._sum * self._sum) / (n * n)
+
+
+    def scale(self, value):
+        # clamp raw measurement to the configured range and scale it
         if self.raw_min < self.raw_max:
             if value < self.raw_min:
                 value = self.raw_min
@@ -69,30 +89,35 @@ class Sensor:
                 value = self.raw_min
             if value < self.raw_max:
                 value = self.raw_max
-        
-        # scale raw measurement
-        current_value = (value - self.raw_min) * self.factor;
-        # add measurement to ring buffer
-        self.pos = (self.pos + 1) % len(self.values);
-        self.values[self.pos] = current_value;
-
-        # calculate variance for activity detection
-        s = sum_of_squares(self.values)
-        m = mean(self.values)
-        variance = s / len(self.values) - m ** 2
-
-        self.activity = self.activity_threshold < variance;
-        if not activity:
+        return int((value - self.raw_min) * self.factor)
+
+
+    def add_measurement(self, time, value):
+        current_value = self.scale(value)
+        # add measurement to ring buffer and update running sums
+        n = len(self.values)
+        self.pos = (self.pos + 1) % n
+        old = self.values[self.pos]
+        new = current_value - ZERO_VALUE
+        self.values[self.pos] = new
+        self._sum += new - old
+        self._sum_of_squares += new * new - old * old
+
+        # activity if variance exceeds threshold, compared without division
+        self.activity = (
+            self.activity_threshold * n * n < n * self._sum_of_squares - self._sum * self._sum
+        )
+        if not self.activity:
             self.gesture = 0
-            self.gestureTimeout = 0
+            self.gesture_timeout = 0
             return
 
         self.value = current_value
 
-        if time < gesture_timeout:
+        if time < self.gesture_timeout:
             # still waiting for current gesture to time out
             return
-    
+
         if self.gesture:
             # last gesture has timed out, reset
             self.gesture = 0
@@ -105,20 +130,22 @@ class Sensor:
             if current_value < self.value_min:
                 self.time_min = time
                 self.value_min = current_value
-            if self.value_max < current_value 
+            if self.value_max < current_value:
                 self.time_max = time
                 self.value_max = current_value
 
         # check for gesture
-        if self.value_min < GESTURE_THRESOLD and self.value_max > MAX_VALUE - GESTURE_THRESOLD:
+        threshold = self.gesture_threshold
+        if self.value_min < threshold and self.value_max > MAX_VALUE - threshold:
             # gesture detected
-            self.gesture = self.time_min < self.time_max ? GESTURE_UP : GESTURE_DOWN;
-            self.gesture_timeout = time + GESTURE_TIMEOUT_MS;
-    
+            self.gesture = GESTURE_UP if self.time_min < self.time_max else GESTURE_DOWN
+            self.gesture_timeout = time + self.gesture_timeout_ms
+
 
-    def configure(min, max, min_stddev):
+    def configure(self, min, max, min_stddev):
         self.raw_min = min
         self.raw_max = max
+        self.min_stddev = min_stddev
         self.factor = MAX_VALUE / (max - min)
         stddev = min_stddev * abs(self.factor)
         self.activity_threshold = stddev ** 2
@@ -0,0 +1,60 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 Stefan Rothe
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""
+`settings` - Device settings in the 24AA64 EEPROM
+
+Keeps the Junxion board ID of the glove across restarts, so several
+gloves on one host can be told apart. The record sits between the
+calibration record and the sample log:
+
+    magic "ID", board ID, inverted board ID
+"""
+
+from micropython import const
+
+MAGIC = b"ID"
+BASE_ADDRESS = const(0x00E0)
+RECORD_SIZE = const(4)
+
+
+class Settings:
+    def __init__(self, eeprom):
+        self.eeprom = eeprom
+        self._record = bytearray(RECORD_SIZE)
+
+
+    def load_board_id(self, default):
+        """Returns the stored board ID, or ``default`` if none was stored."""
+        record = self._record
+        self.eeprom.read_into(BASE_ADDRESS, record)
+        if record[0:2] != MAGIC or record[2] ^ record[3] != 0xFF:
+            return default
+        return record[2]
+
+
+    def save_board_id(self, board_id):
+        record = self._record
+        record[0:2] = MAGIC
+        record[2] = board_id
+        record[3] = board_id ^ 0xFF
+        self.eeprom.write(BASE_ADDRESS, record)
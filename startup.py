@@ -0,0 +1,77 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 Stefan Rothe
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""
+`startup` - Parallel device bring-up and boot-time profiler
+
+Devices are initialized in two phases. The first phase sends resets and
+mode changes to all devices and records how long each of them needs to
+settle. ``wait()`` then sleeps once, until the latest of these deadlines,
+before the second phase finishes initialization. The time spent in each
+step is recorded per device.
+"""
+
+import time
+
+
+class Startup:
+    def __init__(self):
+        self.started = time.monotonic_ns()
+        self.names = []
+        self.times = []
+        self.waited = 0
+        self._ready = self.started
+
+
+    def start(self):
+        return time.monotonic_ns()
+
+
+    def stop(self, name, start):
+        """Adds the time since start to the boot time of a device."""
+        elapsed = time.monotonic_ns() - start
+        if name in self.names:
+            self.times[self.names.index(name)] += elapsed
+        else:
+            self.names.append(name)
+            self.times.append(elapsed)
+
+
+    def settle(self, seconds):
+        """Requires the given settle time, counted from now, before the next phase."""
+        ready = time.monotonic_ns() + int(seconds * 1000000000)
+        if ready > self._ready:
+            self._ready = ready
+
+
+    def wait(self):
+        remaining = self._ready - time.monotonic_ns()
+        if remaining > 0:
+            time.sleep(remaining / 1000000000)
+            self.waited += remaining
+
+
+    def report(self):
+        for name, elapsed in zip(self.names, self.times):
+            print("boot", name, elapsed // 1000, "us")
+        print("boot waiting", self.waited // 1000, "us")
+        print("boot total", (time.monotonic_ns() - self.started) // 1000, "us")
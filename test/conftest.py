@@ -0,0 +1,27 @@
+"""
+Host tests, run with ``python -m pytest`` from the repository root.
+
+The ``*_test.py`` scripts in this directory run on the glove and are not
+collected. The tests import the device modules through the stand-ins of
+``host.sim``.
+"""
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# code.py of the glove shadows the standard library module that pdb and
+# pytest's debugging support import, so load the standard one first
+_path = sys.path[:]
+sys.path[:] = [path for path in sys.path if os.path.abspath(path or ".") != ROOT]
+import code  # noqa: E402,F401
+sys.path[:] = _path
+
+sys.path.insert(0, ROOT)
+
+from host import sim  # noqa: E402
+
+sim.install()
+
+collect_ignore_glob = ["*_test.py"]
@@ -0,0 +1,93 @@
+import asyncio
+import os
+
+import numpy as np
+import pytest
+
+from host import aggregator, protocol
+
+
+def test_clock_fits_offset_and_drift_under_jitter():
+    rng = np.random.default_rng(2)
+    clock = aggregator.Clock()
+    drift = 80e-6
+    for i in range(6000):
+        device = i / 100
+        clock.add(device, device * (1 + drift) + 3.0 + 0.001 + rng.exponential(0.004))
+    assert clock.drift == pytest.approx(drift, abs=2e-6)
+    assert clock.to_host(60.0) == pytest.approx(60.0 * (1 + drift) + 3.001, abs=0.001)
+
+
+def test_glove_holds_buttons_and_interpolates_analog():
+    glove = aggregator.Glove(1, ["analog/0", "digital/0"], ["digital/0"])
+    glove.add(0.0, 10.0, {"analog/0": 0, "digital/0": 0})
+    glove.add(0.1, 10.1, {"analog/0": 100, "digital/0": 1})
+    values = glove.resample(np.array([10.05, 10.1, 20.0]))
+    assert values[0].tolist() == [50, 0]
+    assert values[1].tolist() == [100, 1]
+    assert np.isnan(values[2]).all()
+
+
+def test_duplicate_board_id_raises():
+    a = aggregator.Aggregator()
+    a.add_glove(1, ["analog/0"])
+    with pytest.raises(ValueError):
+        a.add_glove(1, ["analog/0"])
+
+
+class _Port:
+    path = "/dev/ttyUSB1"
+
+    def __init__(self):
+        self.fd, self._other = os.pipe()
+        self.data = bytearray()
+
+    def write(self, data):
+        self.data += data
+
+    def close(self):
+        os.close(self.fd)
+        os.close(self._other)
+
+
+def test_serial_glove_with_taken_board_id_is_dropped(capsys):
+    async def feed():
+        a = aggregator.Aggregator()
+        a.add_glove(1, ["analog/0"])
+        link = aggregator.SerialGlove(_Port(), a)
+        link.board_id = 1
+        link.config = protocol.InputConfig(bytes((protocol.ANALOG, 0, 16)))
+        for i in range(3):
+            link.publish(protocol.Sample(5.0 + i / 100, {}, {0: i}, {}))
+        return a, link
+
+    a, link = asyncio.run(feed())
+    link.port.close()
+    assert link.closed.is_set()
+    assert link.glove is None and list(a.gloves) == [1]
+    assert link.port.data == protocol.encode(protocol.DATA_OFF)
+    err = capsys.readouterr().err
+    assert err.count("board ID 1") == 1 and err.startswith("/dev/ttyUSB1:")
+
+
+@pytest.mark.parametrize("loss", [0.0, 0.01])
+def test_serial_glove_counts_lost_frames(loss):
+    rng = np.random.default_rng(4)
+    link = aggregator.SerialGlove(None, aggregator.Aggregator())
+    link.board_id = 3
+    link.config = protocol.InputConfig(bytes((protocol.ANALOG, 0, 16)))
+    rate = 100 * (1 - 80e-6)
+    lost = 0
+    i = 0
+    while i < 6000:
+        if rng.random() < loss:
+            skipped = int(rng.integers(1, 10))
+            i += skipped
+            lost += skipped
+            continue
+        link.publish(protocol.Sample(i / rate + 5.0 + 0.002 + rng.exponential(0.004), {}, {0: i}, {}))
+        last = i
+        i += 1
+    assert link.lost_frames == lost
+    assert link._frame - 1 == last
+    assert link.glove.clock.drift == pytest.approx(80e-6, abs=2e-6)
@@ -0,0 +1,11 @@
+from host import bench
+
+
+def test_fingers_update_within_transaction_budget(capsys):
+    assert bench.main(["--cycles", "50", "--max-transactions", "3"]) == 0
+    assert "fingers.update" in capsys.readouterr().out
+
+
+def test_transaction_budget_exceeded_fails(capsys):
+    assert bench.main(["--cycles", "50", "--max-transactions", "1"]) == 1
+    assert "more than 1.0 transactions per cycle" in capsys.readouterr().out
@@ -0,0 +1,139 @@
+import asyncio
+import json
+import os
+import tty
+
+import pytest
+
+import junxion
+import profiler
+from host import bridge
+
+GLOVE_PERIOD_S = 0.005
+
+
+class _Adapter:
+    """Analog pin p reads 10 * t + p, digital pin p is bit p of t, t counts frames."""
+
+    analog_pin_count = 4
+    digital_pin_count = 8
+    own_pin_count = 0
+    layout_version = 0
+
+    def __init__(self):
+        self.t = 0
+
+    def board_id(self):
+        return 7
+
+    def update(self):
+        self.t += 1
+
+    def analog_pin_available(self, pin):
+        return True
+
+    def analog_pin_value(self, pin):
+        return (self.t * 10 + pin) & 0xFFFF
+
+    def digital_pin_available(self, pin):
+        return True
+
+    def digital_pin_active(self, pin):
+        return (self.t >> pin) & 1
+
+    def own_pin_available(self, pin):
+        return False
+
+
+class _PtyUart:
+    """Glove end of a pty."""
+
+    def __init__(self, fd):
+        self.fd = fd
+        self._data = b""
+        os.set_blocking(fd, False)
+
+    @property
+    def in_waiting(self):
+        try:
+            self._data = os.read(self.fd, 64)
+        except BlockingIOError:
+            self._data = b""
+        return len(self._data)
+
+    def readinto(self, buffer):
+        n = len(self._data)
+        buffer[:n] = self._data
+        return n
+
+    def write(self, data):
+        os.write(self.fd, bytes(data))
+
+
+async def _run_glove(glove):
+    while True:
+        glove.update()
+        await asyncio.sleep(GLOVE_PERIOD_S)
+
+
+async def _session(path, interval, commands):
+    """Runs a glove and the bridge on a pty, returns the lines a Unix client got."""
+    profile = profiler.Profiler()
+    profile.stage("flex").add(300000)
+    profile.device(0x12).add_transaction(120000, 3)
+    master, slave = os.openpty()
+    tty.setraw(master)
+    glove = junxion.Junxion(_Adapter(), _PtyUart(master), profile)
+    glove_task = asyncio.ensure_future(_run_glove(glove))
+    link = bridge.Bridge(bridge.SerialPort(os.ttyname(slave)), interval)
+    os.close(slave)
+    await link.start(path)
+    reader, writer = await asyncio.open_unix_connection(path)
+    lines = []
+    try:
+        while len(lines) < 10:
+            lines.append(json.loads(await asyncio.wait_for(reader.readline(), 2)))
+        writer.write(commands)
+        await writer.drain()
+        while not any(line.get("histogram", 0) is None for line in lines) or len(lines) < 60:
+            lines.append(json.loads(await asyncio.wait_for(reader.readline(), 2)))
+    finally:
+        writer.close()
+        await link.stop()
+        link.port.close()
+        glove_task.cancel()
+        os.close(master)
+    return link, glove, lines
+
+
+@pytest.mark.parametrize("interval", [0, 10])
+def test_bridge_streams_and_answers_read_only_commands(tmp_path, interval):
+    path = str(tmp_path / "glove.sock")
+    link, glove, lines = asyncio.run(_session(path, interval, b"S\nP\nB\n"))
+    samples = [line for line in lines if "analog" in line]
+    replies = [line for line in lines if "analog" not in line]
+    assert len(samples) >= 50
+    for sample in samples:
+        analog = [sample["analog"][str(pin)] for pin in range(4)]
+        t = analog[0] // 10
+        assert analog == [t * 10 + pin for pin in range(4)]
+        assert [sample["digital"][str(pin)] for pin in range(8)] == [(t >> pin) & 1 for pin in range(8)]
+    # S was not forwarded, the glove kept streaming
+    assert glove._data_enabled
+    assert replies == [
+        {"histogram": {
+            "kind": "stage", "key": 0, "name": "flex", "count": 1, "max_us": 300, "bytes": 0,
+            "buckets": [0] * 9 + [1] + [0] * 6,
+        }},
+        {"histogram": {
+            "kind": "device", "key": 0x12, "name": "0x12", "count": 1, "max_us": 120, "bytes": 3,
+            "buckets": [0] * 7 + [1] + [0] * 8,
+        }},
+        {"histogram": None},
+        {"board_id": 7},
+    ]
+    assert link.board_id == 7
+    if interval:
+        assert link.decoder.deltas > link.decoder.keyframes > 0
+    else:
+        assert link.decoder.deltas == 0
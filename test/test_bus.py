@@ -0,0 +1,76 @@
+import pytest
+from adafruit_bus_device.i2c_device import I2CDevice
+
+import bus
+import profiler
+import scheduler
+from host import sim
+
+
+def _read(device, size):
+    def transaction():
+        with device as i2c:
+            i2c.write_then_readinto(bytearray(1), bytearray(size), out_end=1)
+    return transaction
+
+
+@pytest.mark.parametrize("profile", [None, profiler.Profiler()])
+def test_transactions_are_counted_with_and_without_profiler(profile):
+    i2c = sim.glove()
+    manager = bus.BusManager(i2c, profile)
+    imu = I2CDevice(manager, 0x28)
+    expander = I2CDevice(manager, 0x18)
+    manager.submit(0x28, _read(imu, 6))
+    manager.submit(0x18, _read(expander, 1))
+    manager.run_cycle()
+    assert (manager.cycle_transactions, manager.cycle_bytes) == (2, 9)
+    # transactions outside a cycle count in the totals only
+    _read(imu, 2)()
+    assert (manager.cycle_transactions, manager.cycle_bytes) == (2, 9)
+    assert manager.transactions > 2 and manager.bytes > 9
+    if profile:
+        assert profile.devices[0x28].count == 3
+
+
+def test_cycle_runs_by_priority_then_address_under_one_lock():
+    i2c = sim.glove()
+    manager = bus.BusManager(i2c)
+    order = []
+
+    def transaction(name):
+        def run():
+            # the bus stays locked, so a second lock attempt fails
+            order.append((name, manager._held, i2c.try_lock()))
+        return run
+
+    manager.submit(0x28, transaction("imu"))
+    manager.submit(None, transaction("leds"))
+    manager.submit(0x12, transaction("flex"))
+    manager.submit(0x3C, transaction("buttons"), priority=1)
+    manager.run_cycle()
+    assert order == [
+        ("buttons", True, False), ("flex", True, False), ("imu", True, False), ("leds", True, False)
+    ]
+    assert i2c.try_lock()
+    i2c.unlock()
+    # the queue is cleared, a second cycle does nothing
+    manager.run_cycle()
+    assert len(order) == 4
+
+
+def test_bus_cycle_runs_addressed_tasks_under_one_lock():
+    i2c = sim.glove()
+    manager = bus.BusManager(i2c)
+    tasks = scheduler.Scheduler(bus=manager)
+    order = []
+
+    def task(name):
+        def run():
+            order.append((name, manager._held))
+        return run
+
+    tasks.add("host", task("host"), 10)
+    tasks.add("imu", task("imu"), 10, 0x28)
+    tasks.add("flex", task("flex"), 10, 0x12)
+    tasks.run_once()
+    assert order == [("flex", True), ("imu", True), ("host", False)]
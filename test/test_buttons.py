@@ -0,0 +1,57 @@
+import array
+import time
+
+import buttons
+import pca9557
+from host import sim
+from host.sim.devices import PCA9557Model
+
+DEBOUNCE_NS = 20000000
+
+
+def _buttons():
+    i2c = sim.SimI2C()
+    side = i2c.add(PCA9557Model(0x18))
+    tip = i2c.add(PCA9557Model(0x19))
+    # released buttons pull their pins high, the power-on polarity inverts them
+    return side, tip, buttons.Buttons(pca9557.PCA9557(i2c, 0x18), pca9557.PCA9557(i2c, 0x19), DEBOUNCE_NS)
+
+
+def _events(queue):
+    times = array.array("q", [0] * buttons.EVENT_QUEUE_SIZE)
+    codes = array.array("B", [0] * buttons.EVENT_QUEUE_SIZE)
+    return list(codes[:queue.drain(times, codes)])
+
+
+def test_bounces_within_debounce_time_are_ignored():
+    side, tip, b = _buttons()
+    side.pins = 0xEF
+    b.sample_side()
+    side.pins = 0xFF
+    b.sample_side()
+    side.pins = 0xEF
+    b.sample_side()
+    assert b.pressed(0)
+    assert _events(b.events) == [buttons.PRESS | 0]
+    time.sleep(DEBOUNCE_NS / 1e9)
+    side.pins = 0xFF
+    b.sample_side()
+    assert not b.pressed(0)
+    assert _events(b.events) == [0]
+
+
+def test_tip_buttons_follow_side_buttons():
+    side, tip, b = _buttons()
+    tip.pins = 0x7F
+    b.sample_tip()
+    b.sample_side()
+    assert b.state == 1 << (buttons.TIP_SHIFT + 3)
+    assert _events(b.events) == [buttons.PRESS | 7]
+
+
+def test_full_queue_drops_oldest_events():
+    queue = buttons.EventQueue(4)
+    for code in range(6):
+        queue.put(code, code)
+    assert queue.overruns == 2
+    assert _events(queue) == [2, 3, 4, 5]
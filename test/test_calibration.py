@@ -0,0 +1,62 @@
+import adafruit_bno055
+import pytest
+
+import calibration
+import eeprom
+import finger
+from host import sim
+
+OFFSETS = bytes(range(1, calibration.IMU_SIZE + 1))
+
+
+def _glove():
+    i2c = sim.glove()
+    imu = adafruit_bno055.BNO055_I2C(i2c)
+    imu.offsets = OFFSETS
+    imu.mode = adafruit_bno055.NDOF_MODE
+    fingers = finger.Fingers(i2c)
+    for i, f in enumerate(fingers):
+        f.sensor.configure(100.0 + i, 900.0 - i, 2.0)
+    return i2c, imu, fingers
+
+
+def test_saved_calibration_is_restored():
+    i2c, imu, fingers = _glove()
+    store = calibration.Calibration(eeprom.EEPROM(i2c))
+    store.update(imu, fingers)
+    assert store.saved
+
+    i2c.devices[0x28].offsets_written = False
+    restored = finger.Fingers(i2c)
+    assert calibration.Calibration(eeprom.EEPROM(i2c)).restore(imu, restored)
+    assert i2c.devices[0x28].offsets_written
+    assert imu.offsets == OFFSETS
+    for i, f in enumerate(restored):
+        assert (f.sensor.raw_min, f.sensor.raw_max, f.sensor.min_stddev) == (100.0 + i, 900.0 - i, 2.0)
+
+
+def test_unchanged_calibration_is_not_written_again():
+    i2c, imu, fingers = _glove()
+    calibration.Calibration(eeprom.EEPROM(i2c)).save(imu, fingers)
+    page_writes = i2c.devices[0x50].page_writes
+    store = calibration.Calibration(eeprom.EEPROM(i2c))
+    assert store.restore(imu, fingers)
+    store.update(imu, fingers)
+    assert store.saved
+    assert i2c.devices[0x50].page_writes == page_writes
+
+
+def test_damaged_record_is_ignored():
+    i2c, imu, fingers = _glove()
+    calibration.Calibration(eeprom.EEPROM(i2c)).save(imu, fingers)
+    i2c.devices[0x50].memory[calibration.HEADER_SIZE] ^= 0x01
+    assert not calibration.Calibration(eeprom.EEPROM(i2c)).restore(imu, fingers)
+
+
+def test_failed_write_is_not_saved():
+    i2c, imu, fingers = _glove()
+    store = calibration.Calibration(eeprom.EEPROM(i2c))
+    i2c.remove(0x50)
+    with pytest.raises(OSError):
+        store.update(imu, fingers)
+    assert not store.saved
@@ -0,0 +1,43 @@
+import time
+
+import dashboard
+import finger
+from host import sim
+
+
+def _dashboard():
+    i2c = sim.glove()
+    fingers = finger.Fingers(i2c)
+    return fingers, dashboard.Dashboard(i2c, fingers)
+
+
+def test_refresh_stays_within_budget_and_catches_up():
+    fingers, display = _dashboard()
+    for f in fingers:
+        f.flex_value = finger.FLEX_FULL_SCALE
+    budget_ns = 1000000
+    calls = 0
+    overruns = 0
+    while display._pending():
+        start = time.monotonic_ns()
+        display.refresh(budget_ns)
+        if time.monotonic_ns() - start > budget_ns:
+            overruns += 1
+        calls += 1
+        assert calls < 100
+    # a single call may be held up by the host, not by drawing too much
+    assert overruns <= 1
+    # the bars do not fit into one budget, so they are drawn over several calls
+    assert calls > 1
+    assert display.deferred == calls - 1
+    assert list(display._bar_shown) == [dashboard.BAR_WIDTH] * dashboard.FINGER_COUNT
+
+
+def test_refresh_draws_nothing_without_budget():
+    fingers, display = _dashboard()
+    for f in fingers:
+        f.flex_value = finger.FLEX_FULL_SCALE
+    display.refresh(0)
+    assert display.refreshes == 0
+    assert display.deferred == 1
+    assert list(display._bar_shown) == [0] * dashboard.FINGER_COUNT
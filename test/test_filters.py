@@ -0,0 +1,59 @@
+import random
+
+import filters
+
+
+def _run(stage, values, period_us=10000, channel=0):
+    return [stage.process(channel, value, period_us) for value in values]
+
+
+def test_ema_converges_to_step():
+    ema = filters.EMA(1, 0.5)
+    assert _run(ema, [0, 100, 100, 100, 100]) == [0, 50, 75, 88, 94]
+
+
+def test_median_removes_single_spike():
+    median = filters.Median(1, 3)
+    assert _run(median, [5, 5, 900, 5, 6, 7]) == [5, 5, 5, 5, 6, 6]
+
+
+def test_channels_are_independent():
+    median = filters.Median(2, 3)
+    assert _run(median, [1, 2, 3], channel=0) == [1, 2, 2]
+    assert _run(median, [7, 7, 7], channel=1) == [7, 7, 7]
+
+
+def test_one_euro_smooths_noise_at_rest():
+    rng = random.Random(1)
+    one_euro = filters.OneEuro(1, 1.0, 0.007 / 64)
+    noisy = [1000 + rng.randint(-40, 40) for _ in range(500)]
+    out = _run(one_euro, noisy)[50:]
+    assert max(out) - min(out) < 40
+    assert abs(sum(out) / len(out) - 1000) < 5
+
+
+def test_one_euro_follows_fast_step():
+    slow = filters.OneEuro(1, 1.0, 0.0)
+    fast = filters.OneEuro(1, 1.0, 0.0019)
+    step = [0] * 5 + [1920] * 10
+    assert _run(fast, step)[-1] > _run(slow, step)[-1]
+    assert _run(fast, step)[-1] > 1800
+
+
+def test_one_euro_stays_in_small_int_range():
+    one_euro = filters.OneEuro(1, 1.0, 0.0019)
+    for period_us in (1, 100, 2000, 5000000):
+        one_euro.reset()
+        for value in (-32768, 32767, -32768, 32767, 0):
+            out = one_euro.process(0, value, period_us)
+            assert -32768 <= out <= 32767
+            assert abs(one_euro.state[0]) < 1 << 30
+            assert abs(one_euro.rate[0]) << filters.ALPHA_BITS < 1 << 30
+
+
+def test_chain_filters_selected_channels_only():
+    chain = filters.Chain([filters.EMA(4, 0.5)], 4, 10000)
+    chain.select(1, 3)
+    assert [chain.process(0, v) for v in (0, 100)] == [0, 100]
+    assert [chain.process(1, v) for v in (0, 100)] == [0, 50]
+    assert [chain.process(3, v) for v in (0, 100)] == [0, 100]
@@ -0,0 +1,51 @@
+import array
+import time
+
+import board
+
+import finger
+import flex
+from host import sim
+from host.sim.devices import FlexModel
+
+
+def _bus(angle=10.0):
+    i2c = sim.SimI2C()
+    model = i2c.add(FlexModel(0x12, signal=lambda axis: angle))
+    return i2c, model
+
+
+def test_streaming_reads_only_due_samples():
+    i2c, model = _bus()
+    sensor = flex.Flex(i2c, 0x12)
+    sensor.set_sample_rate(flex.ADS_100_HZ)
+    sensor.start_streaming()
+    writes = model.writes
+    model.reads = 0
+    end = time.monotonic_ns() + 200000000
+    while time.monotonic_ns() < end:
+        sensor.update()
+    # poll mode is switched on once, then only due samples are read
+    assert model.writes == writes
+    assert 15 <= model.reads <= 21
+    times = array.array("q", [0] * flex.SAMPLE_BUFFER_SIZE)
+    values = array.array("f", [0.0] * flex.SAMPLE_BUFFER_SIZE)
+    assert sensor.read_samples(times, values) == model.reads
+    assert len(sensor.samples) == 0
+    assert list(values[:model.reads]) == [10.0] * model.reads
+    assert all(later > earlier for earlier, later in zip(times, times[1:model.reads]))
+
+
+def test_finger_filters_every_queued_sample():
+    i2c, model = _bus(30.0)
+    f = finger.Finger(i2c, 0x12, 0x1, board.A0)
+    f.begin()
+    f.flex.set_sample_rate(flex.ADS_500_HZ)
+    for _ in range(5):
+        time.sleep(f.flex.sample_period / 1e9)
+        assert f.flex.update()
+    pos = f.sensor.pos
+    f.update_flex()
+    assert len(f.flex.samples) == 0 and f.flex.samples.overruns == 0
+    assert f.sensor.pos == pos + 5
+    assert f.flex_value == 30.0
@@ -0,0 +1,44 @@
+import pca9557
+from host import sim
+from host.sim.devices import PCA9557Model
+
+
+def _expander():
+    i2c = sim.SimI2C()
+    model = i2c.add(PCA9557Model(0x18, pins=0xA0))
+    return model, pca9557.PCA9557(i2c, 0x18)
+
+
+def test_unchanged_writes_are_skipped():
+    model, expander = _expander()
+    expander.write_config(0xF0)
+    writes = model.writes
+    expander.write_config(0xF0)
+    expander.write_output(0x05)
+    expander.write_output(0x05)
+    assert model.writes == writes + 1
+    assert expander.skipped_writes == 2
+    assert model.registers[pca9557.REGISTER_OUTPUT] == 0x05
+
+
+def test_modify_reads_a_register_once_and_keeps_other_bits():
+    model, expander = _expander()
+    reads = model.reads
+    expander.modify(pca9557.REGISTER_OUTPUT, 0x01, 0x01)
+    assert model.reads == reads + 1
+    expander.modify(pca9557.REGISTER_OUTPUT, 0x02, 0x02)
+    expander.modify(pca9557.REGISTER_OUTPUT, 0x01, 0x01)
+    assert model.reads == reads + 1
+    assert expander.skipped_writes == 1
+    # the power-on polarity of the upper pins survives a change of the lower ones
+    expander.modify(pca9557.REGISTER_POLARITY, 0x0F, 0x03)
+    assert model.registers[pca9557.REGISTER_POLARITY] == 0xF3
+    assert model.registers[pca9557.REGISTER_OUTPUT] == 0x03
+
+
+def test_inputs_follow_config_and_polarity():
+    model, expander = _expander()
+    expander.write_config(0xF0)
+    expander.write_polarity(0xF0)
+    expander.write_output(0x0C)
+    assert expander.read_input() == 0x5C
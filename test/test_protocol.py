@@ -0,0 +1,127 @@
+import struct
+
+import pytest
+
+import buttons
+import junxion
+from host import protocol
+
+
+class _Buttons:
+    state = 0
+    events = buttons.EventQueue()
+
+
+class _Flex:
+    axes = 1
+
+
+class _Sensor:
+    def __init__(self, value):
+        self.value = value
+
+
+class _Finger:
+    def __init__(self, device, index):
+        self.flex = _Flex()
+        self.sensor = _Sensor(device.values[index])
+
+
+class _Device:
+    layout_version = 0
+
+    def __init__(self):
+        self.buttons = _Buttons()
+        self.values = [100, 200, 300, 400]
+
+    def __getitem__(self, index):
+        return _Finger(self, index)
+
+
+class _Uart:
+    def __init__(self):
+        self.data = bytearray()
+
+    def write(self, data):
+        self.data += data
+
+
+def _glove(interval):
+    device = _Device()
+    uart = _Uart()
+    glove = junxion.Junxion(junxion.JunxionAdapter(device), uart)
+    glove.send_input_config()
+    (command, payload), = protocol.FrameParser().feed(uart.data)
+    assert command == protocol.INPUT_CONFIG_REPLY
+    del uart.data[:]
+    glove.handle_command(junxion.COMMAND_DELTA, bytes((interval,)), 1)
+    return glove, device, uart, protocol.InputConfig(payload)
+
+
+def _frames(glove, device, uart, count):
+    """Sends data frames, changing one value per frame, returns the frames and the true payloads."""
+    sent = []
+    truth = []
+    for i in range(count):
+        device.values[i % 4] = (i * 37) & 0xFFFF
+        device.buttons.state = i & 0x0F
+        start = len(uart.data)
+        glove.send_data()
+        sent.append(bytes(uart.data[start:]))
+        truth.append(bytes(glove._data_frame[junxion.HEADER_SIZE:]))
+    return sent, truth
+
+
+def test_delta_frames_rebuild_full_frames():
+    glove, device, uart, config = _glove(10)
+    sent, truth = _frames(glove, device, uart, 40)
+    assert [frame[3] for frame in sent[:3]] == [protocol.DATA, protocol.DELTA_DATA, protocol.DELTA_DATA]
+    assert sum(map(len, sent)) < 40 * len(sent[0])
+    decoder = protocol.DeltaDecoder(config)
+    parser = protocol.FrameParser()
+    rebuilt = [decoder.feed(command, payload) for command, payload in parser.feed(b"".join(sent))]
+    assert rebuilt == truth
+    assert (decoder.keyframes, decoder.deltas, decoder.lost) == (4, 36, 0)
+
+
+def test_lost_delta_frame_waits_for_keyframe():
+    glove, device, uart, config = _glove(10)
+    sent, truth = _frames(glove, device, uart, 25)
+    decoder = protocol.DeltaDecoder(config)
+    parser = protocol.FrameParser()
+    results = []
+    for i, frame in enumerate(sent):
+        if i == 3:
+            continue
+        (command, payload), = parser.feed(frame)
+        results.append((i, decoder.feed(command, payload)))
+    for i, payload in results:
+        if 3 < i < 10:
+            assert payload is None
+        else:
+            assert payload == truth[i]
+    assert decoder.lost == 1
+
+
+def test_delta_before_keyframe_is_skipped():
+    glove, device, uart, config = _glove(10)
+    sent, _ = _frames(glove, device, uart, 2)
+    (command, payload), = protocol.FrameParser().feed(sent[1])
+    assert protocol.DeltaDecoder(config).feed(command, payload) is None
+
+
+def test_malformed_frames_raise():
+    config = protocol.InputConfig(bytes((protocol.DIGITAL, 0, 1, protocol.ANALOG, 0, 16)))
+    decoder = protocol.DeltaDecoder(config)
+    with pytest.raises(ValueError):
+        decoder.feed(protocol.DATA, b"\x00\x00")
+    decoder.feed(protocol.DATA, struct.pack(">HH", 1, 2))
+    with pytest.raises(ValueError):
+        # bitmap announces two words, one is sent
+        decoder.feed(protocol.DELTA_DATA, b"\x01\x03\x00\x05")
+
+
+def test_interval_zero_sends_full_frames():
+    glove, device, uart, _ = _glove(0)
+    sent, _ = _frames(glove, device, uart, 5)
+    assert all(frame[3] == protocol.DATA for frame in sent)
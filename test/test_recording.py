@@ -0,0 +1,78 @@
+import io
+import struct
+
+import numpy as np
+
+import recording
+from host.recording import Capture, Recording
+
+FINGERS = 4
+AXES = 1
+
+
+def _frame(sequence):
+    frame = bytearray(recording.frame_size(FINGERS, AXES, 0))
+    struct.pack_into(recording.FRAME_PREFIX_FORMAT, frame, 0, recording.SYNC, sequence, sequence * 10000000)
+    struct.pack_into("<h", frame, recording.FRAME_PREFIX_SIZE, sequence * 64)
+    frame[recording.FRAME_PREFIX_SIZE + 2 * FINGERS * AXES] = sequence & 0xFF
+    return bytes(frame)
+
+
+def _capture(data, chunk=37):
+    out = io.BytesIO()
+    capture = Capture(out)
+    for i in range(0, len(data), chunk):
+        capture.feed(data[i:i + chunk])
+    capture.flush()
+    return capture, out.getvalue()
+
+
+def _header():
+    return recording.pack_header(FINGERS, AXES, recording.BUTTON_COUNT, 0, 100)
+
+
+def test_capture_skips_garbage_and_keeps_all_frames(tmp_path):
+    data = b"noise" + _header() + b"".join(_frame(i) for i in range(20))
+    capture, written = _capture(data)
+    assert capture.frames == 20
+    assert capture.dropped_bytes == 5
+    path = tmp_path / "session.sgr"
+    path.write_bytes(written)
+    with Recording(str(path)) as session:
+        assert len(session) == 20
+        assert session.gaps().tolist() == []
+        assert np.array_equal(session.degrees(0), np.arange(20))
+        assert session.button(1).tolist() == [bool(i & 2) for i in range(20)]
+
+
+def test_capture_drops_partially_written_frame(tmp_path):
+    frames = [_frame(i) for i in range(10)]
+    # the glove wrote only the start of frame 5, frame 6 follows directly
+    frames[5] = frames[5][:9]
+    capture, written = _capture(_header() + b"".join(frames))
+    path = tmp_path / "session.sgr"
+    path.write_bytes(written)
+    with Recording(str(path)) as session:
+        sequences = session.frames["sequence"].tolist()
+    assert 5 not in sequences
+    assert sequences == sorted(sequences)
+    assert all(session_frame in frames for session_frame in _split(written))
+    assert capture.dropped_bytes > 0
+
+
+def test_views_outlive_close(tmp_path):
+    _, written = _capture(_header() + b"".join(_frame(i) for i in range(10)))
+    path = tmp_path / "session.sgr"
+    path.write_bytes(written)
+    with Recording(str(path)) as session:
+        time = session.time
+        flex = session.flex
+    assert session._file.closed
+    assert time.tolist() == [i * 10000000 for i in range(10)]
+    assert flex[:, 0, 0].tolist() == [i * 64 for i in range(10)]
+
+
+def _split(written):
+    size = recording.frame_size(FINGERS, AXES, 0)
+    body = written[recording.HEADER_SIZE:]
+    return [body[i:i + size] for i in range(0, len(body), size)]
@@ -0,0 +1,65 @@
+import io
+import struct
+
+import eeprom
+import samplelog
+from host import sim
+from host.sim.devices import EEPROMModel
+
+# a ring of eight frames, four pages
+LOG_END = samplelog.LOG_START + 8 * samplelog.FRAME_SIZE
+
+
+def _memory():
+    i2c = sim.SimI2C()
+    model = i2c.add(EEPROMModel())
+    return i2c, model, eeprom.EEPROM(i2c)
+
+
+def _append(log, first, count):
+    for t in range(first, first + count):
+        log.append(t, t, -t, 0, 0, t & 0x0F, 0)
+
+
+def _times(log):
+    out = io.BytesIO()
+    log.dump(out)
+    return [frame[1] for frame in struct.iter_unpack(samplelog.FRAME_FORMAT, out.getvalue())]
+
+
+def test_write_is_split_at_page_boundaries_without_sleeping():
+    i2c, model, memory = _memory()
+    data = bytes(range(40))
+    memory.write(20, data)
+    assert model.page_writes == 2
+    # the last page is still in its write cycle, the next access polls for it
+    assert memory.busy
+    buf = bytearray(40)
+    memory.read_into(20, buf)
+    assert memory.busy_polls > 0
+    assert bytes(buf) == data
+
+
+def test_log_is_found_again_after_reopening():
+    i2c, model, memory = _memory()
+    log = samplelog.SampleLog(memory, end=LOG_END)
+    _append(log, 0, 3)
+    log.flush()
+    # the frames of the half written page are kept for its next write
+    log = samplelog.SampleLog(memory, end=LOG_END)
+    assert len(log) == 3
+    _append(log, 3, 1)
+    assert _times(samplelog.SampleLog(memory, end=LOG_END)) == [0, 1, 2, 3]
+
+
+def test_full_ring_drops_oldest_frames():
+    i2c, model, memory = _memory()
+    log = samplelog.SampleLog(memory, end=LOG_END)
+    _append(log, 0, 12)
+    # frames are written a full page at a time
+    assert model.page_writes == 6
+    log = samplelog.SampleLog(memory, end=LOG_END)
+    assert len(log) == 8
+    assert _times(log) == list(range(4, 12))
+    log.clear()
+    assert len(samplelog.SampleLog(memory, end=LOG_END)) == 0
@@ -0,0 +1,46 @@
+import time
+
+import scheduler
+
+
+def test_due_tasks_run_by_priority_then_deadline():
+    tasks = scheduler.Scheduler()
+    order = []
+    early = tasks.add("early", lambda: order.append("early"), 1)
+    late = tasks.add("late", lambda: order.append("late"), 1)
+    urgent = tasks.add("urgent", lambda: order.append("urgent"), 1)
+    urgent.priority = 1
+    now = time.monotonic_ns()
+    early.deadline = now - 2000
+    late.deadline = now - 1000
+    urgent.deadline = now
+    slack = tasks.run_once()
+    assert order == ["urgent", "early", "late"]
+    # nothing is due again for almost a second
+    assert 0 < slack <= scheduler.NS_PER_S
+    assert tasks.run_once() > 0 and len(order) == 3
+
+
+def test_late_task_skips_missed_periods():
+    tasks = scheduler.Scheduler()
+    task = tasks.add("slow", lambda: None, 100)
+    task.deadline -= 5 * task.period + task.period // 2
+    tasks.run_once()
+    assert (task.runs, task.late, task.missed) == (1, 1, 5)
+    # the next deadline lies ahead, not in the skipped periods
+    assert task.deadline > time.monotonic_ns()
+
+
+def test_idle_task_gets_slack_plus_tolerance():
+    tasks = scheduler.Scheduler()
+    budgets = []
+    sensor = tasks.add("sensor", lambda: None, 100)
+    display = tasks.add_idle("display", budgets.append, 100)
+    tasks.run_once()
+    assert len(budgets) == 1
+    assert tasks.tolerance < budgets[0] <= sensor.period + tasks.tolerance
+    # a sensor run that overruns its period leaves no slack, so the idle task waits
+    sensor.callback = lambda: time.sleep(0.02)
+    sensor.deadline = display.deadline = time.monotonic_ns()
+    assert tasks.run_once() == 0
+    assert len(budgets) == 1
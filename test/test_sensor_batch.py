@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+import sensor
+from host import sensor_batch
+
+
+def _signal(rng, n):
+    """Sweeps alternating with still phases, at irregular timestamps."""
+    times = np.cumsum(rng.integers(0, 15, n))
+    phase = rng.integers(20, 200)
+    sweep = 130 * np.sin(np.arange(n) * rng.uniform(0.05, 0.5))
+    still = 5.0 + rng.normal(0, 0.2, n)
+    raw = np.where((np.arange(n) // phase) % 2 == 0, sweep, still)
+    return times, np.round(raw, 3)
+
+
+class _EventSensor(sensor.Sensor):
+    """Records the sample index whenever a gesture is detected."""
+
+    def __setattr__(self, name, value):
+        if name == "gesture" and value:
+            self.events.append(self.index)
+        object.__setattr__(self, name, value)
+
+
+def _online(times, raw, params):
+    s = _EventSensor(params.window)
+    s.events = []
+    s.configure(params.raw_min, params.raw_max, params.min_stddev)
+    s.gesture_threshold = params.gesture_threshold
+    s.gesture_timeout_ms = params.gesture_timeout_ms
+    activity = []
+    value = []
+    gesture = []
+    for i, (t, v) in enumerate(zip(times.tolist(), raw.tolist())):
+        s.index = i
+        s.add_measurement(t, v)
+        activity.append(s.activity)
+        value.append(s.value)
+        gesture.append(s.gesture)
+    return activity, value, gesture, s.events
+
+
+PARAMS = [
+    sensor_batch.Params(
+        -120, 120, stddev, window=window, gesture_threshold=threshold, gesture_timeout_ms=timeout
+    )
+    for stddev in (0.5, 3)
+    for window in (4, 16)
+    for threshold in (10, 2000, 40000)
+    for timeout in (0, 50, 500)
+] + [sensor_batch.Params(120, -100, 1.0)]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_sweep_matches_online_sensor(seed):
+    rng = np.random.default_rng(seed)
+    times, raw = _signal(rng, int(rng.integers(100, 2000)))
+    for params, result in zip(PARAMS, sensor_batch.sweep(times, raw, PARAMS)):
+        activity, value, gesture, _ = _online(times, raw, params)
+        assert result.activity.tolist() == activity, params
+        assert result.value.tolist() == value, params
+        assert result.gesture.tolist() == gesture, params
+
+
+def test_detect_events_match_online_sensor():
+    rng = np.random.default_rng(7)
+    times, raw = _signal(rng, 3000)
+    detected = 0
+    for params in PARAMS[::5]:
+        result = sensor_batch.detect(times, raw, params)
+        _, _, _, events = _online(times, raw, params)
+        assert result.event_index.tolist() == events, params
+        detected += len(events)
+    assert detected > 0
+
+
+def test_default_params_match_sensor_defaults():
+    s = sensor.Sensor()
+    params = sensor_batch.Params(s.raw_min, s.raw_max, s.min_stddev)
+    assert params.gesture_threshold == s.gesture_threshold
+    assert params.gesture_timeout_ms == s.gesture_timeout_ms
@@ -0,0 +1,57 @@
+import asyncio
+import os
+
+import eeprom
+import junxion
+import settings
+from host import bridge, protocol, sim
+
+
+def test_board_id_is_kept_across_restarts():
+    i2c = sim.glove()
+    adapter = junxion.JunxionAdapter(None, settings=settings.Settings(eeprom.EEPROM(i2c)))
+    assert adapter.settings.load_board_id(junxion.BOARD_ID) == junxion.BOARD_ID
+    adapter.set_board_id(7)
+    assert adapter.board_id() == 7
+    adapter.settings.eeprom.wait()
+    assert settings.Settings(eeprom.EEPROM(i2c)).load_board_id(junxion.BOARD_ID) == 7
+
+
+def test_damaged_record_gives_default():
+    i2c = sim.glove()
+    store = settings.Settings(eeprom.EEPROM(i2c))
+    store.save_board_id(7)
+    i2c.devices[0x50].memory[settings.BASE_ADDRESS + 3] ^= 0x01
+    assert store.load_board_id(junxion.BOARD_ID) == junxion.BOARD_ID
+
+
+def test_lost_eeprom_keeps_board_id_for_the_session(capsys):
+    i2c = sim.glove()
+    adapter = junxion.JunxionAdapter(None, settings=settings.Settings(eeprom.EEPROM(i2c)))
+    i2c.remove(0x50)
+    adapter.set_board_id(3)
+    assert adapter.board_id() == 3
+    assert "not kept" in capsys.readouterr().out
+
+
+def test_bridge_assigns_board_id():
+    read_fd, write_fd = os.pipe()
+
+    class Port:
+        fd = read_fd
+        data = bytearray()
+
+        def write(self, data):
+            self.data += data
+
+    async def start():
+        link = bridge.Bridge(Port(), assign_board_id=2)
+        await link.start()
+        await link.stop()
+        return link.port.data
+
+    data = asyncio.run(start())
+    os.close(read_fd)
+    os.close(write_fd)
+    frames = [bytes((command,)) + payload for command, payload in protocol.FrameParser().feed(data)]
+    assert b"A\x02" in frames and b"B" not in frames